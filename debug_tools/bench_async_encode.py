@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import av
+
+# Allow "python debug_tools/bench_async_encode.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource, MSSSource, X11ShmSource
+from modules.stream_encoder import VideoEncoder
+
+# Encode stage in the stream thread (sync) vs encoder thread (async_depth 1/2), frames offered at --fps.
+#   Delivered : frames that reached the output (packets) per second
+#   Stream    : time the stream thread spends per frame (conversion + encode in sync, conversion only in async)
+#   Wait/Codec: time in the queue / in the codec (async)
+# The output is decoded back to check that dropped frames never break the H.264 chain.
+
+def run(source, frames, enc_w, enc_h, fps, mbps, codec, preset, depth):
+    lock = threading.Lock()
+    out = {"frames": 0, "packets": []}
+
+    def sink(packets):
+        with lock:
+            out["frames"] += 1
+            out["packets"].extend(bytes(p) for p in packets)
+
+    encoder = VideoEncoder(enc_w, enc_h, fps, int(mbps * 1e6), codec_choice=codec, preset_choice=preset,
+                           async_depth=depth, on_packets=sink)
+    source.open()
+    t_stream = 0.0
+    t_start = next_tick = time.perf_counter()
+    for _ in range(frames):
+        next_tick += 1.0 / fps
+        delay = next_tick - time.perf_counter()
+        if delay > 0: time.sleep(delay)
+        raw = source.grab()
+        t0 = time.perf_counter()
+        packets = encoder.encode(raw, source.pixel_format)
+        t_stream += time.perf_counter() - t0
+        if encoder.worker is None: sink(packets)
+    encoder.drain()
+    wall = time.perf_counter() - t_start
+    worker = encoder.worker
+    stats = None
+    if worker:
+        _, wait_ms, _ = worker.wait_stats.snapshot()
+        codec_util, codec_ms, _ = worker.encode_stats.snapshot()
+        stats = (wait_ms, codec_ms, codec_util, worker.dropped)
+    encoder.close()
+    source.close()
+
+    # Decode check
+    decoder = av.codec.CodecContext.create("h264", "r")
+    decoded = errors = 0
+    for data in out["packets"]:
+        try: decoded += len(decoder.decode(av.Packet(data)))
+        except Exception: errors += 1
+
+    line = (f"{'sync' if not depth else f'async {depth}':8s}: Delivered {out['frames'] / wall:6.1f} fps | "
+            f"Stream {t_stream * 1000 / frames:6.2f} ms/frame")
+    if stats:
+        line += f" | Wait {stats[0]:6.2f} ms | Codec {stats[1]:6.2f} ms ({stats[2]:.0f}%) | Dropped {stats[3]}"
+    print(line + f" | Decoded {decoded} (errors {errors})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs threaded encoder benchmark")
+    parser.add_argument("--scene", default="video", help="Synthetic scene")
+    parser.add_argument("--backend", default="", help="Real desktop capture (X11/MSS) instead of synthetic")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--src", default="1920x1080", help="Synthetic capture size")
+    parser.add_argument("--enc", default="1920x1080", help="Encoder size")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--bitrate", type=float, default=8.0, help="Mbps")
+    parser.add_argument("--codec", default="x264")
+    parser.add_argument("--preset", default="quality", help="fast/balanced/quality")
+    args = parser.parse_args()
+
+    src_w, src_h = (int(v) for v in args.src.split("x"))
+    enc_w, enc_h = (int(v) for v in args.enc.split("x"))
+
+    def make_source():
+        if args.backend:
+            return {"X11": X11ShmSource, "MSS": MSSSource}[args.backend](0)
+        return SyntheticSource(src_w, src_h, scene=args.scene)
+
+    print(f"--- ENCODER THREAD: {args.scene if not args.backend else args.backend} {args.src} -> {args.enc}, "
+          f"{args.codec} {args.preset}, {args.fps} FPS offered ---")
+    for depth in (0, 1, 2):
+        run(make_source(), args.frames, enc_w, enc_h, args.fps, args.bitrate, args.codec, args.preset, depth)
+    print("----------------")
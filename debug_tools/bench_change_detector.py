@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Allow "python debug_tools/bench_change_detector.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.change_detector import TileChangeDetector
+
+RESOLUTIONS = [("720p", 1280, 720), ("1080p", 1920, 1080), ("4K", 3840, 2160)]
+
+def time_it(func, frames, loops):
+    start = time.perf_counter()
+    for i in range(loops):
+        func(frames[i % len(frames)])
+    return (time.perf_counter() - start) * 1000 / loops
+
+def benchmark(name, width, height, loops=60):
+    print(f"--- BENCHMARK: {name} ({width}x{height}) ---")
+    base = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+
+    # Scenario A: static desktop (same content every frame)
+    static = [base, base.copy()]
+    # Scenario B: only a "clock" moved (small 80x20 area in a corner)
+    clock = []
+    for i in range(2):
+        f = base.copy()
+        f[height - 30:height - 10, width - 90:width - 10] = i * 100
+        clock.append(f)
+
+    for label, frames in (("static", static), ("clock", clock)):
+        # OLD: np.array_equal + frame.copy() on change
+        last = {"frame": None}
+        def old_dedup(frame):
+            if last["frame"] is None or not np.array_equal(frame, last["frame"]):
+                last["frame"] = frame.copy()
+        old_dedup(frames[0])
+        old_ms = time_it(old_dedup, frames, loops)
+
+        # NEW: Tile-Hash
+        detector = TileChangeDetector()
+        detector.detect(frames[0])
+        new_ms = time_it(detector.detect, frames, loops)
+        rects = detector.detect(frames[1])
+        detector.detect(frames[0])
+        rects = detector.detect(frames[1])
+
+        print(f"[{label:6}] array_equal+copy: {old_ms:6.2f} ms | tile-hash: {new_ms:6.2f} ms | dirty rects: {len(rects)}")
+
+    state_bytes = detector.prev_sigs.nbytes
+    print(f"Kept state: {state_bytes / 1024:.1f} KB (vs {base.nbytes / 1024 / 1024:.1f} MB frame copy)")
+    print("----------------")
+
+if __name__ == "__main__":
+    for name, w, h in RESOLUTIONS:
+        benchmark(name, w, h)
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import resource
+import tracemalloc
+import cv2
+import av
+
+# Allow "python debug_tools/bench_convert.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource
+from modules.frame_convert import FrameConverter
+
+# Scale + YUV420p conversion stage, before/after:
+#   BEFORE: cv2.resize (new array) -> VideoFrame.from_ndarray (new frame) -> swscale reformat (new frame)
+#   AFTER : FrameConverter (reused scaled/I420 buffers, pooled VideoFrames, no swscale)
+# Allocations are measured with tracemalloc (numpy buffers, transient peak per frame)
+# and minor page faults (fresh large allocations are mmap'ed and faulted in on every frame).
+
+def before(raw, fmt, size):
+    scaled = cv2.resize(raw, size)
+    return av.VideoFrame.from_ndarray(scaled, format=fmt).reformat(format="yuv420p")
+
+def measure(func, frames, loops):
+    func(frames[0]) # Warm-up (pool/buffer creation is not steady state)
+    tracemalloc.start()
+    transient = 0
+    faults_start = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    start = time.perf_counter()
+    for i in range(loops):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func(frames[i % len(frames)])
+        transient += tracemalloc.get_traced_memory()[1] - base
+    elapsed = time.perf_counter() - start
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults_start
+    tracemalloc.stop()
+    return elapsed * 1000 / loops, transient / loops / 1024, faults / loops
+
+def benchmark(src_size, enc_size, fmt="bgra", loops=100):
+    source = SyntheticSource(src_size[0], src_size[1], scene="video", pixel_format=fmt)
+    source.open()
+    frames = [source.grab().copy() for _ in range(3)]
+    converter = FrameConverter(enc_size[0], enc_size[1])
+
+    print(f"--- BENCHMARK: {fmt} {src_size[0]}x{src_size[1]} -> {enc_size[0]}x{enc_size[1]} ---")
+    for label, func in (("BEFORE", lambda f: before(f, fmt, enc_size)),
+                        ("AFTER ", lambda f: converter.convert(f, fmt))):
+        ms, kb, faults = measure(func, frames, loops)
+        print(f"{label}: {ms:6.2f} ms/frame | numpy alloc: {kb:8.1f} KB/frame | page faults: {faults:7.1f}/frame")
+
+if __name__ == "__main__":
+    benchmark((1920, 1080), (1280, 720))
+    benchmark((1920, 1080), (1920, 1080))
+    benchmark((3840, 2160), (1920, 1080))
+    print("----------------")
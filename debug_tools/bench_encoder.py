@@ -1,8 +1,14 @@
+import os
+import sys
 import av
 import time
 import numpy as np
 import cv2
 
+# Allow "python debug_tools/bench_encoder.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.codec_probe import CodecProbe
+
 def benchmark_encoder(width=1920, height=1080, codec_name='h264_nvenc'):
     print(f"--- BENCHMARK: {codec_name} ({width}x{height}) ---")
     
@@ -77,20 +83,19 @@ def benchmark_encoder(width=1920, height=1080, codec_name='h264_nvenc'):
     print("----------------")
 
 if __name__ == "__main__":
-    # Check Codecs: Just list common ones
-    print("Checking H.264 Codecs availability...")
-    candidates = ['h264_nvenc', 'h264_amf', 'libx264', 'h264_qsv']
-    for c_name in candidates:
-        try:
-            # Try to grab the codec wrapper
-            c = av.codec.Codec(c_name, 'w')
-            print(f" - {c.name}: Available")
-        except:
-            print(f" - {c_name}: Not Found")
+    # Check Codecs: opened + one frame encoded per size (not only "built in"), fresh run (cache not used)
+    print("Probing H.264 encoders...")
+    probe = CodecProbe(path=os.devnull, codecs=('h264_nvenc', 'h264_amf', 'libx264', 'h264_qsv'))
+    probe.probe(force=True)
+    for c_name in probe.codecs:
+        sizes = [s for s, ok in probe.results[c_name].items() if ok]
+        print(f" - {c_name}: {', '.join(sizes) if sizes else 'KO (' + probe.errors.get(c_name, '?') + ')'}")
             
-    # Test NVENC
-    print("\nTesting NVENC...")
-    benchmark_encoder(1920, 1080, 'h264_nvenc')
+    # Test the first working GPU encoder
+    gpu = [c for c in probe.working_codecs() if c != 'libx264']
+    if gpu:
+        print(f"\nTesting {gpu[0]}...")
+        benchmark_encoder(1920, 1080, gpu[0])
     
     # Test x264 (Fallback)
     # print("\nTesting x264 (CPU)...")
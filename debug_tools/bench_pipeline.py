@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+
+# Allow "python debug_tools/bench_pipeline.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource, FileReplaySource, MSSSource, X11ShmSource
+from modules.change_detector import TileChangeDetector
+from modules.congestion import congestion_decision, DROP, FLUSH_TCP
+from modules.stream_encoder import VideoEncoder
+
+# Headless pipeline run: Capture -> Dedup -> Scale/Convert + Encode -> Simulated TCP link
+# Deterministic sources make runs comparable between commits (no Windows desktop needed).
+# Recorded sessions (debug_tools/record_session.py) replay a real workload: --replay FILE
+# runs as fast as possible (max pipeline throughput), --realtime follows the recorded timing.
+# --cfr sends unchanged frames like the RTSP path (constant frame rate, skip frames on repeats).
+
+def run(source, frames, enc_w, enc_h, fps, bitrate_mbps, link_mbps, latency_value, codec, cursor=False, realtime=False, cfr=False):
+    source.open()
+    if cursor:
+        from modules.custom_utils import CursorOverlay
+    detector = TileChangeDetector()
+    encoder = VideoEncoder(enc_w, enc_h, fps, int(bitrate_mbps * 1e6), codec_choice=codec)
+
+    # Simulated network: queue of packet sizes drained at link_mbps (in simulated time)
+    link_queue = deque()
+    drain_per_frame = link_mbps * 1e6 / 8 / fps
+
+    t_cap = t_dedup = t_enc = 0.0
+    encoded = skipped = dropped = flushed = cursor_only = 0
+    repeats = repeat_bytes = 0
+    t_repeat = 0.0
+    last_cursor = None
+    content_stale = True
+    total_bytes = 0
+    grabbed = 0
+    t_start = next_tick = time.perf_counter()
+
+    for i in range(frames):
+        if realtime:
+            next_tick += 1.0 / fps
+            delay = next_tick - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+        t0 = time.perf_counter()
+        raw = source.grab()
+        t1 = time.perf_counter()
+        if raw is None: break
+        grabbed += 1
+        dirty = detector.detect(raw)
+        t2 = time.perf_counter()
+        t_cap += t1 - t0
+        t_dedup += t2 - t1
+
+        # Network drains one frame interval worth of bytes
+        budget = drain_per_frame
+        while link_queue and link_queue[0] <= budget:
+            budget -= link_queue.popleft()
+        if link_queue: link_queue[0] -= budget
+
+        overlay = None
+        if cursor:
+            cx, cy, shape = source.cursor_info()
+            rx = (cx - source.left) * enc_w // source.width
+            ry = (cy - source.top) * enc_h // source.height
+            if 0 <= rx < enc_w and 0 <= ry < enc_h: # Hidden/outside: no overlay
+                overlay = CursorOverlay(rx, ry, shape, max(0.5, enc_h / 720.0), source.pixel_format)
+            moved = (cx, cy) != last_cursor
+            last_cursor = (cx, cy)
+        else:
+            moved = False
+
+        if not dirty and not moved:
+            skipped += 1
+            if cfr and not content_stale:
+                # RTSP: the frame is still sent (CFR), as an all-skip P frame
+                t3 = time.perf_counter()
+                packets = encoder.encode(raw, source.pixel_format, overlay=overlay, content_changed=False, repeat=True)
+                t_repeat += time.perf_counter() - t3
+                for p in packets:
+                    size = len(bytes(p))
+                    total_bytes += size
+                    repeat_bytes += size
+                    link_queue.append(size)
+                repeats += 1
+            continue
+
+        action, _, _ = congestion_decision(latency_value, fps, len(link_queue), 0, True, False)
+        if action == DROP:
+            dropped += 1
+            if dirty: content_stale = True
+            continue
+        if action == FLUSH_TCP:
+            flushed += len(link_queue)
+            link_queue.clear()
+            encoder.force_next_keyframe()
+
+        t3 = time.perf_counter()
+        # Native layout straight to the encoder (scale + I420 stage + H.264)
+        content_changed = bool(dirty) or content_stale
+        if not content_changed: cursor_only += 1
+        packets = encoder.encode(raw, source.pixel_format, overlay=overlay, content_changed=content_changed)
+        content_stale = False
+        t_enc += time.perf_counter() - t3
+
+        for p in packets:
+            size = len(bytes(p))
+            total_bytes += size
+            link_queue.append(size)
+        encoded += 1
+
+    wall = time.perf_counter() - t_start
+    encoder.close()
+    source.close()
+
+    n = max(1, encoded)
+    frames = max(1, grabbed)
+    print(f"Frames: {frames} | Encoded: {encoded} (cursor-only: {cursor_only}) | Dedup skipped: {skipped} | "
+          f"Congestion dropped: {dropped} | Flushed pkts: {flushed}")
+    print(f"Per frame (ms): Cap {t_cap * 1000 / frames:.2f} | Dedup {t_dedup * 1000 / frames:.2f} | "
+          f"Scale+Conv+Enc {t_enc * 1000 / n:.2f}")
+    print(f"Output: {total_bytes / n / 1024:.1f} KB/frame | {total_bytes * 8 / 1e6 / (frames / fps):.2f} Mbps @ {fps} FPS")
+    if cfr:
+        print(f"CFR repeats: {repeats} (skip frames: {encoder.skipped_frames}) | "
+              f"{t_repeat * 1000 / max(1, repeats):.3f} ms, {repeat_bytes / max(1, repeats):.0f} B per repeat")
+    print(f"Throughput: {frames / wall:.1f} frames/s ({wall:.2f}s wall{', realtime' if realtime else ''})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless capture/dedup/encode/congestion benchmark")
+    parser.add_argument("--scene", default="all", help="static/scroll/video/all (synthetic source)")
+    parser.add_argument("--replay", default="", help="Raw frame file (FileReplaySource) instead of synthetic")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the recorded timing (default: as fast as possible)")
+    parser.add_argument("--backend", default="", help="Real desktop capture (X11/MSS) instead of synthetic")
+    parser.add_argument("--monitor", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--src", default="1920x1080", help="Synthetic capture size")
+    parser.add_argument("--enc", default="1280x720", help="Encoder size")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--bitrate", type=float, default=5.0, help="Encoder Mbps")
+    parser.add_argument("--link", type=float, default=20.0, help="Simulated link Mbps")
+    parser.add_argument("--latency", type=int, default=10, help="Latency slider 0-100")
+    parser.add_argument("--codec", default="x264")
+    parser.add_argument("--cursor", action="store_true", help="Moving cursor overlay (save-under path on static content)")
+    parser.add_argument("--cfr", action="store_true", help="Send unchanged frames (RTSP constant frame rate)")
+    args = parser.parse_args()
+
+    src_w, src_h = (int(v) for v in args.src.split("x"))
+    enc_w, enc_h = (int(v) for v in args.enc.split("x"))
+
+    if args.backend:
+        desktop = {"X11": X11ShmSource, "MSS": MSSSource}[args.backend]
+        sources = [(args.backend, desktop(args.monitor))]
+    elif args.replay:
+        sources = [("replay", FileReplaySource(args.replay, loop=True, realtime=args.realtime))]
+    else:
+        scenes = SyntheticSource.SCENES if args.scene == "all" else [args.scene]
+        sources = [(s, SyntheticSource(src_w, src_h, scene=s, cursor_motion=args.cursor)) for s in scenes]
+
+    for label, source in sources:
+        print(f"--- PIPELINE: {label} ({args.src} -> {args.enc}, {args.fps} FPS, link {args.link} Mbps) ---")
+        run(source, args.frames, enc_w, enc_h, args.fps, args.bitrate, args.link, args.latency, args.codec, args.cursor, args.realtime, args.cfr)
+        print("----------------")
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import cv2
+import av
+
+# Allow "python debug_tools/bench_pixel_format.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource
+from modules.buffer_pool import BufferPool
+from modules.frame_convert import FrameConverter
+
+# Per-frame conversion cost, capture layout -> yuv420p:
+#   BGR detour : native -> cvtColor(BGR) -> resize -> from_ndarray(bgr24) -> yuv420p   (2 color passes)
+#   Native     : native -> resize -> from_ndarray(native) -> yuv420p                   (1 swscale pass)
+#   Fused I420 : FrameConverter, what VideoEncoder runs (resize + OpenCV native -> I420 into pooled frames)
+# reformat('yuv420p') is the same swscale pass CodecContext.encode() runs internally.
+# swscale's BGRA/RGB input is slower than OpenCV's SIMD cvtColor: "Native" is slower at 1:1, within
+# noise at 1080p -> 720p and only a clear gain at 4K -> 1080p. Gains are vs the BGR detour (negative = slower).
+
+TO_BGR = {"bgra": cv2.COLOR_BGRA2BGR, "rgb24": cv2.COLOR_RGB2BGR}
+
+def old_path(raw, fmt, size):
+    bgr = cv2.cvtColor(raw, TO_BGR[fmt]) if fmt in TO_BGR else raw
+    bgr = cv2.resize(bgr, size)
+    return av.VideoFrame.from_ndarray(bgr, format="bgr24").reformat(format="yuv420p")
+
+def new_path(raw, fmt, size):
+    native = cv2.resize(raw, size)
+    return av.VideoFrame.from_ndarray(native, format=fmt).reformat(format="yuv420p")
+
+def benchmark(fmt, src_size, enc_size, loops=100):
+    source = SyntheticSource(src_size[0], src_size[1], scene="video", pixel_format=fmt)
+    source.open()
+    frames = [source.grab().copy() for _ in range(3)]
+    converter = FrameConverter(enc_size[0], enc_size[1], buffer_pool=BufferPool(), resize_method="bilinear")
+    fused_path = lambda raw, fmt, size: converter.convert(raw, fmt)
+    results = {}
+    for label, func in (("BGR detour", old_path), ("Native", new_path), ("Fused I420", fused_path)):
+        func(frames[0], fmt, enc_size) # Warm-up
+        start = time.perf_counter()
+        for i in range(loops):
+            func(frames[i % 3], fmt, enc_size)
+        results[label] = (time.perf_counter() - start) * 1000 / loops
+    base = results["BGR detour"]
+    line = f"[{fmt:5}] {src_size[0]}x{src_size[1]} -> {enc_size[0]}x{enc_size[1]} | BGR detour: {base:6.2f} ms"
+    for label in ("Native", "Fused I420"):
+        gain = base - results[label]
+        line += f" | {label}: {results[label]:6.2f} ms ({gain / base * 100:+.0f}%)"
+    print(line)
+
+if __name__ == "__main__":
+    print("--- BENCHMARK: Capture layout -> YUV420p ---")
+    for fmt in ("bgra", "rgb24"):
+        for src, enc in (((1920, 1080), (1280, 720)), ((1920, 1080), (1920, 1080)), ((3840, 2160), (1920, 1080))):
+            benchmark(fmt, src, enc)
+    print("----------------")
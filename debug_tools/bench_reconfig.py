@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import argparse
+
+# Allow "python debug_tools/bench_reconfig.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource, MSSSource, X11ShmSource
+from modules.stream_encoder import VideoEncoder
+
+# Stall per settings change, as done by stream_thread_func:
+#   live bitrate : VideoEncoder.set_bitrate() on the open context (no IDR)
+#   new encoder  : FPS change / bitrate outside the live range (capture and buffers keep running)
+#   full rebuild : capture source + encoder torn down and re-created (resolution, codec, monitor)
+# Stall = time from the change to the first packet of the next frame. "IDR" = that frame is a keyframe.
+# A new context at a higher FPS re-calibrates the 'auto' resize method (smaller time budget).
+
+def first_frame(encoder, source):
+    raw = source.grab()
+    t0 = time.perf_counter()
+    packets = []
+    while not packets:
+        packets = encoder.encode(raw, source.pixel_format)
+    return time.perf_counter() - t0, packets
+
+def steady(encoder, source, frames):
+    for _ in range(frames):
+        encoder.encode(source.grab(), source.pixel_format)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stall time per encoder settings change")
+    parser.add_argument("--scene", default="scroll", help="Synthetic scene")
+    parser.add_argument("--backend", default="", help="Real desktop capture (X11/MSS) instead of synthetic")
+    parser.add_argument("--src", default="1920x1080", help="Synthetic capture size")
+    parser.add_argument("--enc", default="1280x720", help="Encoder size")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--bitrate", type=float, default=5.0, help="Mbps")
+    parser.add_argument("--codec", default="x264")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    src_w, src_h = (int(v) for v in args.src.split("x"))
+    enc_w, enc_h = (int(v) for v in args.enc.split("x"))
+
+    def make_source():
+        if args.backend:
+            return {"X11": X11ShmSource, "MSS": MSSSource}[args.backend](0)
+        return SyntheticSource(src_w, src_h, scene=args.scene)
+
+    def make_encoder(fps, mbps, pts=0, resize_method="auto"):
+        return VideoEncoder(enc_w, enc_h, fps, int(mbps * 1e6), codec_choice=args.codec, initial_pts=pts, resize_method=resize_method)
+
+    source = make_source()
+    source.open()
+    encoder = make_encoder(args.fps, args.bitrate)
+    steady(encoder, source, 30)
+    results = {"live bitrate": [], "new encoder (FPS down)": [], "new encoder (FPS up)": [], "full rebuild": []}
+
+    for i in range(args.runs):
+        mbps = args.bitrate * (0.75 if i % 2 == 0 else 1.0) # Down, then back up (inside the live range)
+        t0 = time.perf_counter()
+        live = encoder.set_bitrate(int(mbps * 1e6))
+        dt, packets = first_frame(encoder, source)
+        results["live bitrate"].append((time.perf_counter() - t0 if live else float("nan"), packets[0].is_keyframe))
+        steady(encoder, source, 10)
+
+        for fps, name in ((args.fps // 2, "new encoder (FPS down)"), (args.fps, "new encoder (FPS up)")):
+            t0 = time.perf_counter()
+            old = encoder
+            resize_method = old.active_resize_method if fps <= old.fps else "auto" # Same rule as stream_thread_func
+            encoder = make_encoder(fps, args.bitrate, int(round(old.frame_count * fps / old.fps)), resize_method)
+            old.close()
+            source.set_fps(fps)
+            dt, packets = first_frame(encoder, source)
+            results[name].append((time.perf_counter() - t0, packets[0].is_keyframe))
+            steady(encoder, source, 10)
+
+        t0 = time.perf_counter()
+        encoder.close()
+        source.close()
+        source = make_source()
+        source.open()
+        encoder = make_encoder(args.fps, args.bitrate)
+        dt, packets = first_frame(encoder, source)
+        results["full rebuild"].append((time.perf_counter() - t0, packets[0].is_keyframe))
+        steady(encoder, source, 10)
+
+    encoder.close()
+    source.close()
+    print(f"--- RECONFIG: {source.name} {args.src} -> {args.enc}, {args.codec} ({encoder.codec_name}) ---")
+    for name, runs in results.items():
+        stalls = sorted(r[0] * 1000 for r in runs)
+        idr = sum(1 for r in runs if r[1])
+        print(f"{name:22s}: stall {stalls[len(stalls) // 2]:7.2f} ms (median) | max {stalls[-1]:7.2f} ms | IDR {idr}/{len(runs)}")
+    print("----------------")
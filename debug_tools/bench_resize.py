@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+
+# Allow "python debug_tools/bench_resize.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource, FileReplaySource
+from modules.resize_engine import evaluate_resize, select_resize_method
+
+# Resize algorithms side by side, per ratio: time (ms/frame), encoded size of the scaled frame
+# (fixed-QP H.264 intra = bits the aliasing costs) and PSNR vs the alias-free 'area' output.
+# The last line is what 'auto' would pick for the given FPS budget.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resize engine benchmark (ms, encoded bytes, PSNR)")
+    parser.add_argument("--scene", default="scroll", help="Synthetic scene (scroll = text, where aliasing shows; static has no text)")
+    parser.add_argument("--replay", default="", help="Raw frame file (recorded session) instead of synthetic")
+    parser.add_argument("--frame", type=int, default=0, help="Frame index in the replay file")
+    parser.add_argument("--src", default="1920x1080", help="Synthetic capture size")
+    parser.add_argument("--enc", default="1280x720,960x540,640x360", help="Encoder sizes (comma separated)")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.replay:
+        source = FileReplaySource(args.replay, loop=False)
+        source.open()
+        frame = source.frames[min(args.frame, len(source.frames) - 1)]
+    else:
+        src_w, src_h = (int(v) for v in args.src.split("x"))
+        source = SyntheticSource(src_w, src_h, scene=args.scene)
+        source.open()
+        frame = source.grab()
+    fmt = source.pixel_format
+    budget_ms = 1000.0 / args.fps * 0.25
+
+    for size in args.enc.split(","):
+        dst = tuple(int(v) for v in size.split("x"))
+        print(f"--- RESIZE: {frame.shape[1]}x{frame.shape[0]} -> {dst[0]}x{dst[1]} ({fmt}) ---")
+        for r in evaluate_resize(frame, fmt, dst, runs=args.runs):
+            print(f"{r['method']:9s}: {r['ms']:6.2f} ms/frame | {r['bytes'] / 1024:7.1f} KB/frame | PSNR {r['psnr']:6.1f} dB")
+        method, _ = select_resize_method(frame, fmt, dst, budget_ms)
+        print(f"auto     : {method} (budget {budget_ms:.1f} ms @ {args.fps} FPS)")
+    source.close()
+    print("----------------")
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import av
+
+# Allow "python debug_tools/bench_simulcast.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import SyntheticSource, MSSSource, X11ShmSource
+from modules.change_detector import TileChangeDetector
+from modules.stream_encoder import VideoEncoder
+from modules.simulcast import Simulcast
+
+# One capture -> main encoder + simulcast renditions, frames offered at --fps (dedup like the capture stage).
+#   shared      : renditions fed from the main's scaled picture / I420 (run_pipeline)
+#   independent : each rendition scales the full capture itself (baseline)
+# Stream = stream thread time per frame (main encode + renditions' conversions), per rendition: FPS, Mbps, decode check.
+# Rendition spec: name:resolution:mbps:fps, e.g. "mobile:480p:1.5:30" ("main" size: resolution "same").
+
+def parse(spec):
+    name, res, mbps, fps = spec.split(":")
+    out = {"name": name, "bitrate_mbps": float(mbps), "fps": int(fps)}
+    if res != "same": out["resolution"] = res
+    return out
+
+def run(source, frames, enc_w, enc_h, fps, mbps, codec, specs, shared):
+    lock = threading.Lock()
+    out = {}
+
+    def sink(packets, name):
+        with lock:
+            entry = out.setdefault(name, [0, []])
+            entry[0] += 1
+            entry[1].extend(bytes(p) for p in packets)
+
+    main = VideoEncoder(enc_w, enc_h, fps, int(mbps * 1e6), codec_choice=codec)
+    simulcast = Simulcast(sink)
+    simulcast.configure(specs, [s["name"] for s in specs], main, codec, "fast")
+    simulcast.set_active({s["name"] for s in specs})
+    detector = TileChangeDetector()
+    source.open()
+
+    t_stream = 0.0
+    last = {}
+    t_start = next_tick = time.perf_counter()
+    for _ in range(frames):
+        next_tick += 1.0 / fps
+        delay = next_tick - time.perf_counter()
+        if delay > 0: time.sleep(delay)
+        raw = source.grab()
+        now = time.perf_counter()
+        changed = bool(detector.detect(raw))
+        if changed or not out:
+            sink(main.encode(raw, source.pixel_format), "main")
+            if shared:
+                simulcast.feed(main, raw, source.pixel_format, True, (), now)
+            else:
+                for name, r in simulcast.renditions.items():
+                    if name in last and now - last[name] < r.period * 0.75: continue
+                    r.encoder.encode(raw, source.pixel_format)
+                    last[name] = now
+        t_stream += time.perf_counter() - now
+    simulcast.drain()
+    wall = time.perf_counter() - t_start
+    simulcast.close()
+    main.close()
+    source.close()
+
+    print(f"{'shared' if shared else 'independent':11s}: Stream {t_stream * 1000 / frames:6.2f} ms/frame")
+    for name, (count, packets) in out.items():
+        decoder = av.codec.CodecContext.create("h264", "r")
+        decoded = errors = 0
+        size = None
+        for data in packets:
+            try:
+                for f in decoder.decode(av.Packet(data)):
+                    decoded += 1
+                    size = (f.width, f.height)
+            except Exception: errors += 1
+        total = sum(len(p) for p in packets)
+        print(f"   {name:10s}: {size[0] if size else 0}x{size[1] if size else 0} | {count / wall:5.1f} fps | "
+              f"{total * 8 / 1e6 / wall:5.2f} Mbps | Decoded {decoded} (errors {errors})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulcast (one capture, several renditions) benchmark")
+    parser.add_argument("--scene", default="video", help="Synthetic scene")
+    parser.add_argument("--backend", default="", help="Real desktop capture (X11/MSS) instead of synthetic")
+    parser.add_argument("--frames", type=int, default=240)
+    parser.add_argument("--src", default="1920x1080", help="Synthetic capture size")
+    parser.add_argument("--enc", default="1280x720", help="Main encoder size")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--bitrate", type=float, default=5.0, help="Main Mbps")
+    parser.add_argument("--codec", default="x264")
+    parser.add_argument("--rendition", action="append", default=[], help="name:resolution:mbps:fps (repeatable)")
+    args = parser.parse_args()
+
+    src_w, src_h = (int(v) for v in args.src.split("x"))
+    enc_w, enc_h = (int(v) for v in args.enc.split("x"))
+    specs = [parse(s) for s in (args.rendition or ["mobile:480p:1.5:30", "lowlat:same:2.0:60"])]
+
+    def make_source():
+        if args.backend:
+            return {"X11": X11ShmSource, "MSS": MSSSource}[args.backend](0)
+        return SyntheticSource(src_w, src_h, scene=args.scene)
+
+    print(f"--- SIMULCAST: {args.scene if not args.backend else args.backend} {args.src} -> main {args.enc} "
+          f"{args.bitrate} Mbps @ {args.fps} FPS | {', '.join(s['name'] for s in specs)} ---")
+    for shared in (True, False):
+        run(make_source(), args.frames, enc_w, enc_h, args.fps, args.bitrate, args.codec, specs, shared)
+    print("----------------")
@@ -0,0 +1,47 @@
+import os
+import sys
+import argparse
+
+# Allow "python debug_tools/check_resize_auto.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.buffer_pool import BufferPool
+from modules.capture_sources import SyntheticSource
+from modules.pipeline import CaptureWorker, LatestFrameSlot
+from modules import resize_engine
+
+# 'auto' resize calibration on a LIVE capture buffer, as FrameConverter runs it: the CaptureWorker keeps
+# grabbing (and rewriting its ring) while the calibration measures every method for hundreds of ms.
+# At a non-integer ratio 'integer' falls back to INTER_AREA: its output must be identical to the
+# 'area' reference (361 dB). A lower PSNR means the methods were measured on different frames.
+
+def check(source, enc_size, fps):
+    slot = LatestFrameSlot()
+    worker = CaptureWorker(source, slot, fps)
+    worker.start()
+    try:
+        item = None
+        while item is None: item = slot.get(timeout=1.0)
+        resize_engine._auto_cache.clear() # Calibrate again for every size
+        method, results = resize_engine.cached_resize_method(item.raw, item.pixel_format, enc_size, 1000.0 / fps * 0.25)
+    finally:
+        worker.stop()
+    psnr = {r["method"]: r["psnr"] for r in results}
+    print(f"{source.width}x{source.height} -> {enc_size[0]}x{enc_size[1]}: auto -> {method} | " +
+          " | ".join(f"{m}: {v:.1f}dB" for m, v in psnr.items()))
+    ratio = source.width / enc_size[0]
+    if ratio != int(ratio):
+        assert psnr["integer"] > 100, "'integer' differs from 'area': calibration saw several frames"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="'auto' resize calibration against a live capture")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for _ in range(args.runs):
+        for enc_size in ((1280, 720), (960, 540), (640, 360)):
+            source = SyntheticSource(1920, 1080, scene="scroll", scroll_px=8, buffer_pool=BufferPool())
+            source.open()
+            check(source, enc_size, args.fps)
+            source.close()
+    print("OK")
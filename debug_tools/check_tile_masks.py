@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+import cv2
+
+# Allow "python debug_tools/check_tile_masks.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.change_detector import TileChangeDetector, ChangeFilter, scale_rects
+from modules.tile_codec import TileEncoder, apply_tiles
+
+# Ignore masks + lossless tile mode, same chain as run_pipeline (capture stage filter -> TileEncoder -> receiver canvas):
+#   1. only the masked clock changes : nothing is sent
+#   2. a real change elsewhere       : the receiver shows the real change AND the current clock
+# Run at capture size and with a downscale (dirty rects mapped to the encoder size).
+
+def check(src_w, src_h, enc_w, enc_h):
+    detector = TileChangeDetector()
+    clock = (src_w - 200, src_h - 40, 160, 30)
+    change_filter = ChangeFilter(tile_size=detector.tile_size, masks=[clock])
+    tiles = TileEncoder(enc_w, enc_h)
+    frame = np.full((src_h, src_w, 4), 90, np.uint8)
+    canvas = None
+
+    def tick(now):
+        nonlocal canvas
+        rects = change_filter.apply(detector.detect(frame), src_w, src_h, now)
+        if not rects and canvas is not None: return 0
+        dirty = None if canvas is None else scale_rects(change_filter.with_masks(rects), enc_w / src_w, enc_h / src_h, enc_w, enc_h)
+        messages = tiles.encode(frame, "bgra", dirty_rects=dirty)
+        for msg in messages: canvas = apply_tiles(canvas, msg)
+        return len(messages)
+
+    tick(0.0) # First frame: full canvas
+    x, y, w, h = clock
+    frame[y:y + h, x:x + w] = 250 # Clock tick only
+    assert tick(0.1) == 0, "masked change was posted"
+    frame[100:300, 100:400] = 10 # Real change
+    assert tick(0.2) == 1, "real change was not posted"
+    expected = cv2.cvtColor(cv2.resize(frame, (enc_w, enc_h), interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2RGB)
+    error = np.abs(canvas.astype(np.int16) - expected).max()
+    print(f"{src_w}x{src_h} -> {enc_w}x{enc_h}: receiver max error {error}")
+    assert error <= 1, "receiver canvas differs from the captured frame (masked area missing?)"
+
+if __name__ == "__main__":
+    check(1920, 1080, 1920, 1080)
+    check(1920, 1080, 1280, 720)
+    print("OK")
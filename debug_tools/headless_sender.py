@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import socket
+import struct
+import logging
+import argparse
+import threading
+
+# Allow "python debug_tools/headless_sender.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.config import state, DEFAULT_PORT
+from modules.core import stream_thread_func
+
+# Full sender path without GUI: real capture backend -> engine (dedup/encode) -> TCP -> drain client.
+# Linux agents (X11 MIT-SHM backend) under a virtual display:
+#   xvfb-run -s "-screen 0 1920x1080x24" python debug_tools/headless_sender.py --backend X11
+# Nothing is saved to stream_config.json.
+
+def drain_client(stop, stats):
+    """Minimal receiver: APP protocol ([Size (4 bytes)] + [Data]), payload discarded."""
+    sock = None
+    while not stop.is_set() and sock is None:
+        try:
+            sock = socket.create_connection(("127.0.0.1", DEFAULT_PORT), timeout=1.0)
+        except OSError:
+            time.sleep(0.2)
+    if sock is None: return
+
+    def read_exact(n):
+        data = b""
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk: raise ConnectionError("Sender closed the connection")
+            data += chunk
+        return data
+
+    try:
+        while not stop.is_set():
+            size, = struct.unpack(">L", read_exact(4))
+            read_exact(size)
+            stats["packets"] += 1
+            stats["bytes"] += size + 4
+    except Exception as e:
+        if not stop.is_set(): print(f"Client: {e}")
+    finally:
+        sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless sender (capture -> encode -> TCP) benchmark")
+    parser.add_argument("--backend", default="X11", help="X11/MSS/DXCam/Synthetic/Replay")
+    parser.add_argument("--scene", default="scroll", help="Synthetic scene")
+    parser.add_argument("--replay", default="", help="Raw frame file (Replay backend)")
+    parser.add_argument("--monitor", type=int, default=0)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--bitrate", type=float, default=5.0)
+    parser.add_argument("--resolution", default="720p", help="360p/480p/720p/1080p/Native")
+    parser.add_argument("--codec", default="x264")
+    parser.add_argument("--async-depth", type=int, default=0, help="Encoder thread queue (0 = encode in the stream thread)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    sizes = {"360p": (640, 360), "480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080), "Native": (0, 0)}
+    state.backend = args.backend
+    state.synthetic_scene = args.scene
+    state.replay_path = args.replay
+    state.monitor_idx = args.monitor
+    state.fps = args.fps
+    state.bitrate_mbps = args.bitrate
+    state.resolution = args.resolution
+    state.target_w, state.target_h = sizes[args.resolution]
+    state.codec_choice = args.codec
+    state.encode_async_depth = args.async_depth
+    state.rtsp_mode = False
+    state.compatibility_mode = False
+    state.streaming = True
+
+    stop = threading.Event()
+    stats = {"packets": 0, "bytes": 0}
+    engine = threading.Thread(target=stream_thread_func, daemon=True)
+    engine.start()
+    client = threading.Thread(target=drain_client, args=(stop, stats), daemon=True)
+    client.start()
+
+    try:
+        for _ in range(args.seconds):
+            before = dict(stats)
+            time.sleep(1.0)
+            util = state.stage_util
+            print(f"RX: {stats['packets'] - before['packets']} pkt/s | {(stats['bytes'] - before['bytes']) * 8 / 1e6:.2f} Mbps | "
+                  f"Engine FPS: {state.current_fps} | Util Cap:{util.get('capture', 0):.0f}% Enc:{util.get('encode', 0):.0f}%")
+    finally:
+        stop.set()
+        state.streaming = False
+        engine.join(timeout=3.0)
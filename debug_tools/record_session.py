@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Allow "python debug_tools/record_session.py" from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.capture_sources import create_capture_source, RawFrameWriter
+from modules.change_detector import TileChangeDetector
+
+# Records a real desktop session (frames + timestamps + cursor) into a raw frame file,
+# replayed offline by FileReplaySource / bench_pipeline.py --replay (no Windows session needed).
+# Only frames whose content or cursor changed are written: realtime replay keeps the
+# previous frame on screen in between, exactly like the capture stage.
+#   python debug_tools/record_session.py --backend DXCam --seconds 30 --out session.raw
+#   python debug_tools/bench_pipeline.py --replay session.raw --cursor            (max speed)
+#   python debug_tools/bench_pipeline.py --replay session.raw --cursor --realtime (recorded timing)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Desktop session recorder (raw frames + timestamps + cursor)")
+    parser.add_argument("--backend", default="DXCam", help="DXCam/MSS/X11")
+    parser.add_argument("--monitor", type=int, default=0)
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--out", default="session.raw")
+    parser.add_argument("--all", action="store_true", help="Also write unchanged frames")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    from modules.custom_utils import monitor_registry
+    source = create_capture_source(args.backend, args.monitor, args.fps, dxcam_mapping=monitor_registry.dxcam_mapping(), event_driven=True)
+    writer = None
+    detector = TileChangeDetector()
+    last_cursor = None
+    grabs = written = 0
+    period = 1.0 / args.fps
+
+    print(f"Recording {source.name} {source.width}x{source.height} for {args.seconds}s -> {args.out}")
+    try:
+        t_end = time.perf_counter() + args.seconds
+        next_tick = time.perf_counter()
+        while time.perf_counter() < t_end:
+            t0 = time.perf_counter()
+            if source.poll_damage() != [] or writer is None:
+                raw = source.grab()
+                if raw is not None:
+                    grabs += 1
+                    if writer is None:
+                        writer = RawFrameWriter(args.out, raw.shape[1], raw.shape[0], source.pixel_format, args.fps)
+                    cx, cy, _ = source.cursor_info()
+                    cursor = (cx - source.left, cy - source.top)
+                    if not (0 <= cursor[0] < source.width and 0 <= cursor[1] < source.height): cursor = None
+                    if detector.detect(raw) or cursor != last_cursor or args.all:
+                        writer.write(raw, t0, cursor)
+                        last_cursor = cursor
+                        written += 1
+
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            else: next_tick = time.perf_counter()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+        if writer: writer.close()
+
+    size = os.path.getsize(args.out) if writer else 0
+    print(f"Grabs: {grabs} | Written: {written} | {size / 1024 / 1024:.1f} MB")
@@ -0,0 +1,799 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import logging
+import numpy as np
+import cv2
+from modules.buffer_pool import frame_pool
+
+logger = logging.getLogger("SenderGUI")
+
+# --- CAPTURE SOURCES ---
+# Every capture backend exposes the same small interface:
+#   open() / grab() / close()
+#   pixel_format : native memory layout of grab() ('bgra', 'rgb24', 'bgr24')
+#   left, top, width, height : geometry of the captured area in desktop coordinates (cursor mapping)
+# grab() returns the NATIVE buffer (HxWxC uint8, no conversion) or None if no frame is ready.
+# A returned buffer must stay valid (not be rewritten) during the next 2 grab() calls:
+# the capture stage runs ahead of the encode stage (see modules/pipeline.py).
+# Backend libraries (dxcam, mss) are imported lazily so the module loads on any OS.
+# Event-driven backends also implement poll_damage() (see CaptureWorker): the capture stage
+# then grabs only when the OS reports a change, and uses the damage as the dirty set.
+# Backends that learn the damage while grabbing (DXGI dirty rects) implement grab_damage() instead.
+
+PIXEL_CHANNELS = {"bgra": 4, "rgb24": 3, "bgr24": 3}
+
+
+# --- CAPTURE REGION ---
+# Limits the GRAB itself (fewer bytes read, converted and compared), not a crop after capture.
+def clip_region(rect, monitor):
+    """
+    Intersects a desktop rectangle with a monitor, with even width/height (I420).
+    :param rect: (left, top, width, height) in desktop coordinates
+    :param monitor: (left, top, width, height) of the monitor
+    :return: (left, top, width, height) or None if empty
+    """
+    ml, mt, mw, mh = monitor
+    left, top = max(rect[0], ml), max(rect[1], mt)
+    right, bottom = min(rect[0] + rect[2], ml + mw), min(rect[1] + rect[3], mt + mh)
+    w, h = (right - left) & ~1, (bottom - top) & ~1
+    if w < 16 or h < 16: return None
+    return left, top, w, h
+
+
+class CaptureRegion:
+    """
+    Part of a monitor to capture.
+      'Monitor' : Whole monitor
+      'Rect'    : Fixed rectangle (x, y, w, h) relative to the monitor
+      'Window'  : Window tracked by handle or title (its position is followed while streaming)
+    """
+    MODES = ("Monitor", "Rect", "Window")
+
+    def __init__(self, mode="Monitor", rect=None, window=""):
+        self.mode = mode if mode in self.MODES else "Monitor"
+        self.rect = rect
+        self.window = window
+        self.hwnd = None
+
+    @property
+    def active(self):
+        return self.mode != "Monitor"
+
+    @property
+    def tracking(self):
+        return self.mode == "Window"
+
+    def resolve(self, monitor):
+        """Current (left, top, width, height) in desktop coordinates, None = whole monitor / not found."""
+        if self.mode == "Rect" and self.rect:
+            x, y, w, h = self.rect
+            return clip_region((monitor[0] + x, monitor[1] + y, w, h), monitor)
+        if self.mode == "Window" and self.window:
+            from modules.custom_utils import find_window, get_window_rect
+            if not self.hwnd: self.hwnd = find_window(self.window)
+            rect = get_window_rect(self.hwnd)
+            if rect is None: return None
+            return clip_region(rect, monitor)
+        return None
+
+
+class CaptureSource:
+    name = "Base"
+    pixel_format = "bgr24"
+
+    def __init__(self, region=None):
+        self.left = 0
+        self.top = 0
+        self.width = 0
+        self.height = 0
+        self.region = region # CaptureRegion or None (desktop backends only)
+        self.monitor_geometry = None # Whole monitor when a region is applied (see _open_region)
+
+    @property
+    def geometry(self):
+        return self.left, self.top, self.width, self.height
+
+    @property
+    def region_active(self):
+        """True if only part of the monitor is captured."""
+        return self.monitor_geometry is not None and self.monitor_geometry != self.geometry
+
+    def _open_region(self, monitor):
+        """Applies the region at open(): sets left/top/width/height (whole monitor if no region)."""
+        self.monitor_geometry = monitor
+        area = self.region.resolve(monitor) if self.region and self.region.active else None
+        if area is None:
+            if self.region and self.region.active:
+                logger.warning(f"Capture region ({self.region.mode}) not found, capturing the whole monitor.")
+            area = monitor
+        self.left, self.top, self.width, self.height = area
+
+    def open(self):
+        raise NotImplementedError
+
+    def grab(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def set_fps(self, fps):
+        """Live frame rate change. Polled sources are paced by the capture stage: nothing to do."""
+        pass
+
+    def poll_damage(self):
+        """
+        Changes reported by the OS since the last call (non-blocking).
+        :return: None = no damage info (grab + compare every tick), [] = nothing changed (no grab),
+                 [(x, y, w, h), ...] = changed areas relative to the captured area
+        """
+        return None
+
+    def grab_damage(self):
+        """
+        Changes reported by the OS for the frame returned by the last grab().
+        :return: None = unknown (the capture stage compares the frame), [] = only the cursor moved,
+                 [(x, y, w, h), ...] = changed areas relative to the captured area
+        """
+        return None
+
+    def _damage_to_local(self, rects):
+        """Desktop damage rects -> clipped rects relative to the captured area."""
+        out = []
+        for x, y, w, h in rects:
+            x0, y0 = max(x - self.left, 0), max(y - self.top, 0)
+            x1, y1 = min(x + w - self.left, self.width), min(y + h - self.top, self.height)
+            if x1 > x0 and y1 > y0: out.append((x0, y0, x1 - x0, y1 - y0))
+        return out
+
+    def cursor_position(self):
+        """Absolute desktop cursor position (x, y). Default: real system cursor."""
+        from modules.custom_utils import get_cursor_pos_fast
+        return get_cursor_pos_fast()
+
+    def cursor_info(self):
+        """(x, y, cursor shape handle or None). Default: real system cursor (GetCursorInfo)."""
+        from modules.custom_utils import get_cursor_info
+        return get_cursor_info()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- WINDOWS / DESKTOP BACKENDS ---
+class MSSSource(CaptureSource):
+    name = "MSS"
+    pixel_format = "bgra"
+
+    def __init__(self, monitor_idx=0, region=None):
+        super().__init__(region)
+        self.monitor_idx = monitor_idx
+        self.sct = None
+        self.monitor = None
+
+    def open(self):
+        import mss
+        self.sct = mss.mss()
+        mon_id = self.monitor_idx + 1 # mss monitors: 0=All, 1=1st, 2=2nd...
+        if mon_id >= len(self.sct.monitors):
+            self.close()
+            raise ValueError(f"MSS: monitor {self.monitor_idx} not found")
+        m = self.sct.monitors[mon_id]
+        self._open_region((m["left"], m["top"], m["width"], m["height"]))
+        # mss grabs any desktop rectangle: only the region is read (BitBlt of w x h)
+        self.monitor = {"left": self.left, "top": self.top, "width": self.width, "height": self.height}
+
+    def _follow_window(self):
+        # Window moved: follow its position (size is fixed until the next stream re-init)
+        area = self.region.resolve(self.monitor_geometry)
+        if area is None: return # Minimized/closed: keep the last position
+        ml, mt, mw, mh = self.monitor_geometry
+        self.left = min(max(area[0], ml), ml + mw - self.width)
+        self.top = min(max(area[1], mt), mt + mh - self.height)
+        self.monitor["left"], self.monitor["top"] = self.left, self.top
+
+    def grab(self):
+        if self.sct is None: return None
+        if self.region_active and self.region.tracking: self._follow_window()
+        img = self.sct.grab(self.monitor)
+        # [OPTIM] Zero-copy view on the native BGRA memory (np.array(img) was a full copy)
+        return np.frombuffer(img.raw, dtype=np.uint8).reshape(img.height, img.width, 4)
+
+    def close(self):
+        if self.sct:
+            try: self.sct.close()
+            except: pass
+        self.sct = None
+
+
+class DXCamSource(CaptureSource):
+    name = "DXCam"
+    pixel_format = "bgra" # Native DXGI layout: dxcam does no cvtColor (no per-frame conversion buffer)
+
+    def __init__(self, monitor_idx=0, fps=60, output_idx=None, region=None, event_driven=False, buffer_pool=None):
+        """
+        :param monitor_idx: GUI monitor index (mss order)
+        :param fps: Target capture FPS (video_mode)
+        :param output_idx: DXCam output index (see map_dxcam_monitors), defaults to monitor_idx
+        :param region: CaptureRegion (resolved once at open: DXCam regions are fixed while running)
+        :param event_driven: No capture thread: grab() asks Desktop Duplication for a NEW frame
+                             and returns None when the desktop was not updated (nothing copied).
+                             The DXGI dirty/move rects of each frame are given by grab_damage()
+        :param buffer_pool: BufferPool of the event-driven ring (default: global frame_pool)
+        """
+        super().__init__(region)
+        self.buffer_pool = buffer_pool or frame_pool
+        self.monitor_idx = monitor_idx
+        self.fps = fps
+        self.output_idx = monitor_idx if output_idx is None else output_idx
+        self.event_driven = event_driven
+        self.camera = None
+        self.grab_region = None
+        self.damage_reader = None # DXGIFrameDamage (event-driven mode)
+        self._hooked = None       # dxcam duplicator whose release_frame is wrapped
+        self._damage = None       # Output rects read before the last release
+        self._frame_damage = None # grab_damage() of the last grab
+
+    def open(self):
+        import dxcam
+        from modules.custom_utils import get_monitor_geometry
+        self.camera = dxcam.create(output_idx=self.output_idx, output_color="BGRA")
+        geo = get_monitor_geometry(self.monitor_idx)
+        ml, mt = (geo[0], geo[1]) if geo else (0, 0)
+        self._open_region((ml, mt, self.camera.width, self.camera.height))
+        # DXCam region: (left, top, right, bottom) relative to the output, cropped by dxcam on the mapped surface
+        region = None
+        if self.region_active:
+            x, y = self.left - ml, self.top - mt
+            region = (x, y, x + self.width, y + self.height)
+        self.grab_region = region
+        if not self.event_driven:
+            self.camera.start(region=region, target_fps=self.fps, video_mode=True)
+        else:
+            try: self.damage_reader = DXGIFrameDamage()
+            except Exception as e: logger.warning(f"DXCam: dirty rects unavailable ({e}), frames are compared.")
+
+    def _hook_damage(self):
+        """
+        DXGI dirty/move rects are only readable while the frame is held: dxcam's release_frame
+        is wrapped to read them just before the frame is released (dxcam re-creates its
+        duplicator after a mode change, hence the check at every grab).
+        """
+        dup = getattr(self.camera, "_duplicator", None)
+        if dup is None or dup is self._hooked: return
+        self._hooked = dup
+        if self.damage_reader is None or getattr(dup, "duplicator", None) is None or not hasattr(dup, "release_frame"):
+            return # WinRT backend / other dxcam version: frames are compared
+        if getattr(self.camera, "rotation_angle", 0):
+            return # Rects are in the unrotated desktop image
+        release = dup.release_frame
+        def release_frame(*args, **kwargs):
+            if getattr(dup, "_frame_held", True):
+                try: self._damage = self.damage_reader.read(dup.duplicator)
+                except Exception: self._damage = None
+            return release(*args, **kwargs)
+        dup.release_frame = release_frame
+
+    def grab(self):
+        if self.camera is None: return None
+        if not self.event_driven:
+            return self.camera.get_latest_frame()
+        self._hook_damage()
+        self._damage = None
+        # AcquireNextFrame: None if DXGI reports no update since the last grab
+        frame = self.camera.grab(region=self.grab_region)
+        damage, self._damage = self._damage, None
+        if frame is None: return None
+        # Output coordinates -> desktop -> captured area
+        ml, mt = self.monitor_geometry[:2]
+        self._frame_damage = None if damage is None else self._damage_to_local([(x + ml, y + mt, w, h) for x, y, w, h in damage])
+        # Our own ring (the 2-grab validity contract does not depend on dxcam internals)
+        buf = self.buffer_pool.get(frame.shape, tag="capture.dxcam", depth=3)
+        np.copyto(buf, frame)
+        return buf
+
+    def grab_damage(self):
+        return self._frame_damage
+
+    def set_fps(self, fps):
+        """Video mode: restarts the dxcam capture thread at the new rate (same duplication, no re-create)."""
+        self.fps = fps
+        if self.camera is not None and not self.event_driven:
+            self.camera.stop()
+            self.camera.start(region=self.grab_region, target_fps=self.fps, video_mode=True)
+
+    def close(self):
+        if self.camera:
+            if not self.event_driven:
+                try: self.camera.stop()
+                except: pass
+            try: self.camera.release()
+            except: pass
+        self.camera = None
+
+
+class DXGIFrameDamage:
+    """
+    [OPTIM] Dirty rects + move destinations of the frame held by an IDXGIOutputDuplication
+    (what Desktop Duplication says changed since the previous frame), in output coordinates.
+    Called through the COM vtable: dxcam declares these methods without arguments.
+    """
+    MORE_DATA = 0x887A0003 # DXGI_ERROR_MORE_DATA: buffer too small
+    INITIAL = 64           # Rects per buffer before growing
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class MoveRect(ctypes.Structure): # DXGI_OUTDUPL_MOVE_RECT
+            _fields_ = [("source", wintypes.POINT), ("dest", wintypes.RECT)]
+
+        proto = ctypes.WINFUNCTYPE(ctypes.HRESULT, wintypes.UINT, ctypes.c_void_p, ctypes.POINTER(wintypes.UINT))
+        # Vtable slots: IUnknown (3) + IDXGIObject (4) + GetDesc, AcquireNextFrame
+        self.calls = [(proto(9, "GetFrameDirtyRects"), wintypes.RECT, False),
+                      (proto(10, "GetFrameMoveRects"), MoveRect, True)]
+        self.ctypes = ctypes
+        self.required = wintypes.UINT(0)
+        self.buffers = {}
+
+    def _call(self, method, duplication, item):
+        ctypes = self.ctypes
+        buf = self.buffers.get(item)
+        if buf is None: buf = self.buffers[item] = (item * self.INITIAL)()
+        try:
+            method(duplication, ctypes.sizeof(buf), buf, ctypes.byref(self.required))
+        except OSError as e:
+            if (e.winerror or 0) & 0xFFFFFFFF != self.MORE_DATA: raise
+            buf = self.buffers[item] = (item * (self.required.value // ctypes.sizeof(item) + 1))()
+            method(duplication, ctypes.sizeof(buf), buf, ctypes.byref(self.required))
+        return buf[:self.required.value // ctypes.sizeof(item)]
+
+    def read(self, duplication):
+        """:return: [(x, y, w, h), ...] (output coordinates), None if DXGI gave no info"""
+        rects = []
+        for method, item, moved in self.calls:
+            try: items = self._call(method, duplication, item)
+            except OSError: return None
+            for r in items:
+                if moved: r = r.dest # The source area is unchanged, the destination is new content
+                rects.append((r.left, r.top, r.right - r.left, r.bottom - r.top))
+        return rects
+
+
+# --- LINUX BACKEND ---
+class X11ShmSource(CaptureSource):
+    """
+    X11 root window capture through MIT-SHM (see modules/x11_capture.py).
+    The server writes into shared segments viewed by numpy: no copy on our side.
+    Cursor position/image from XFixes (real cursor shape through the sprite cache).
+    """
+    name = "X11"
+    pixel_format = "bgra"
+    RING = 3 # grab() buffers must stay valid for 2 more grabs
+
+    def __init__(self, monitor_idx=0, region=None, display_name=None, event_driven=False):
+        """
+        :param monitor_idx: GUI monitor index (mss/XRandR order)
+        :param region: CaptureRegion (Rect mode; Window tracking is Windows only)
+        :param display_name: X display (default: $DISPLAY)
+        :param event_driven: Track XDamage (poll_damage); falls back to polling if unavailable
+        """
+        super().__init__(region)
+        self.monitor_idx = monitor_idx
+        self.display_name = display_name
+        self.event_driven = event_driven
+        self.display = None
+        self.damage = None
+        self.images = []
+        self.index = 0
+
+    def open(self):
+        from modules.x11_capture import X11Display
+        from modules.custom_utils import get_monitor_geometry
+        self.display = X11Display(self.display_name)
+        try:
+            if not self.display.has_shm: raise OSError("MIT-SHM extension not available")
+            geo = get_monitor_geometry(self.monitor_idx) or (0, 0) + self.display.size
+            self._open_region(geo)
+            self.images = [self.display.create_shm_image(self.width, self.height) for _ in range(self.RING)]
+            self.index = 0
+        except Exception:
+            self.close()
+            raise
+        if self.event_driven:
+            from modules.x11_capture import X11Damage
+            try:
+                self.damage = X11Damage(self.display)
+            except Exception as e:
+                logger.warning(f"X11: XDamage unavailable ({e}), polling capture.")
+                self.damage = None
+
+    def poll_damage(self):
+        if self.damage is None: return None
+        return self._damage_to_local(self.damage.poll())
+
+    def grab(self):
+        if not self.images: return None
+        image = self.images[self.index]
+        self.index = (self.index + 1) % len(self.images)
+        if not image.grab(self.left, self.top): return None
+        return image.array
+
+    def cursor_info(self):
+        return self.display.cursor_info() if self.display else super().cursor_info()
+
+    def cursor_position(self):
+        return self.cursor_info()[:2]
+
+    def close(self):
+        if self.damage:
+            try: self.damage.close()
+            except: pass
+            self.damage = None
+        for image in self.images:
+            try: image.close()
+            except: pass
+        self.images = []
+        if self.display:
+            self.display.close()
+            self.display = None
+
+
+# --- HEADLESS / BENCHMARK BACKENDS ---
+class SyntheticSource(CaptureSource):
+    """
+    Deterministic generated desktop (same seed = same frames), for headless benchmarks.
+    Scenes:
+      'static' : Desktop that never changes
+      'scroll' : Terminal-like text scrolling upwards (scroll_px per frame)
+      'video'  : Video-like moving content in a window over a static desktop
+    """
+    name = "Synthetic"
+    SCENES = ("static", "scroll", "video")
+
+    def __init__(self, width=1920, height=1080, scene="scroll", pixel_format="bgra", seed=0, scroll_px=4, cursor_motion=False, buffer_pool=None):
+        super().__init__()
+        self.buffer_pool = buffer_pool or frame_pool
+        if scene not in self.SCENES: raise ValueError(f"Unknown synthetic scene: {scene}")
+        if pixel_format not in PIXEL_CHANNELS: raise ValueError(f"Unknown pixel format: {pixel_format}")
+        self.width, self.height = width, height
+        self.scene = scene
+        self.pixel_format = pixel_format
+        self.seed = seed
+        self.scroll_px = scroll_px
+        self.cursor_motion = cursor_motion
+        self.frame_index = 0
+        self._frames = None
+
+    def _color(self, bgr):
+        # Colors are authored in BGR, stored in the native layout
+        b, g, r = bgr
+        if self.pixel_format == "rgb24": return (r, g, b)
+        if self.pixel_format == "bgra": return (b, g, r, 255)
+        return (b, g, r)
+
+    def open(self):
+        w, h = self.width, self.height
+        ch = PIXEL_CHANNELS[self.pixel_format]
+        rng = np.random.default_rng(self.seed)
+
+        # Desktop: vertical gradient + a few flat "windows" with title bars
+        bg = np.empty((h, w, ch), dtype=np.uint8)
+        bg[:] = np.linspace(40, 90, h, dtype=np.uint8)[:, None, None]
+        if ch == 4: bg[..., 3] = 255
+        for _ in range(4):
+            x0, y0 = int(rng.integers(0, w * 3 // 4)), int(rng.integers(0, h * 3 // 4))
+            x1, y1 = min(w, x0 + int(rng.integers(w // 8, w // 3))), min(h, y0 + int(rng.integers(h // 8, h // 3)))
+            cv2.rectangle(bg, (x0, y0), (x1, y1), self._color((235, 235, 235)), -1)
+            cv2.rectangle(bg, (x0, y0), (x1, y0 + 24), self._color((120, 70, 20)), -1)
+        self._background = bg
+        # Triple buffering: a grabbed frame stays valid while the next 2 are generated (pipelined engine)
+        self._frames = []
+        for _ in range(3):
+            buf = self.buffer_pool.get(bg.shape, tag="capture.synthetic", depth=3)
+            np.copyto(buf, bg)
+            self._frames.append(buf)
+
+        # Content area shared by the 'scroll' and 'video' scenes
+        self._area = (w // 8, h // 8, w * 3 // 4, h * 3 // 4) # x, y, w, h
+        ax, ay, aw, ah = self._area
+
+        if self.scene == "scroll":
+            # Text canvas 2x taller than the area, wrapped when scrolling
+            line_h = 20
+            canvas = np.zeros((ah * 2, aw, ch), dtype=np.uint8)
+            if ch == 4: canvas[..., 3] = 255
+            words = ["stream", "encoder", "capture", "frame", "tile", "packet", "latency", "buffer"]
+            for i in range(canvas.shape[0] // line_h):
+                line = " ".join(words[j] for j in rng.integers(0, len(words), 10))
+                cv2.putText(canvas, f"{i:05d} {line}", (8, (i + 1) * line_h - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, self._color((200, 255, 200)), 1, cv2.LINE_AA)
+            self._canvas = canvas
+
+        elif self.scene == "video":
+            # Smooth noise texture (wraps) + moving gradient = hard-to-dedup, video-like content
+            tex = rng.integers(0, 255, (ah // 8 + 1, aw // 8 + 1, ch), dtype=np.uint8)
+            tex = cv2.resize(tex, (aw * 2, ah * 2), interpolation=cv2.INTER_CUBIC)
+            if ch == 4: tex[..., 3] = 255
+            self._canvas = tex
+
+        self.frame_index = 0
+
+    def grab(self):
+        if self._frames is None: return None
+        i = self.frame_index
+        self.frame_index += 1
+        frame = self._frames[i % len(self._frames)]
+        ax, ay, aw, ah = self._area
+
+        if self.scene == "scroll":
+            off = (i * self.scroll_px) % ah
+            frame[ay:ay + ah, ax:ax + aw] = self._canvas[off:off + ah]
+        elif self.scene == "video":
+            ox = int((np.sin(i * 0.03) + 1) * aw / 2)
+            oy = int((np.cos(i * 0.02) + 1) * ah / 2)
+            frame[ay:ay + ah, ax:ax + aw] = self._canvas[oy:oy + ah, ox:ox + aw]
+            # Moving bright disc (kept inside the area so nothing leaks on the desktop)
+            r = max(4, ah // 10)
+            cx = ax + r + int((i * 7) % max(1, aw - 2 * r))
+            cy = ay + ah // 2 + int(np.sin(i * 0.1) * ah / 3)
+            cv2.circle(frame, (cx, cy), r, self._color((40, 200, 250)), -1)
+        return frame
+
+    def cursor_position(self):
+        cx, cy = self.left + self.width // 2, self.top + self.height // 2
+        if not self.cursor_motion: return cx, cy
+        i = self.frame_index
+        return int(cx + np.sin(i * 0.05) * self.width / 3), int(cy + np.sin(i * 0.07) * self.height / 3)
+
+    def cursor_info(self):
+        x, y = self.cursor_position()
+        return x, y, None # Drawn arrow
+
+    def close(self):
+        self._frames = None
+
+
+# --- RAW FRAME FILES (Recorder / Replay) ---
+# Layout: 64-byte header + records stored back to back (native layout, no padding)
+# v2 record: 32-byte record header (timestamp, cursor) + frame | v1 (SSRAW001): frames only
+RAW_MAGIC = b"SSRAW002"
+RAW_MAGIC_V1 = b"SSRAW001"
+RAW_HEADER = struct.Struct("<8sIIII16s") # magic, width, height, channels, fps, pixel_format
+RAW_COUNT = struct.Struct("<Q")          # v2: frame count, right after RAW_HEADER
+RAW_HEADER_SIZE = 64
+RAW_CURSOR_VISIBLE = 1
+CURSOR_OFFSCREEN = -(1 << 30) # Hidden cursor (never drawn)
+
+
+def raw_record_dtype(width, height, channels):
+    """numpy dtype of one v2 record (32-byte record header + frame)."""
+    return np.dtype([("timestamp", "<f8"),     # Seconds since the first recorded frame
+                     ("cursor_x", "<i4"),      # Cursor relative to the captured area
+                     ("cursor_y", "<i4"),
+                     ("flags", "<u4"),         # RAW_CURSOR_VISIBLE
+                     ("reserved", "V12"),
+                     ("frame", "u1", (height, width, channels))])
+
+
+class RawFrameWriter:
+    """
+    Append-only recorder: frames are copied straight into the memory-mapped file (no
+    write() copy through Python bytes), with their timestamp and cursor position.
+    The file grows by chunk_frames records; the header frame count is updated after each
+    frame, so a recording cut short (crash, kill) stays readable up to its last frame.
+    """
+
+    def __init__(self, path, width, height, pixel_format="bgra", fps=60, chunk_frames=32):
+        self.path = path
+        self.width, self.height = width, height
+        self.pixel_format = pixel_format
+        self.chunk_frames = max(1, chunk_frames)
+        self.dtype = raw_record_dtype(width, height, PIXEL_CHANNELS[pixel_format])
+        self.frame_count = 0
+        self.capacity = 0
+        self.t0 = None
+        self.mm = None
+        self.records = None
+        header = RAW_HEADER.pack(RAW_MAGIC, width, height, PIXEL_CHANNELS[pixel_format], fps, pixel_format.encode())
+        self.f = open(path, "w+b")
+        self.f.write(header.ljust(RAW_HEADER_SIZE, b"\0"))
+        self.f.flush()
+
+    def _map(self, capacity):
+        """(Re)maps the file with room for 'capacity' records (a mapped file cannot grow on Windows)."""
+        self._unmap()
+        self.f.truncate(RAW_HEADER_SIZE + capacity * self.dtype.itemsize)
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+        self.records = np.frombuffer(self.mm, dtype=self.dtype, count=capacity, offset=RAW_HEADER_SIZE)
+        self.capacity = capacity
+
+    def _unmap(self):
+        if self.mm is None: return
+        self.records = None # Release the buffer export before closing the map
+        self.mm.flush()
+        self.mm.close()
+        self.mm = None
+
+    def write(self, frame, timestamp=None, cursor=None):
+        """
+        Appends one frame.
+        :param frame: HxWxC native buffer (copied)
+        :param timestamp: perf_counter() at grab time (default: now)
+        :param cursor: (x, y) relative to the captured area, None = hidden
+        """
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} != {self.width}x{self.height}")
+        if timestamp is None: timestamp = time.perf_counter()
+        if self.t0 is None: self.t0 = timestamp
+        if self.frame_count >= self.capacity:
+            self._map(self.capacity + self.chunk_frames)
+
+        rec = self.records[self.frame_count]
+        rec["timestamp"] = timestamp - self.t0
+        if cursor is None:
+            rec["cursor_x"] = rec["cursor_y"] = CURSOR_OFFSCREEN
+            rec["flags"] = 0
+        else:
+            rec["cursor_x"], rec["cursor_y"] = cursor
+            rec["flags"] = RAW_CURSOR_VISIBLE
+        np.copyto(self.records["frame"][self.frame_count], frame)
+        self.frame_count += 1
+        RAW_COUNT.pack_into(self.mm, RAW_HEADER.size, self.frame_count)
+
+    def close(self):
+        if self.f:
+            self._unmap()
+            self.f.truncate(RAW_HEADER_SIZE + self.frame_count * self.dtype.itemsize) # Drop the unused chunk
+            self.f.seek(RAW_HEADER.size)
+            self.f.write(RAW_COUNT.pack(self.frame_count))
+            self.f.close()
+            self.f = None
+
+
+class FileReplaySource(CaptureSource):
+    name = "Replay"
+
+    def __init__(self, path, loop=True, realtime=False):
+        """
+        :param path: Raw frame file (RawFrameWriter, v1 files are still readable)
+        :param loop: Restart at the first frame after the last one
+        :param realtime: True = frames follow their recorded timestamps (like a live desktop:
+                         grab() returns the frame due at this time, poll_damage() reports [] while
+                         no new frame is due). False = next frame at every grab() (as fast as possible)
+        """
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.fps = 0
+        self.frames = None
+        self.timestamps = None
+        self.cursors = None # (N, 2) relative cursor positions (v2), None = not recorded
+        self.frame_index = 0
+        self.current = -1   # Index of the last returned frame
+        self.t_start = None
+
+    def open(self):
+        with open(self.path, "rb") as f:
+            head = f.read(RAW_HEADER_SIZE)
+        magic, w, h, ch, fps, fmt = RAW_HEADER.unpack_from(head)
+        if magic not in (RAW_MAGIC, RAW_MAGIC_V1):
+            raise ValueError(f"Not a raw frame file: {self.path}")
+        self.width, self.height, self.fps = w, h, fps
+        self.pixel_format = fmt.rstrip(b"\0").decode()
+        data_bytes = os.path.getsize(self.path) - RAW_HEADER_SIZE
+        # memmap: frames are paged in on demand, file size is not limited by RAM
+        if magic == RAW_MAGIC:
+            dtype = raw_record_dtype(w, h, ch)
+            count = min(RAW_COUNT.unpack_from(head, RAW_HEADER.size)[0], data_bytes // dtype.itemsize)
+            if count <= 0: raise ValueError(f"Empty recording: {self.path}")
+            records = np.memmap(self.path, dtype=dtype, mode="r", offset=RAW_HEADER_SIZE, shape=(count,))
+            self.frames = records["frame"]
+            self.timestamps = np.array(records["timestamp"])
+            visible = (records["flags"] & RAW_CURSOR_VISIBLE) != 0
+            self.cursors = np.where(visible[:, None], np.stack([records["cursor_x"], records["cursor_y"]], axis=1), CURSOR_OFFSCREEN)
+        else:
+            count = data_bytes // (w * h * ch)
+            if count <= 0: raise ValueError(f"Empty recording: {self.path}")
+            self.frames = np.memmap(self.path, dtype=np.uint8, mode="r", offset=RAW_HEADER_SIZE, shape=(count, h, w, ch))
+            self.timestamps = np.arange(count) / float(max(1, fps))
+            self.cursors = None
+        self.frame_index = 0
+        self.current = -1
+        self.t_start = None
+        logger.info(f"Replay: {self.path} | {count} frames {w}x{h} {self.pixel_format} | "
+                    f"{self.timestamps[-1]:.1f}s | {'realtime' if self.realtime else 'max speed'}")
+
+    def _due_index(self):
+        """Realtime: index of the frame shown at this time (-1 = past the end, not looping)."""
+        if self.t_start is None: return 0
+        duration = self.timestamps[-1] + 1.0 / max(1, self.fps)
+        elapsed = time.perf_counter() - self.t_start
+        if elapsed >= duration:
+            if not self.loop: return -1
+            loops = int(elapsed // duration)
+            self.t_start += loops * duration
+            elapsed -= loops * duration
+        return max(0, int(np.searchsorted(self.timestamps, elapsed, side="right")) - 1)
+
+    def poll_damage(self):
+        if not self.realtime or self.frames is None or self.current < 0: return None
+        idx = self._due_index()
+        return [] if idx in (self.current, -1) else None
+
+    def grab(self):
+        if self.frames is None or not len(self.frames): return None
+        if self.realtime:
+            if self.t_start is None: self.t_start = time.perf_counter()
+            idx = self._due_index()
+            if idx < 0: return None
+        else:
+            if self.frame_index >= len(self.frames):
+                if not self.loop: return None
+                self.frame_index = 0
+            idx = self.frame_index
+            self.frame_index += 1
+        self.current = idx
+        return self.frames[idx]
+
+    def cursor_info(self):
+        """Recorded cursor (arrow shape: handles are not portable between sessions)."""
+        if self.cursors is None or self.current < 0:
+            return CURSOR_OFFSCREEN, CURSOR_OFFSCREEN, None
+        x, y = self.cursors[self.current]
+        if x == CURSOR_OFFSCREEN: return CURSOR_OFFSCREEN, CURSOR_OFFSCREEN, None
+        return self.left + int(x), self.top + int(y), None
+
+    def close(self):
+        self.frames = None
+        self.timestamps = None
+        self.cursors = None
+
+
+# --- FACTORY ---
+def create_capture_source(backend, monitor_idx=0, fps=60, dxcam_mapping=None, synthetic_scene="scroll", replay_path="", region=None, event_driven=False, buffer_pool=None):
+    """
+    Creates AND opens the capture source for a backend name ('DXCam', 'MSS', 'X11', 'Synthetic', 'Replay').
+    DXCam falls back to MSS if it cannot be opened. On Linux, DXCam means X11 (MIT-SHM), which falls back to MSS.
+    :param region: CaptureRegion for the desktop backends (None = whole monitor)
+    :param event_driven: Grab only when the OS reports a change (DXGI frame updates / XDamage)
+    :param buffer_pool: BufferPool of the pipeline owning the source (default: global frame_pool)
+    """
+    if backend == "DXCam" and not sys.platform.startswith("win"):
+        backend = "X11"
+
+    if backend == "X11":
+        try:
+            source = X11ShmSource(monitor_idx, region, event_driven=event_driven)
+            source.open()
+            return source
+        except Exception as e:
+            logger.warning(f"X11 MIT-SHM init failed ({e}), falling back to MSS.")
+            backend = "MSS"
+
+    if backend == "DXCam":
+        try:
+            output_idx = (dxcam_mapping or {}).get(monitor_idx, monitor_idx)
+            source = DXCamSource(monitor_idx, fps, output_idx, region, event_driven, buffer_pool)
+            source.open()
+            return source
+        except Exception as e:
+            logger.warning(f"DXCam init failed ({e}), falling back to MSS.")
+            backend = "MSS"
+
+    if backend == "Synthetic":
+        source = SyntheticSource(scene=synthetic_scene, buffer_pool=buffer_pool)
+    elif backend == "Replay":
+        source = FileReplaySource(replay_path, realtime=True) # Live engine: recorded timing
+    else:
+        source = MSSSource(monitor_idx, region)
+    source.open()
+    return source
@@ -0,0 +1,253 @@
+import zlib
+import numpy as np
+
+# --- TILE-HASH CHANGE DETECTION ---
+# Replaces the full-frame np.array_equal() + frame.copy() dedup.
+# Each frame is cut into fixed-size tiles (64x64 by default) and every tile is reduced
+# to a 64-bit signature. Only the signature grid of the previous frame is kept
+# (a few KB instead of a full frame copy), and the output is a list of dirty rectangles.
+
+DEFAULT_TILE_SIZE = 64
+
+
+def _make_weights(rows, cols, seed=0x5EED):
+    # Random ODD multipliers: odd numbers are invertible modulo 2^64, so any change
+    # limited to a single 64-bit word ALWAYS changes the tile signature.
+    rng = np.random.default_rng(seed)
+    w = rng.integers(0, 2**63 - 1, size=(rows, cols), dtype=np.uint64)
+    return w | np.uint64(1)
+
+
+class TileChangeDetector:
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Tiled change detector.
+        :param tile_size: Tile edge in pixels (e.g. 64 -> 64x64 tiles)
+        """
+        self.tile_size = int(tile_size)
+        self._weights = None
+        self._weights_key = None
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame (next detect() reports the full frame as dirty)."""
+        self.prev_sigs = None
+        self.prev_shape = None
+        self.dirty_tiles = 0
+        self.total_tiles = 0
+
+    @property
+    def dirty_ratio(self):
+        """Fraction (0.0-1.0) of tiles that changed on the last detect() call."""
+        if not self.total_tiles: return 0.0
+        return self.dirty_tiles / self.total_tiles
+
+    def _get_weights(self, rows, cols):
+        key = (rows, cols)
+        if self._weights_key != key:
+            self._weights = _make_weights(rows, cols)
+            self._weights_key = key
+        return self._weights
+
+    def signatures(self, frame):
+        """
+        Returns the (tiles_y, tiles_x) uint64 signature grid of a frame.
+        :param frame: HxW or HxWxC uint8 array (BGR, BGRA, RGB...)
+        """
+        h, w = frame.shape[:2]
+        ch = frame.shape[2] if frame.ndim == 3 else 1
+        t = self.tile_size
+        row_bytes = w * ch
+        tile_bytes = t * ch
+
+        # Fast path: contiguous rows that can be viewed as 64-bit words
+        if frame.flags['C_CONTIGUOUS'] and row_bytes % 8 == 0 and tile_bytes % 8 == 0:
+            words = frame.reshape(h, row_bytes).view(np.uint64)
+            return self._signatures_words(words, h, tile_bytes // 8)
+
+        # Slow path (odd widths / strided views): CRC32 per tile
+        gy, gx = -(-h // t), -(-w // t)
+        sigs = np.empty((gy, gx), dtype=np.uint64)
+        for ty in range(gy):
+            band = frame[ty * t:(ty + 1) * t]
+            for tx in range(gx):
+                sigs[ty, tx] = zlib.crc32(np.ascontiguousarray(band[:, tx * t:(tx + 1) * t]))
+        return sigs
+
+    def _signatures_words(self, words, h, tw):
+        t = self.tile_size
+        wq = words.shape[1]
+        ny, hr = divmod(h, t)
+        nx, wr = divmod(wq, tw)
+        gy, gx = ny + (1 if hr else 0), nx + (1 if wr else 0)
+        weights = self._get_weights(t, tw)
+        sigs = np.zeros((gy, gx), dtype=np.uint64)
+
+        # einsum computes the weighted sums without a full-size temporary (uint64 wraps mod 2^64)
+        if ny and nx:
+            core = words[:ny * t, :nx * tw].reshape(ny, t, nx, tw)
+            sigs[:ny, :nx] = np.einsum('atbk,tk->ab', core, weights)
+        if ny and wr:
+            right = words[:ny * t, nx * tw:].reshape(ny, t, wr)
+            sigs[:ny, nx] = np.einsum('atk,tk->a', right, weights[:, :wr])
+        if hr and nx:
+            bottom = words[ny * t:, :nx * tw].reshape(hr, nx, tw)
+            sigs[ny, :nx] = np.einsum('tbk,tk->b', bottom, weights[:hr])
+        if hr and wr:
+            sigs[ny, nx] = np.einsum('tk,tk->', words[ny * t:, nx * tw:], weights[:hr, :wr])
+        return sigs
+
+    def detect(self, frame):
+        """
+        Compares the frame with the previous one.
+        Returns a list of dirty rectangles (x, y, w, h) in frame pixels ([] = unchanged).
+        Horizontally adjacent dirty tiles are merged into a single rectangle.
+        """
+        h, w = frame.shape[:2]
+        sigs = self.signatures(frame)
+        shape = frame.shape
+        self.total_tiles = sigs.size
+
+        if self.prev_sigs is None or self.prev_shape != shape:
+            # First frame or geometry change: everything is dirty
+            self.prev_sigs = sigs
+            self.prev_shape = shape
+            self.dirty_tiles = sigs.size
+            return [(0, 0, w, h)]
+
+        changed = sigs != self.prev_sigs
+        self.prev_sigs = sigs
+        self.dirty_tiles = int(np.count_nonzero(changed))
+        if not self.dirty_tiles:
+            return []
+        return tiles_to_rects(changed, self.tile_size, w, h)
+
+
+def tiles_to_rects(changed, tile_size, width, height):
+    """Converts a boolean tile grid into merged (x, y, w, h) rectangles (row runs)."""
+    rects = []
+    t = tile_size
+    for ty in np.flatnonzero(changed.any(axis=1)):
+        row = changed[ty]
+        # Run-length: find starts/ends of consecutive dirty tiles
+        padded = np.concatenate(([False], row, [False]))
+        edges = np.flatnonzero(padded[1:] != padded[:-1])
+        y = int(ty) * t
+        rh = min(t, height - y)
+        for start, end in zip(edges[::2], edges[1::2]):
+            x = int(start) * t
+            rects.append((x, y, min(int(end) * t, width) - x, rh))
+    return rects
+
+
+def rects_to_tiles(rects, tile_size, tiles_x, tiles_y):
+    """Boolean tile grid of the tiles touched by (x, y, w, h) rectangles (snapped outwards)."""
+    grid = np.zeros((tiles_y, tiles_x), dtype=bool)
+    t = tile_size
+    for x, y, w, h in rects:
+        if w <= 0 or h <= 0: continue
+        x0, y0 = max(0, x // t), max(0, y // t)
+        x1, y1 = min(tiles_x, -(-(x + w) // t)), min(tiles_y, -(-(y + h) // t))
+        if x1 > x0 and y1 > y0: grid[y0:y1, x0:x1] = True
+    return grid
+
+
+# --- NOISE POLICY ---
+# Applied by the capture stage to the dirty rects (tile hashes or OS damage) before posting:
+#   ignore masks : tiles touching a mask never trigger an encode (taskbar clock, animated tray icon).
+#                  Masked content still reaches the receiver with the next real change (full frame encode).
+#   min_area     : a change touching fewer than min_area tiles (caret blink, spinner) is not posted
+#                  right away. Minor changes are batched and released at most every refresh_s seconds.
+# Areas are counted in tiles of the grid, whatever the rect source: tile hashes give grid-aligned
+# rects, OS damage (XDamage) gives exact pixel rects, both are snapped to the grid before counting
+# (a 1-pixel change = 1 tile).
+
+class ChangeFilter:
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE, min_area=0, masks=None, refresh_s=1.0):
+        """
+        :param tile_size: Tile edge of the mask grid (same as the TileChangeDetector)
+        :param min_area: Minimum changed area in tiles (tile_size x tile_size) posted immediately (0 = off)
+        :param masks: Ignored rectangles [(x, y, w, h), ...] relative to the captured area
+        :param refresh_s: Max interval between two releases of batched minor changes
+        """
+        self.tile_size = int(tile_size)
+        self.pending = []     # Batched minor rects
+        self.last_post = 0.0
+        self.suppressed = 0   # Minor changes held back (stats)
+        self.masked = 0       # Changes fully inside masks (stats)
+        self.configure(min_area, masks, refresh_s)
+
+    def configure(self, min_area=0, masks=None, refresh_s=1.0):
+        self.min_area = max(0, int(min_area))
+        self.masks = [tuple(int(v) for v in m) for m in (masks or [])]
+        self.refresh_s = max(0.0, float(refresh_s))
+        self._mask = None
+        self._mask_key = None
+
+    @property
+    def active(self):
+        return self.min_area > 0 or bool(self.masks)
+
+    def _mask_grid(self, tiles_x, tiles_y):
+        mask = self._mask # configure() may run from the stream thread: work on locals
+        if mask is None or self._mask_key != (tiles_x, tiles_y):
+            mask = rects_to_tiles(self.masks, self.tile_size, tiles_x, tiles_y)
+            self._mask, self._mask_key = mask, (tiles_x, tiles_y)
+        return mask
+
+    def with_masks(self, rects):
+        """
+        Posted rects plus the masked areas, for encoders that only resend the dirty areas (tile mode):
+        masked content rides along with a real change like a full frame encode would send it.
+        :param rects: Rects returned by apply() ([] = nothing posted, stays [])
+        """
+        if not rects or not self.masks: return rects
+        return list(rects) + self.masks
+
+    def apply(self, rects, width, height, now):
+        """
+        :param rects: Dirty rects of this tick relative to the captured area ([] = unchanged)
+        :param width: Captured width
+        :param height: Captured height
+        :param now: perf_counter() of the tick
+        :return: Rects to post now ([] = nothing to encode yet)
+        """
+        if not self.active: return rects
+        area = 0
+        if rects:
+            t = self.tile_size
+            tiles_x, tiles_y = -(-width // t), -(-height // t)
+            grid = rects_to_tiles(rects, t, tiles_x, tiles_y) # Same unit for tile hashes and exact damage rects
+            if self.masks:
+                grid &= ~self._mask_grid(tiles_x, tiles_y)
+                if grid.any():
+                    rects = tiles_to_rects(grid, t, width, height)
+                else:
+                    rects = []
+                    self.masked += 1
+            area = int(np.count_nonzero(grid))
+        if rects:
+            if area >= self.min_area:
+                # Real change: post it with everything batched so far
+                rects, self.pending = rects + self.pending, []
+                self.last_post = now
+                return rects
+            self.pending.extend(r for r in rects if r not in self.pending) # A blinking caret repeats the same tile
+            self.suppressed += 1
+        if self.pending and now - self.last_post >= self.refresh_s:
+            rects, self.pending = self.pending, []
+            self.last_post = now
+            return rects
+        return []
+
+
+def scale_rects(rects, sx, sy, max_w, max_h):
+    """Maps rectangles to another resolution (e.g. capture -> encoder), rounding outwards."""
+    out = []
+    for x, y, w, h in rects:
+        x0, y0 = int(x * sx), int(y * sy)
+        x1 = min(max_w, int(np.ceil((x + w) * sx)))
+        y1 = min(max_h, int(np.ceil((y + h) * sy)))
+        if x1 > x0 and y1 > y0:
+            out.append((x0, y0, x1 - x0, y1 - y0))
+    return out
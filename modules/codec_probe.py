@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+import av
+from fractions import Fraction
+
+logger = logging.getLogger("SenderGUI")
+
+# --- CODEC CAPABILITY PROBE ---
+# av.codec.Codec(name) only tells that FFmpeg was built with the encoder: h264_nvenc/h264_amf
+# exist in most Windows builds, even without the GPU/driver. The probe really opens each encoder
+# and encodes one frame at common sizes (NVENC refuses sizes above the GPU limit, old drivers
+# refuse the SDK version...). Runs once in the background, results cached on disk per FFmpeg/PyAV build.
+# Delete codec_cache.json (or probe(force=True)) after a GPU/driver change.
+
+CODEC_CACHE_FILE = "codec_cache.json"
+PROBE_CODECS = ("h264_nvenc", "h264_amf", "libx264")
+PROBE_SIZES = ((1280, 720), (1920, 1080), (3840, 2160))
+
+def build_key():
+    """Cache key: results only change with the PyAV/FFmpeg build."""
+    libs = av.library_versions.get("libavcodec", ())
+    return f"av {av.__version__} / libavcodec {'.'.join(str(v) for v in libs)}"
+
+def _try_encode(name, width, height):
+    """Opens the encoder with the low latency options of VideoEncoder and encodes one frame. Returns None or the error."""
+    ctx = None
+    try:
+        ctx = av.codec.CodecContext.create(av.codec.Codec(name, "w"))
+        ctx.width = width
+        ctx.height = height
+        ctx.pix_fmt = "yuv420p"
+        ctx.time_base = Fraction(1, 60)
+        ctx.bit_rate = 4000000
+        ctx.max_b_frames = 0
+        if "nvenc" in name: ctx.options = {"preset": "p1", "tune": "ll", "zerolatency": "1", "delay": "0"}
+        else: ctx.options = {"preset": "ultrafast", "tune": "zerolatency"}
+        ctx.open()
+        frame = av.VideoFrame(width, height, "yuv420p")
+        for plane in frame.planes: plane.update(bytes(plane.buffer_size))
+        packets = list(ctx.encode(frame)) + list(ctx.encode(None))
+        return None if packets else "no packet"
+    except Exception as e:
+        return str(e) or type(e).__name__
+    finally:
+        try:
+            if ctx is not None: ctx.close()
+        except: pass
+
+
+class CodecProbe:
+    def __init__(self, path=CODEC_CACHE_FILE, codecs=PROBE_CODECS, sizes=PROBE_SIZES):
+        """
+        Which encoders actually work, per size.
+        :param path: JSON cache file
+        :param codecs: Encoder names to test
+        :param sizes: (width, height) to test
+        """
+        self.path = path
+        self.codecs = codecs
+        self.sizes = sizes
+        self.results = {} # name -> {"WxH": True/False}
+        self.errors = {}  # name -> first error message
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.callbacks = []
+
+    def _load(self, key):
+        try:
+            with open(self.path, "r") as f: data = json.load(f)
+        except: return False
+        if data.get("key") != key: return False
+        results = data.get("results", {})
+        wanted = [f"{w}x{h}" for w, h in self.sizes]
+        if any(name not in results or any(s not in results[name] for s in wanted) for name in self.codecs): return False
+        self.results = results
+        self.errors = data.get("errors", {})
+        return True
+
+    def _save(self, key):
+        try:
+            with open(self.path, "w") as f: json.dump({"key": key, "results": self.results, "errors": self.errors}, f, indent=4)
+        except Exception as e:
+            logger.warning(f"Codec probe: cache not saved ({e})")
+
+    def probe(self, force=False):
+        """Blocking: loads the cache or tests every codec/size. Returns the results."""
+        key = build_key()
+        if force or not self._load(key):
+            results, errors = {}, {}
+            for name in self.codecs:
+                results[name] = {}
+                try: av.codec.Codec(name, "w")
+                except:
+                    # Not in this FFmpeg build: nothing to open
+                    results[name] = {f"{w}x{h}": False for w, h in self.sizes}
+                    errors[name] = "not built in"
+                    continue
+                for w, h in self.sizes:
+                    error = _try_encode(name, w, h)
+                    results[name][f"{w}x{h}"] = error is None
+                    if error and name not in errors: errors[name] = error
+            self.results, self.errors = results, errors
+            self._save(key)
+            logger.info(f"Codec probe ({key}): {self.summary()}")
+        self.ready.set()
+        return self.results
+
+    def start(self, on_done=None):
+        """Background probe (idempotent). on_done() is called from the probe thread (or now if already done)."""
+        with self.lock:
+            if not self.ready.is_set():
+                if on_done: self.callbacks.append(on_done)
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, daemon=True, name="CodecProbe")
+                    self.thread.start()
+                return
+        if on_done: on_done()
+
+    def _run(self):
+        try: self.probe()
+        except Exception as e:
+            logger.warning(f"Codec probe failed: {e}") # works() answers None: VideoEncoder checks by itself
+        finally:
+            self.ready.set()
+            with self.lock:
+                callbacks, self.callbacks = self.callbacks, []
+            for cb in callbacks:
+                try: cb()
+                except: pass
+
+    def works(self, name, width=None, height=None):
+        """
+        :param name: Encoder name (e.g. 'h264_nvenc')
+        :param width, height: Encoder size (None = any size)
+        True/False from the probe, None while it has not finished or for an untested codec (caller decides).
+        The smallest tested size covering width x height answers (the largest one above 4K).
+        """
+        if not self.ready.is_set(): return None
+        sizes = self.results.get(name)
+        if not sizes: return None
+        if width is None or height is None: return any(sizes.values())
+        tested = sorted((tuple(int(v) for v in s.split("x")), ok) for s, ok in sizes.items())
+        for (w, h), ok in tested:
+            if w >= width and h >= height: return ok
+        return tested[-1][1]
+
+    def working_codecs(self):
+        """Codecs that opened at one size at least (empty while the probe runs)."""
+        if not self.ready.is_set(): return []
+        return [name for name in self.codecs if any(self.results.get(name, {}).values())]
+
+    def summary(self):
+        parts = []
+        for name in self.codecs:
+            sizes = self.results.get(name, {})
+            ok = [s for s, v in sizes.items() if v]
+            parts.append(f"{name}: {', '.join(ok) if ok else 'KO (' + self.errors.get(name, '?') + ')'}")
+        return " | ".join(parts)
+
+# GLOBAL CODEC PROBE
+codec_probe = CodecProbe()
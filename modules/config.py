@@ -41,6 +41,7 @@ class StreamState:
         self.backend = "MSS"  # Default to MSS (CPU)
         self.codec_choice = "x264" # Default CPU
         self.encoder_preset = "fast" # fast/balanced/quality (fast=ultrafast for x264)
+        self.resize_method = "auto"  # auto/bilinear/area/integer/remap (see resize_engine)
         self.latency_value = 10 # 0-100 (Low to High buffering)
         self.dropped_frames = 0
         self.loss_percent = 0.0 # Legacy/Combined (For Watchdog)
@@ -61,6 +62,48 @@ class StreamState:
         
         self.dxcam_mapping = {}
         
+        # Capture Region (limits the grab itself, see capture_sources.CaptureRegion)
+        self.capture_region_mode = "Monitor" # Monitor (full) / Rect / Window
+        self.capture_rect = [0, 0, 1280, 720] # x, y, w, h relative to the monitor (Rect mode)
+        self.capture_window = ""              # Window title (substring) or handle "0x..." (Window mode)
+        self.event_capture = False # Opt-in: grab only on OS change events (DXGI frame updates / XDamage)
+        
+        # Change Detection Noise Policy (see change_detector.ChangeFilter)
+        self.change_min_area = 0   # Changes touching fewer tiles (64x64) than this are batched (0 = off)
+        self.minor_refresh_s = 1.0 # Batched minor changes are sent at most this often
+        self.change_masks = []     # Ignored areas [[x, y, w, h], ...] in monitor pixels (clock, tray)
+        
+        # Motion-Adaptive Frame Rate (content FPS from the changed area, state.fps = max), opt-in
+        self.adaptive_fps = False
+        self.adaptive_min_fps = 10
+        
+        # Static screen: CFR repeats sent as synthesized all-skip P frames (see h264_skip.py), opt-in
+        self.skip_frames = False
+        
+        # Lossless tile mode for the TCP app protocol (see tile_codec.py): off / auto / always
+        # Off by default: receivers older than the tile protocol only understand H.264
+        self.tile_mode = "off"
+        # Cursor sent as metadata to the TCP receiver (drawn by it, cursor moves cost no video frame)
+        self.cursor_metadata = False
+        # Encoder thread (see stream_encoder.EncodeWorker): 0 = encode in the stream thread,
+        # 1-2 = frames waiting for the encoder thread (conversion and encoding overlap)
+        self.encode_async_depth = 0
+        
+        # Simulcast (see simulcast.py): extra renditions of the same capture, each sink subscribes by name
+        # ("main" = resolution/FPS/bitrate above). Only subscribed renditions are encoded.
+        self.renditions = [{"name": "mobile", "resolution": "480p", "bitrate_mbps": 1.5, "fps": 30}]
+        self.tcp_rendition = "main"
+        self.rtsp_rendition = "main" # e.g. "mobile" for WebRTC phones on Wi-Fi
+        
+        # Multi-Monitor: extra monitors streamed at the same time (one pipeline each)
+        # Screen n of the list -> TCP DEFAULT_PORT + n, rtsp://.../stream<n+1>
+        self.extra_monitors = []
+        self.pipelines = [] # Runtime stats of the extra pipelines (core.PipelineState)
+        
+        # Headless Sources (backend "Synthetic" / "Replay", benchmarks only, not saved)
+        self.synthetic_scene = "scroll" # static/scroll/video
+        self.replay_path = ""
+        
         # Compatibility Modes
         self.compatibility_mode = False # Raw TCP
         self.rtsp_mode = False # RTSP Server
@@ -90,6 +133,8 @@ class StreamState:
         # Runtime Stats
         self.current_mbps = 0.0
         self.current_fps = 0
+        self.content_fps = 0 # Motion-adaptive content rate chosen by the capture stage
+        self.stage_util = {} # Pipeline stage utilization % ({"capture": x, "encode": y})
         
         # Watchdog
         self.watchdog_triggered = False
@@ -103,12 +148,32 @@ class StreamState:
             "backend": self.backend,
             "codec_choice": self.codec_choice,
             "encoder_preset": self.encoder_preset,
+            "resize_method": self.resize_method,
             "latency_value": self.latency_value,
             "fps": self.fps,
             "quality": self.quality,
             "bitrate_mbps": self.bitrate_mbps,
             "resolution": self.resolution,
             
+            # Capture Region
+            "capture_region_mode": self.capture_region_mode,
+            "capture_rect": self.capture_rect,
+            "capture_window": self.capture_window,
+            "event_capture": self.event_capture,
+            "extra_monitors": self.extra_monitors,
+            "change_min_area": self.change_min_area,
+            "minor_refresh_s": self.minor_refresh_s,
+            "change_masks": self.change_masks,
+            "adaptive_fps": self.adaptive_fps,
+            "adaptive_min_fps": self.adaptive_min_fps,
+            "skip_frames": self.skip_frames,
+            "tile_mode": self.tile_mode,
+            "cursor_metadata": self.cursor_metadata,
+            "encode_async_depth": self.encode_async_depth,
+            "renditions": self.renditions,
+            "tcp_rendition": self.tcp_rendition,
+            "rtsp_rendition": self.rtsp_rendition,
+            
             # Audio
             "audio_enabled": self.audio_enabled,
             "audio_source": self.audio_source,
@@ -149,12 +214,31 @@ class StreamState:
                     self.backend = data.get("backend", "DXCam")
                     self.codec_choice = data.get("codec_choice", "auto")
                     self.encoder_preset = data.get("encoder_preset", "fast")
+                    self.resize_method = data.get("resize_method", "auto")
                     self.latency_value = data.get("latency_value", 20)
                     self.fps = data.get("fps", 60)
                     self.quality = data.get("quality", 50)
                     self.bitrate_mbps = data.get("bitrate_mbps", 4.0)
                     self.resolution = data.get("resolution", "720p")
                     
+                    self.capture_region_mode = data.get("capture_region_mode", "Monitor")
+                    self.capture_rect = data.get("capture_rect", [0, 0, 1280, 720])
+                    self.capture_window = data.get("capture_window", "")
+                    self.event_capture = data.get("event_capture", False)
+                    self.extra_monitors = data.get("extra_monitors", [])
+                    self.change_min_area = data.get("change_min_area", 0)
+                    self.minor_refresh_s = data.get("minor_refresh_s", 1.0)
+                    self.change_masks = data.get("change_masks", [])
+                    self.adaptive_fps = data.get("adaptive_fps", False)
+                    self.adaptive_min_fps = data.get("adaptive_min_fps", 10)
+                    self.skip_frames = data.get("skip_frames", False)
+                    self.tile_mode = data.get("tile_mode", "off")
+                    self.cursor_metadata = data.get("cursor_metadata", False)
+                    self.encode_async_depth = data.get("encode_async_depth", 0)
+                    self.renditions = data.get("renditions", self.renditions)
+                    self.tcp_rendition = data.get("tcp_rendition", "main")
+                    self.rtsp_rendition = data.get("rtsp_rendition", "main")
+                    
                     # Apply resolution dims (Restore target_w/h)
                     r = self.resolution
                     if r == "360p": self.target_w, self.target_h = 640, 360
@@ -0,0 +1,73 @@
+# --- [OPTIM] PRE-ENCODING DROP (Congestion Control) ---
+# "LATENCY IS THE BOSS" Logic
+# 0-10%: REAL-TIME PRIORITY (Aggressive Drop / Snap-to-Live)
+# 11-90%: BALANCED (Smooth Drop)
+# 91-100%: QUALITY PRIORITY (Never Drop)
+#
+# Pure function (no sockets, no globals) so the policy can be replayed offline
+# (see debug_tools/bench_pipeline.py).
+
+SEND = "send"           # Encode this frame
+DROP = "drop"           # Skip this frame to let the buffer drain
+FLUSH_TCP = "flush_tcp" # Flush the TCP queue, then encode this frame as a Keyframe
+
+
+def congestion_decision(latency_value, fps, q_tcp, q_rtsp, tcp_active, rtsp_active):
+    """
+    Decides what to do with the next frame from the current queue depths.
+    :param latency_value: Latency slider (0-100)
+    :param fps: Target FPS
+    :param q_tcp: Packets waiting in the TCP queue
+    :param q_rtsp: Packets waiting in the RTSP queue
+    :param tcp_active: A TCP client is connected
+    :param rtsp_active: RTSP mode is enabled
+    :return: (action, full_tcp, full_rtsp)
+    """
+    # 1. QUALITY MODE (> 90%)
+    if latency_value > 90:
+        # We REFUSE to drop frames proactively. We trust the network or allow buffer to grow.
+        # Only check for extreme OOM protection (e.g. > 5 seconds buffer)
+        oom_threshold = fps * 5
+
+        full_tcp = tcp_active and q_tcp > oom_threshold
+        full_rtsp = rtsp_active and q_rtsp > oom_threshold
+
+        if full_tcp or full_rtsp:
+            # EMERGENCY ONLY
+            return DROP, full_tcp, full_rtsp
+
+    # 2. REAL-TIME MODE (< 10%)
+    elif latency_value < 10:
+        # STRICT ZERO BUFFER POLICY
+        # If there is ANY packet in the queue, we are lagging.
+        # We FLUSH everything to snap back to live.
+
+        # Threshold: 1 frame (basically 0 but allow 1 to be in transit)
+        strict_limit = 0 if latency_value < 5 else 1
+
+        full_tcp = tcp_active and q_tcp > strict_limit
+        # [OPTIM] NO FLUSH for WebRTC (Localhost)
+        # As requested: "Je ne supprime plus les images pour le serveur local... le navigateur gère."
+        # We skip the flush logic for RTSP to prevent visual stutter ("trous").
+
+        if full_tcp:
+            # Do NOT drop current, we want to encode THIS fresh frame as keyframe!
+            return FLUSH_TCP, True, False
+
+    # 3. BALANCED MODE (10-90%)
+    else:
+        # Calculated acceptable buffer based on slider
+        # 10% -> 0.2s
+        # 90% -> 2.0s
+        # Linear mapping
+        target_sec = 0.2 + ((latency_value - 10) / 80.0) * 1.8
+        allowed_frames = int(target_sec * fps)
+
+        full_tcp = tcp_active and q_tcp > allowed_frames
+        # [OPTIM] For WebRTC, we validly decided to NEVER drop frames proactively (except OOM)
+
+        if full_tcp:
+            # SMOOTH DROP: Skip this frame to let buffer drain
+            return DROP, True, False
+
+    return SEND, False, False
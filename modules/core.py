@@ -2,23 +2,99 @@ import time
 import socket
 import threading
 import logging
-import cv2
-import numpy as np
-import mss
-import dxcam
 from modules.config import state, DEFAULT_PORT
-from modules.custom_utils import buffer_tcp, buffer_rtsp, get_cursor_pos_fast, draw_cursor_arrow, map_dxcam_monitors
+from modules.custom_utils import buffer_tcp, buffer_rtsp, StreamBuffer, CursorOverlay, map_dxcam_monitors, monitor_registry
+from modules.capture_sources import create_capture_source, CaptureRegion
+from modules.congestion import congestion_decision, DROP, FLUSH_TCP
 from modules.networking import sender_loop, rtsp_publisher_loop
 from modules.stream_encoder import VideoEncoder
+from modules.tile_codec import TileEncoder, TileModeSwitch
+from modules.cursor_channel import CursorChannel
+from modules.simulcast import Simulcast, MAIN_RENDITION
+from modules.change_detector import scale_rects
+from modules.pipeline import CaptureWorker, LatestFrameSlot, StageStats, EncodeWorkerPool, MotionRateController
+from modules.buffer_pool import BufferPool, frame_pool
 
 logger = logging.getLogger("SenderGUI")
 
+# --- [NEW] MULTI-MONITOR ---
+# One independent capture/encode pipeline per streamed monitor, in the same process.
+# Primary pipeline: state.monitor_idx, DEFAULT_PORT, rtsp://.../stream (runtime stats in 'state').
+# Extra pipelines (state.extra_monitors): DEFAULT_PORT + n, rtsp://.../stream<n+1>, stats in state.pipelines.
+# Shared settings (backend, FPS, bitrate, resolution, codec, latency) apply to every pipeline.
+
+class PipelineState:
+    """Runtime state of an extra pipeline (same attribute names as StreamState for the engine loop)."""
+
+    def __init__(self, monitor_idx, port, rtsp_path):
+        self.monitor_idx = monitor_idx
+        self.port = port
+        self.rtsp_path = rtsp_path
+        self.buffer_tcp = StreamBuffer(maxsize=200)
+        self.buffer_rtsp = StreamBuffer(maxsize=200)
+        self.buffer_pool = BufferPool() # Capture rings/conversion buffers are never shared between pipelines
+        
+        # Whole monitor (regions are a primary pipeline setting)
+        self.capture_region_mode = "Monitor"
+        self.capture_rect = [0, 0, 0, 0]
+        self.capture_window = ""
+        self.change_masks = [] # Ignore masks are per monitor (see StreamState.change_masks)
+        
+        # Runtime Stats
+        self.client_connected = False
+        self.encoder = None
+        self.current_fps = 0
+        self.content_fps = 0
+        self.current_mbps = 0.0
+        self.loss_tcp = 0.0
+        self.loss_rtsp = 0.0
+        self.loss_percent = 0.0
+        self.stage_util = {}
+
 def stream_thread_func():
     logger.info(f"Stream Thread Started | Mode: {'RTSP' if state.rtsp_mode else 'TCP SERVER'}")
     
-    # Init Backend Mapping
+    # Init Backend Mapping (cached topology, hot-plug watcher re-probes on display changes)
+    monitor_registry.start_watcher()
     state.dxcam_mapping = map_dxcam_monitors()
     
+    extra_monitors = []
+    for idx in state.extra_monitors:
+        if idx != state.monitor_idx and idx not in extra_monitors: extra_monitors.append(idx)
+    extras = [PipelineState(idx, DEFAULT_PORT + n, f"stream{n + 1}") for n, idx in enumerate(extra_monitors, 1)]
+    state.pipelines = extras
+    
+    # Bounded encode pool: encoders of all pipelines run in parallel, at most one per spare core
+    encode_pool = EncodeWorkerPool(len(extras) + 1)
+    
+    threads = []
+    for p in extras:
+        logger.info(f"Multi-Monitor: Screen {p.monitor_idx} -> TCP {p.port} | RTSP /{p.rtsp_path}")
+        t = threading.Thread(target=run_pipeline, daemon=True, name=f"Pipeline{p.monitor_idx}",
+                             args=(p, p.port, p.rtsp_path, p.buffer_tcp, p.buffer_rtsp, p.buffer_pool, encode_pool, f"MON{p.monitor_idx} "))
+        t.start()
+        threads.append(t)
+    
+    run_pipeline(state, DEFAULT_PORT, "stream", buffer_tcp, buffer_rtsp, frame_pool, encode_pool, beacon=True)
+    
+    for t in threads: t.join(timeout=3.0)
+    state.pipelines = []
+    logger.info("Stream Thread Stopped")
+
+def run_pipeline(link, port, rtsp_path, buffer_tcp, buffer_rtsp, frame_pool, encode_pool, label="", beacon=False):
+    """
+    One capture -> encode -> TCP/RTSP pipeline, until state.streaming is cleared.
+    :param link: Pipeline runtime state ('state' for the primary pipeline, else PipelineState):
+                 monitor_idx, capture region, client_connected, encoder, stats
+    :param port: TCP server port
+    :param rtsp_path: MediaMTX path (rtsp://127.0.0.1:8554/<path>)
+    :param buffer_tcp: StreamBuffer of this pipeline's TCP client
+    :param buffer_rtsp: StreamBuffer of this pipeline's RTSP publisher
+    :param frame_pool: BufferPool owned by this pipeline
+    :param encode_pool: Shared EncodeWorkerPool
+    :param label: Log prefix
+    :param beacon: Run the UDP discovery beacon (primary pipeline)
+    """
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     # Important for Latency: Disable Nagle
@@ -28,10 +104,10 @@ def stream_thread_func():
     server.settimeout(0.2) 
     
     try:
-        server.bind(('0.0.0.0', DEFAULT_PORT))
+        server.bind(('0.0.0.0', port))
         server.listen(5) # Increase backlog
     except Exception as e:
-        logger.error(f"Bind Error: {e}")
+        logger.error(f"Bind Error (port {port}): {e}")
         return
         
     # --- START BEACON (UDP Discovery) ---
@@ -48,21 +124,39 @@ def stream_thread_func():
                 time.sleep(2.0)
         sock.close()
 
-    threading.Thread(target=beacon_loop, daemon=True).start()
-    logger.info("UDP Beacon Started for Auto-Discovery")
+    if beacon:
+        threading.Thread(target=beacon_loop, daemon=True).start()
+        logger.info("UDP Beacon Started for Auto-Discovery")
     
     conn = None
     rtsp_thread = None
     
-    dxcam_camera = None
-    sct = None
+    capture = None
+    capture_worker = None
     encoder = None
+    tile_encoder = None # Lossless tile mode (TCP app protocol, see tile_codec.py)
+    tile_switch = TileModeSwitch()
+    tiles_active = False
+    cursor_channel = CursorChannel() # Cursor as metadata (TCP app protocol, see cursor_channel.py)
+    cursor_meta_active = False
+    tcp_sub = rtsp_sub = MAIN_RENDITION # Rendition each sink subscribed to (see simulcast.py)
+    current_simulcast = None
+    
+    # Pipeline: Capture Stage -> Freshest Frame Slot -> Encode Stage
+    frame_slot = LatestFrameSlot()
+    encode_stats = StageStats("encode")
     
     current_backend = None
     current_codec_choice = None
     current_preset = None
+    current_resize_method = None
     current_resolution = None
+    current_async_depth = None
     current_mon_idx = -1
+    current_region = None
+    current_event_capture = None
+    current_topology = -1
+    current_filter = None # Noise policy settings applied to the capture stage
     current_fps = -1
     current_bitrate_mbps = -1.0
     
@@ -74,24 +168,51 @@ def stream_thread_func():
     frame_count = 0
     last_stat_time = time.time()
     
-    # Deduplication
-    last_frame_data = None
-    last_cursor_pos = (-1, -1)
+    # Deduplication: Tile-Hash on the raw buffer, done by the capture stage
+    dirty_rects = []
+    content_stale = True # A dirty frame was dropped before encoding: next frame needs a full conversion
+    last_overlay_key = None # Cursor (position, shape, scale) of the last encoded frame
     
     # 1s Window Stats
     frames_total_sec = 0
     dropped_tcp_total = 0
     dropped_rtsp_total = 0
-    state.loss_percent = 0.0
-    
-    state.loss_percent = 0.0
+    link.loss_percent = 0.0
     
     last_send_time = time.time()
     last_log_time = time.time() 
     
-    # FPS Limiter Vars
-    loop_start_time = time.perf_counter()
-
+    def deliver(packets, tiles=False, rendition=MAIN_RENDITION):
+        """
+        Pushes the packets of ONE frame to the buffers (stream thread, or encoder thread in async mode).
+        Only the sinks subscribed to this rendition get them (tiles: TCP).
+        """
+        nonlocal frames_total_sec, dropped_tcp_total, dropped_rtsp_total, byte_count, frame_count
+        main = rendition == MAIN_RENDITION
+        if main: frames_total_sec += 1
+        
+        # Push to buffers (No more dropping here)
+        
+        # 1. RTSP Queue
+        if state.rtsp_mode and rendition == rtsp_sub:
+            for pkt in packets: 
+                if not buffer_rtsp.put(pkt): dropped_rtsp_total += 1
+        
+        # 2. TCP Queue
+        if conn is not None and (tiles or rendition == tcp_sub):
+            for pkt in packets: 
+                if not buffer_tcp.put(bytes(pkt)):
+                    dropped_tcp_total += 1
+                    if tiles: tile_encoder.lost(pkt) # Receiver canvas missed these tiles
+        
+        # Only add byte count if at least one sent? 
+        # Simplification: just add it, byte count is for source throughput estimation.
+        byte_count += sum(len(bytes(p)) for p in packets)
+        
+        if main: frame_count += 1
+    
+    simulcast = Simulcast(lambda packets, name: deliver(packets, rendition=name), encode_pool)
+    
     # Clear Buffers
     buffer_tcp.clear()
     buffer_rtsp.clear()
@@ -103,7 +224,7 @@ def stream_thread_func():
         if state.rtsp_mode:
              if rtsp_thread is None or not rtsp_thread.is_alive():
                  logger.info("Hybrid: Starting RTSP Publisher...")
-                 rtsp_thread = threading.Thread(target=rtsp_publisher_loop, daemon=True)
+                 rtsp_thread = threading.Thread(target=rtsp_publisher_loop, args=(rtsp_path, buffer_rtsp, link), daemon=True)
                  rtsp_thread.start()
         
         # 2. Manage TCP Client (Pi/Pc)
@@ -116,12 +237,14 @@ def stream_thread_func():
                 c.settimeout(10.0) 
                 c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 
-                logger.info(f"Hybrid: Client connected (TCP): {addr}")
-                state.client_connected = True
+                logger.info(f"Hybrid: Client connected (TCP {port}): {addr}")
+                link.client_connected = True
                 
                 buffer_tcp.running = True
                 buffer_tcp.clear() # Start fresh
-                threading.Thread(target=sender_loop, args=(c,), daemon=True).start()
+                if tile_encoder: tile_encoder.invalidate() # New canvas on the client side
+                cursor_channel.reset() # Shapes are per client
+                threading.Thread(target=sender_loop, args=(c, buffer_tcp, link), daemon=True).start()
                 conn = c
             except socket.timeout: pass # No client, continue loop
             except BlockingIOError: pass 
@@ -129,31 +252,43 @@ def stream_thread_func():
                 logger.error(f"Accept Error: {e}")
         
         # Check if client disconnected (flag set by sender_loop)
-        if conn is not None and not state.client_connected:
+        if conn is not None and not link.client_connected:
             logger.info("Hybrid: Detected Client Disconnection. Resetting conn.")
             conn = None
         
         # B. Init/Re-init Capture & Encoder
-        # Check if backend, monitor, fps, or bitrate changed
+        # Check if backend, monitor, codec or resolution changed (FPS / bitrate: see B2, no teardown)
         if (current_backend != state.backend) or \
+           (current_event_capture != state.event_capture) or \
+           (current_topology != monitor_registry.version) or \
            (current_codec_choice != state.codec_choice) or \
            (current_preset != state.encoder_preset) or \
+           (current_resize_method != state.resize_method) or \
            (current_resolution != state.resolution) or \
-           (current_mon_idx != state.monitor_idx) or \
-           (current_fps != state.fps) or \
-           (abs(current_bitrate_mbps - state.bitrate_mbps) > 0.1) or \
+           (current_async_depth != state.encode_async_depth) or \
+           (current_mon_idx != link.monitor_idx) or \
+           (current_region != (link.capture_region_mode, tuple(link.capture_rect), link.capture_window)) or \
            (encoder is None):
             
-            # Cleanup
-            if dxcam_camera: dxcam_camera.stop(); dxcam_camera = None
-            if sct: sct.close(); sct = None
+            # Cleanup (Stop the capture stage BEFORE closing its source)
+            if capture_worker: capture_worker.stop(); capture_worker = None
+            if capture: capture.close(); capture = None
             if encoder: encoder.close(); encoder = None # Close existing encoder if any
+            frame_pool.reset() # Sizes/formats may change: drop every pooled buffer
+            content_stale = True
             
             current_backend = state.backend
+            current_event_capture = state.event_capture
+            if current_topology not in (-1, monitor_registry.version):
+                state.dxcam_mapping = map_dxcam_monitors() # Display configuration changed
+            current_topology = monitor_registry.version
             current_codec_choice = state.codec_choice
             current_preset = state.encoder_preset
+            current_resize_method = state.resize_method
             current_resolution = state.resolution
-            current_mon_idx = state.monitor_idx
+            current_async_depth = state.encode_async_depth
+            current_mon_idx = link.monitor_idx
+            current_region = (link.capture_region_mode, tuple(link.capture_rect), link.capture_window)
             current_fps = state.fps
             current_bitrate_mbps = state.bitrate_mbps
             
@@ -161,22 +296,32 @@ def stream_thread_func():
             buffer_tcp.clear()
             buffer_rtsp.clear()
             
-            logger.info(f"Re-initializing Stream: {current_backend} | {current_fps} FPS | {current_bitrate_mbps:.1f} Mbps")
+            logger.info(f"{label}Re-initializing Stream: Screen {current_mon_idx} | {current_backend} | {current_fps} FPS | {current_bitrate_mbps:.1f} Mbps")
             
-            # Geometry
+            # Init Capture (Geometry comes from the source: monitor, synthetic or replay)
             try:
-                with mss.mss() as tmp_sct:
-                    idx = state.monitor_idx + 1
-                    if idx < len(tmp_sct.monitors):
-                        m = tmp_sct.monitors[idx]
-                        mon_left, mon_top = m["left"], m["top"]
-                        mon_width, mon_height = m["width"], m["height"]
-            except: pass
+                capture = create_capture_source(current_backend, current_mon_idx, state.fps,
+                                                dxcam_mapping=state.dxcam_mapping,
+                                                synthetic_scene=state.synthetic_scene,
+                                                replay_path=state.replay_path,
+                                                region=CaptureRegion(link.capture_region_mode, link.capture_rect, link.capture_window),
+                                                event_driven=state.event_capture,
+                                                buffer_pool=frame_pool)
+                mon_left, mon_top, mon_width, mon_height = capture.geometry
+                if capture.region_active:
+                    logger.info(f"[CAPTURE REGION] {link.capture_region_mode}: {mon_width}x{mon_height} at ({mon_left}, {mon_top})")
+            except Exception as e:
+                logger.error(f"Capture Init Error ({current_backend}): {e}")
+                capture = None
             
             # Init Encoder
             enc_w, enc_h = state.target_w, state.target_h
             if state.resolution == "Native" or enc_w <= 0:
                  enc_w, enc_h = mon_width, mon_height
+            elif capture and capture.region_active:
+                 # Region: keep its aspect ratio inside the target resolution (never upscale)
+                 fit = min(enc_w / mon_width, enc_h / mon_height, 1.0)
+                 enc_w, enc_h = int(mon_width * fit), int(mon_height * fit)
             
             # Ensure even dimensions (required for some codecs)
             if enc_w % 2 != 0: enc_w -= 1
@@ -199,273 +344,320 @@ def stream_thread_func():
             if encoder:
                  initial_pts = encoder.frame_count
             
-            encoder = VideoEncoder(enc_w, enc_h, state.fps, bitrate_bps, codec_choice=state.codec_choice, preset_choice=state.encoder_preset, initial_pts=initial_pts)
-            state.encoder = encoder # Expose for RTSP (extradata)
+            encoder = VideoEncoder(enc_w, enc_h, state.fps, bitrate_bps, codec_choice=state.codec_choice, preset_choice=state.encoder_preset,
+                                   initial_pts=initial_pts, buffer_pool=frame_pool, resize_method=state.resize_method,
+                                   async_depth=state.encode_async_depth, on_packets=deliver, encode_pool=encode_pool)
+            link.encoder = encoder # Expose for RTSP (extradata)
+            current_simulcast = None # Renditions follow the main size/FPS (see B3)
+            tile_encoder = TileEncoder(enc_w, enc_h)
+            tiles_active = False
             
             # [DEBUG] Confirm actual codec (did we fallback?)
             logger.info(f"[ENCODER STATUS] Active Codec: {encoder.codec_name}")
             
-            # Init Capture
-            if current_backend == "DXCam":
-                try:
-                    t_idx = state.dxcam_mapping.get(state.monitor_idx, state.monitor_idx)
-                    dxcam_camera = dxcam.create(output_idx=t_idx, output_color="RGB")
-                    dxcam_camera.start(target_fps=state.fps, video_mode=True)
-                except: current_backend = "MSS" # Fallback
-
-            if current_backend == "MSS":
-                sct = mss.mss()
-
-        # C. Capture & Process
-        t_start = time.time()
-        frame_ready = False
-        frame_bgr = None
+            # Start Capture Stage (RTSP requires CFR: post unchanged frames too)
+            if capture:
+                capture_worker = CaptureWorker(capture, frame_slot, state.fps, cfr=lambda: state.rtsp_mode)
+                current_filter = None # Configured below
+                capture_worker.start()
+        
+        # B2. [OPTIM] Live reconfiguration: the capture stage and the buffers keep running
+        elif (current_fps != state.fps) or (abs(current_bitrate_mbps - state.bitrate_mbps) > 0.1):
+            bitrate_bps = int(state.bitrate_mbps * 1000 * 1000)
+            if current_fps == state.fps and encoder.set_bitrate(bitrate_bps):
+                # Same context: no IDR, no stall
+                logger.info(f"{label}[ENCODER LIVE] Bitrate: {state.bitrate_mbps:.1f} Mbps")
+            else:
+                # New context only: starts with an IDR. Limitation: FPS changes and bitrates above the
+                # VBV cap always land here. x264/NVENC size each frame from the framerate given at open
+                # (a slower PTS step would only lower the real bitrate) and PyAV cannot rewrite maxrate.
+                old = encoder
+                old.drain() # Async mode: frame_count final, queued frames delivered before the new IDR
+                # Same size: keep the calibrated resize method (unless a higher FPS shrinks its time budget)
+                resize_method = old.active_resize_method if state.fps <= old.fps else state.resize_method
+                encoder = VideoEncoder(old.width, old.height, state.fps, bitrate_bps, codec_choice=state.codec_choice, preset_choice=state.encoder_preset,
+                                       initial_pts=int(round(old.frame_count * state.fps / old.fps)), # Same timeline in the new time base
+                                       buffer_pool=frame_pool, resize_method=resize_method,
+                                       async_depth=state.encode_async_depth, on_packets=deliver, encode_pool=encode_pool)
+                old.close()
+                link.encoder = encoder
+                current_simulcast = None
+                content_stale = True # The new converter has no composed frame yet
+                if current_fps != state.fps:
+                    if capture: capture.set_fps(state.fps)
+                    if capture_worker: capture_worker.set_fps(state.fps)
+                logger.info(f"{label}[ENCODER LIVE] New context: {state.fps} FPS | {state.bitrate_mbps:.1f} Mbps | Codec: {encoder.codec_name}")
+            current_fps = state.fps
+            current_bitrate_mbps = state.bitrate_mbps
         
+        # B3. [NEW] Simulcast: extra renditions for the sinks subscribed to one (live, no teardown)
+        simulcast_key = (repr(state.renditions), state.tcp_rendition, state.rtsp_rendition, state.codec_choice, state.encoder_preset)
+        if simulcast_key != current_simulcast and encoder is not None:
+            tcp_sub, rtsp_sub = simulcast.configure(state.renditions, (state.tcp_rendition, state.rtsp_rendition), encoder,
+                                                    state.codec_choice, state.encoder_preset)
+            link.encoder = simulcast.encoder(rtsp_sub) or encoder # RTSP publisher: extradata / IDR on connect
+            current_simulcast = simulcast_key
+            
+        # C. Encode Stage: take the freshest captured frame
+        # The capture stage (CaptureWorker thread) grabs, deduplicates on the raw buffer and
+        # only posts changed frames (or every frame in RTSP mode: CFR).
         try:
-            # T1: Capture
-            t0_start = time.time()
-            t1 = time.time()
-            if current_backend == "DXCam" and dxcam_camera:
-                raw = dxcam_camera.get_latest_frame()
-                if raw is not None:
-                    frame_bgr = cv2.cvtColor(raw, cv2.COLOR_RGB2BGR)
-                    frame_ready = True
-            elif current_backend == "MSS" and sct:
-                mon_id = state.monitor_idx + 1
-                if mon_id < len(sct.monitors):
-                    img = sct.grab(sct.monitors[mon_id])
-                    frame_bgr = cv2.cvtColor(np.array(img), cv2.COLOR_BGRA2BGR)
-                    frame_ready = True
-            t2 = time.time()
+            if capture_worker is None:
+                # Capture failed to open (see log), wait for a settings change
+                time.sleep(0.1)
+                continue
+            
+            # Noise policy (live): minimum changed area, batched minor refresh, ignore masks
+            filter_settings = (state.change_min_area, state.minor_refresh_s, tuple(tuple(m) for m in link.change_masks))
+            if filter_settings != current_filter:
+                # Masks are in monitor pixels, the filter works relative to the captured area
+                mon = capture.monitor_geometry or capture.geometry
+                ox, oy = capture.left - mon[0], capture.top - mon[1]
+                masks = [(x - ox, y - oy, w, h) for x, y, w, h in filter_settings[2]]
+                capture_worker.change_filter.configure(state.change_min_area, masks, state.minor_refresh_s)
+                current_filter = filter_settings
+            
+            # Motion-adaptive frame rate (live). RTSP keeps its constant output rate: the capture
+            # stage still posts a (repeated) frame every tick, only content updates are paced.
+            if state.adaptive_fps != (capture_worker.rate_controller is not None) or \
+               (capture_worker.rate_controller and (capture_worker.rate_controller.min_fps != min(state.adaptive_min_fps, state.fps) or
+                                                    capture_worker.rate_controller.max_fps != max(1, state.fps))):
+                capture_worker.rate_controller = MotionRateController(state.fps, state.adaptive_min_fps) if state.adaptive_fps else None
+            
+            item = frame_slot.get(timeout=0.1)
+            t2 = time.perf_counter()
 
-            if frame_ready and frame_bgr is not None:
-                # Resize
-                h, w = frame_bgr.shape[:2]
-                tw, th = encoder.width, encoder.height
-                
-                if (w != tw or h != th):
-                    frame_bgr = cv2.resize(frame_bgr, (tw, th))
-                
-                # Cursor
-                mx, my = get_cursor_pos_fast()
-                rx = int((mx - mon_left) * tw / w) if w else -100
-                ry = int((my - mon_top) * th / h) if h else -100
-                
-                # Scale cursor relative to 720p (User preference)
-                # If res is 360p (h=360) -> scale = 0.5
-                # If res is 1080p (h=1080) -> scale = 1.5
-                cursor_scale = th / 720.0 
-                # Clamp min size so it doesn't disappear
-                cursor_scale = max(0.5, cursor_scale)
+            if item is None:
+                # Nothing moved!
+                # TCP/Pi Mode: Use PING Heartbeat
+                if not state.rtsp_mode and conn is not None and time.time() - last_send_time >= 0.5:
+                    # SEND HEARTBEAT (PING)
+                    # We push directly to TCP buffer
+                    buffer_tcp.put(b'PING')
+                    last_send_time = time.time()
+                    logger.info("Sent PING") # Verbose for Debug
+                # A rendition that skipped the last change (lower FPS) sends it at its next slot
+                # (from the main converter's picture or the rendition's own copy, never a capture buffer)
+                if encoder is not None and not tiles_active:
+                    simulcast.feed(encoder, None, None, False, (), t2, state.skip_frames)
+                continue
 
-                # DEDUPLICATION CHECK
-                # Need to check if FRAME changed OR CURSOR changed
-                # Fast check on cursor first
-                cursor_changed = (mx != last_cursor_pos[0] or my != last_cursor_pos[1])
-                
-                # We can't easily check 'frame changed' BEFORE drawing cursor if we draw ON the frame.
-                # So verify frame content (without cursor) first.
-                frame_changed = False
-                if last_frame_data is None:
-                    frame_changed = True
-                else:
-                    # np.array_equal is robust but can be slow. 
-                    # Optimization: Check pure bytes if possible or just rely on numpy C-speed.
-                    if not np.array_equal(frame_bgr, last_frame_data):
-                        frame_changed = True
-                
-                if not frame_changed and not cursor_changed:
-                    # Nothing moved!
-                    
-                    if state.rtsp_mode:
-                        # RTSP requires CFR
-                        pass 
-                    else:
-                        # TCP/Pi Mode: Use PING Heartbeat
-                        time_since_last = time.time() - last_send_time
-                        
-                        if time_since_last < 0.5:
-                            time.sleep(0.01)
-                            continue
-                        
-                        # SEND HEARTBEAT (PING)
-                        # We push directly to TCP buffer
-                        if conn is not None:
-                             buffer_tcp.put(b'PING')
-                             last_send_time = time.time()
-                             logger.info("Sent PING") # Verbose for Debug
-                        
-                        continue
+            raw = item.raw
+            h, w = raw.shape[:2]
+            tw, th = encoder.width, encoder.height
+            
+            # Cursor (sampled by the capture stage with the frame, relative to the captured area)
+            mx, my = item.cursor
+            rx = int(mx * tw / w) if w else -100
+            ry = int(my * th / h) if h else -100
+            
+            # Scale cursor relative to 720p (User preference)
+            # If res is 360p (h=360) -> scale = 0.5
+            # If res is 1080p (h=1080) -> scale = 1.5
+            cursor_scale = th / 720.0 
+            # Clamp min size so it doesn't disappear
+            cursor_scale = max(0.5, cursor_scale)
+            
+            # Dirty rects were computed on the RAW buffer by the capture stage (before conversion)
+            dirty_rects = item.dirty_rects
 
-                # Update Last State
-                last_frame_data = frame_bgr.copy() # Copy is needed as frame_bgr is mutable
-                last_cursor_pos = (mx, my)
-                last_send_time = time.time()
-                
-                if 0 <= rx < tw and 0 <= ry < th:
-                    draw_cursor_arrow(frame_bgr, rx, ry, scale=cursor_scale)
-                
-                t3 = time.time()
+            # Map dirty rects to encoder coordinates (scaling is done by the encoder's conversion stage)
+            if (w != tw or h != th):
+                dirty_rects = scale_rects(dirty_rects, tw / w, th / h, tw, th)
+            
+            last_send_time = time.time()
+            
+            # Cursor is drawn on the scaled frame, inside the encoder's scale + I420 stage
+            # [OPTIM] Cached sprite (real cursor shape) blended into its small ROI only
+            cursor_overlay = None
+            if 0 <= rx < tw and 0 <= ry < th:
+                cursor_overlay = CursorOverlay(rx, ry, item.cursor_shape, cursor_scale, item.pixel_format)
+            
+            # [OPTIM] Save-under: content unchanged since the last ENCODED frame -> only the cursor moved.
+            # The encoder restores the pixels under the old cursor and redraws it (no full-frame work).
+            content_changed = bool(dirty_rects) or content_stale
+            
+            # [NEW] Cursor as metadata (TCP app protocol): drawn by the receiver, never encoded.
+            # RTSP/WebRTC viewers and VLC need it in the video.
+            cursor_meta = state.cursor_metadata and conn is not None and not state.rtsp_mode and not state.compatibility_mode
+            meta_switched = cursor_meta != cursor_meta_active
+            if meta_switched:
+                cursor_meta_active = cursor_meta
+                cursor_channel.reset()
+                if not cursor_meta and conn is not None: buffer_tcp.put(cursor_channel.hide())
+            if cursor_meta:
+                # Video pixels of the rendition the TCP client receives
+                tcp_enc = simulcast.encoder(tcp_sub) or encoder
+                cw, ch = tcp_enc.width, tcp_enc.height
+                for msg in cursor_channel.update(int(mx * cw / w) if w else -100, int(my * ch / h) if h else -100, item.cursor_shape,
+                                                 max(0.5, ch / 720.0), visible=cursor_overlay is not None):
+                    if buffer_tcp.put(msg): byte_count += len(msg)
+                cursor_overlay = None
+                if not content_changed and not meta_switched:
+                    continue # Only the cursor moved: no video frame at all
+            
+            # [OPTIM] Exact repeat (CFR tick on a static screen, same cursor): all-skip P frame
+            overlay_key = (rx, ry, item.cursor_shape, cursor_scale) if cursor_overlay else None
+            same_picture = not content_changed and overlay_key == last_overlay_key
+            repeat = state.skip_frames and same_picture
+            
+            t3 = time.perf_counter()
 
-                t3 = time.time()
+            # --- [OPTIM] PRE-ENCODING DROP (Congestion Control) ---
+            # Policy lives in modules/congestion.py (0-10% Flush / 11-90% Smooth Drop / 91-100% Never Drop)
+            action, full_tcp, full_rtsp = congestion_decision(
+                state.latency_value, state.fps,
+                buffer_tcp.q.qsize(), buffer_rtsp.q.qsize(),
+                conn is not None, state.rtsp_mode)
+            
+            if action == DROP:
+                if full_tcp: dropped_tcp_total += 1
+                if full_rtsp: dropped_rtsp_total += 1
+                frames_total_sec += 1
+                if dirty_rects: content_stale = True # The encoder never saw this content
+                continue
+            
+            tcp_encoder = simulcast.encoder(tcp_sub) or encoder
+            if action == FLUSH_TCP:
+                tcp_encoder.drain() # Async mode: no P frame of the flushed chain after the flush
+                with buffer_tcp.q.mutex:
+                    q_len = len(buffer_tcp.q.queue)
+                    for msg in buffer_tcp.q.queue: tile_encoder.lost(msg) # Tiles never shown: resend
+                    buffer_tcp.q.queue.clear()
+                    dropped_tcp_total += q_len
+                # Force Keyframe after flush
+                if tcp_encoder: tcp_encoder.force_next_keyframe()
+                # Do NOT continue (drop current), we want to encode THIS fresh frame as keyframe!
 
-                # --- [OPTIM] PRE-ENCODING DROP (Congestion Control) ---
-                # "LATENCY IS THE BOSS" Logic
-                # 0-10%: REAL-TIME PRIORITY (Aggressive Drop / Snap-to-Live)
-                # 11-90%: BALANCED (Smooth Drop)
-                # 91-100%: QUALITY PRIORITY (Never Drop)
+            # [NEW] Lossless tile mode: TCP app protocol only (RTSP/VLC need H.264), auto = low motion
+            use_tiles = False
+            if state.tile_mode != "off" and conn is not None and not state.rtsp_mode and not state.compatibility_mode:
+                changed_ratio = sum(rw * rh for _, _, rw, rh in dirty_rects) / float(tw * th) if content_changed else 0.0
+                use_tiles = state.tile_mode == "always" or tile_switch.update(changed_ratio, item.timestamp)
+            if use_tiles != tiles_active:
+                logger.info(f"{label}[TILE MODE] {'ON (lossless tiles)' if use_tiles else 'OFF (H.264)'}")
+                if use_tiles:
+                    tcp_encoder.drain() # Async mode: last H.264 frames before the first tiles
+                    tile_encoder.invalidate() # Full canvas first
+                else:
+                    encoder.force_next_keyframe() # The decoder must resync
+                    content_changed = True # The encoder's composed frame is outdated
+                    repeat = False
+                tiles_active = use_tiles
+            
+            # ENCODE (H.264 or tiles) in a slot of the shared pool (parallel across pipelines, bounded by cores)
+            # Async mode: only the conversion runs here, the encoder thread takes its own slot
+            with encode_pool:
+                if tiles_active:
+                    # [FIX] Masked areas never show up in dirty rects: resend them with the real change
+                    tile_rects = None
+                    if not content_stale:
+                        tile_rects = scale_rects(capture_worker.change_filter.with_masks(item.dirty_rects), tw / w, th / h, tw, th)
+                    packets = tile_encoder.encode(raw, item.pixel_format, overlay=cursor_overlay, content_changed=content_changed,
+                                                  dirty_rects=tile_rects)
+                else:
+                    packets = encoder.encode(raw, item.pixel_format, overlay=cursor_overlay, content_changed=content_changed, repeat=repeat)
+            content_stale = False
+            last_overlay_key = overlay_key
+            t4 = time.perf_counter()
+            encode_stats.add(t4 - t2)
+            
+            if not packets:
+               # logger.warning("Encoder returned no packets!")
+               pass
 
-                # 1. QUALITY MODE (> 90%)
-                if state.latency_value > 90:
-                    # We REFUSE to drop frames proactively. We trust the network or allow buffer to grow.
-                    # Only check for extreme OOM protection (e.g. > 5 seconds buffer)
-                    oom_threshold = state.fps * 5 
-                    
-                    full_tcp = conn is not None and buffer_tcp.q.qsize() > oom_threshold
-                    full_rtsp = state.rtsp_mode and buffer_rtsp.q.qsize() > oom_threshold
-                    
-                    if full_tcp or full_rtsp:
-                        # EMERGENCY ONLY
-                         if full_tcp: dropped_tcp_total += 1
-                         if full_rtsp: dropped_rtsp_total += 1
-                         frames_total_sec += 1
-                         continue
+            if tiles_active or encoder.worker is None:
+                deliver(packets, tiles=tiles_active) # Else: delivered by the encoder thread
+            
+            # [NEW] Simulcast: renditions from the main's scaled picture, encoded in their own threads
+            subscribed = set()
+            if conn is not None and not tiles_active: subscribed.add(tcp_sub)
+            if state.rtsp_mode: subscribed.add(rtsp_sub)
+            simulcast.set_active(subscribed)
+            if not tiles_active:
+                simulcast.feed(encoder, raw, item.pixel_format, not same_picture, (rtsp_sub,) if state.rtsp_mode else (),
+                               item.timestamp, state.skip_frames)
+            
+            # Update Stats
+            t_now = time.time()
+            if t_now - last_stat_time >= 0.5:
+                elapsed = t_now - last_stat_time
+                link.current_fps = int(frame_count / elapsed)
+                link.current_mbps = ((byte_count * 8) / (1000 * 1000)) / elapsed
+                link.content_fps = capture_worker.rate_controller.fps if capture_worker.rate_controller else state.fps
                 
-                # 2. REAL-TIME MODE (< 10%)
-                elif state.latency_value < 10:
-                    # STRICT ZERO BUFFER POLICY
-                    # If there is ANY packet in the queue, we are lagging.
-                    # We FLUSH everything to snap back to live.
-                    
-                    # Threshold: 1 frame (basically 0 but allow 1 to be in transit)
-                    strict_limit = 0 if state.latency_value < 5 else 1
-                    
-                    full_tcp = conn is not None and buffer_tcp.q.qsize() > strict_limit
-                    full_rtsp = state.rtsp_mode and buffer_rtsp.q.qsize() > max(strict_limit, state.fps * 0.5) # RTSP needs ~0.5s grace
-                    
-                    if full_tcp:
-                        with buffer_tcp.q.mutex:
-                            q_len = len(buffer_tcp.q.queue)
-                            buffer_tcp.q.queue.clear()
-                            dropped_tcp_total += q_len
-                        # Force Keyframe after flush
-                        if encoder: encoder.force_next_keyframe()
-                        # Do NOT continue (drop current), we want to encode THIS fresh frame as keyframe!
-                    
-                    if full_rtsp:
-                         # [OPTIM] NO FLUSH for WebRTC (Localhost)
-                         # As requested: "Je ne supprime plus les images pour le serveur local... le navigateur gère."
-                         # We skip the flush logic for RTSP to prevent visual stutter ("trous").
-                         pass
+                # Calc Loss % (Independent)
+                loss_tcp_pct = 0.0
+                loss_rtsp_pct = 0.0
                 
-                # 3. BALANCED MODE (10-90%)
-                else:
-                    # Calculated acceptable buffer based on slider
-                    # 10% -> 0.2s
-                    # 90% -> 2.0s
-                    # Linear mapping
-                    target_sec = 0.2 + ((state.latency_value - 10) / 80.0) * 1.8 
-                    allowed_frames = int(target_sec * state.fps)
-                    
-                    full_tcp = conn is not None and buffer_tcp.q.qsize() > allowed_frames
-                    # [OPTIM] For WebRTC, we validly decided to NEVER drop frames proactively (except OOM)
-                    # full_rtsp = state.rtsp_mode and buffer_rtsp.q.qsize() > allowed_frames 
-                    full_rtsp = False 
+                if frames_total_sec > 0:
+                    loss_tcp_pct = (dropped_tcp_total / frames_total_sec) * 100.0
+                    loss_rtsp_pct = (dropped_rtsp_total / frames_total_sec) * 100.0
                     
-                    if full_tcp or full_rtsp:
-                        # SMOOTH DROP: Skip this frame to let buffer drain
-                        if full_tcp: dropped_tcp_total += 1
-                        if full_rtsp: dropped_rtsp_total += 1
-                        frames_total_sec += 1
-                        continue
+                # State Update
+                link.loss_tcp = min(100.0, loss_tcp_pct)
+                link.loss_rtsp = min(100.0, loss_rtsp_pct)
+                link.loss_percent = min(100.0, max(loss_tcp_pct, loss_rtsp_pct))
+                     
+                # Reset Window
+                frames_total_sec = 0
+                dropped_tcp_total = 0
+                dropped_rtsp_total = 0 # Need to init these variables before loop
 
-                # ENCODE (H.264)
-                packets = encoder.encode(frame_bgr)
-                t4 = time.time()
-                
-                if not packets:
-                   # logger.warning("Encoder returned no packets!")
-                   pass
-
-                frames_total_sec += 1
-                
-                # Push to buffers (No more dropping here)
-                
-                # 1. RTSP Queue
-                if state.rtsp_mode:
-                    for pkt in packets: 
-                        if not buffer_rtsp.put(pkt): dropped_rtsp_total += 1
+                # Per-Stage Utilization (Busy / Wall time): the busiest stage bounds the FPS
+                cap_util, cap_ms, _ = capture_worker.stats.snapshot()
+                enc_util, enc_ms, _ = encode_stats.snapshot()
+                worker = encoder.worker if encoder else None
+                if worker:
+                    # Async mode: the codec thread is the encode bottleneck, not the conversion
+                    codec_util, codec_ms, _ = worker.encode_stats.snapshot()
+                    _, wait_ms, _ = worker.wait_stats.snapshot()
+                    enc_util = max(enc_util, codec_util)
+                link.stage_util = {"capture": cap_util, "encode": enc_util}
                 
-                # 2. TCP Queue
-                if conn is not None:
-                    for pkt in packets: 
-                        if not buffer_tcp.put(bytes(pkt)): dropped_tcp_total += 1
-                
-                # Only add byte count if at least one sent? 
-                # Simplification: just add it, byte count is for source throughput estimation.
-                byte_count += sum(len(bytes(p)) for p in packets)
+                # Profiling Log
+                if t_now - last_log_time >= 5.0:
+                    capture_mode = label + capture.name.upper() # Real backend (DXCam may have fallen back to MSS)
+                    bound = "Capture" if cap_util >= enc_util else "Encode"
+                    pool_hits, pool_misses, pool_bytes = frame_pool.stats()
+                    cursor_only = skipped = 0
+                    if encoder and encoder.converter:
+                        cursor_only, encoder.converter.fast_updates = encoder.converter.fast_updates, 0
+                        skipped, encoder.skipped_frames = encoder.skipped_frames, 0
+                    tiles_sent, tile_encoder.tiles_sent = tile_encoder.tiles_sent, 0
+                    cursor_msgs, cursor_channel.messages = cursor_channel.messages, 0
+                    enc_thread = "off"
+                    if worker:
+                        enc_dropped, worker.dropped = worker.dropped, 0
+                        enc_thread = f"wait {wait_ms:.1f}ms enc {codec_ms:.1f}ms drop {enc_dropped}"
+                    
+                    # [DEBUG] Show Target FPS vs Actual
+                    logger.info(f"[{capture_mode}] Target:{state.fps} | FPS:{link.current_fps} | Mbps:{link.current_mbps:.1f} | " 
+                                f"Q_TCP:{buffer_tcp.q.qsize()} Q_RTSP:{buffer_rtsp.q.qsize()} | "
+                                f"Loss TCP:{link.loss_tcp:.1f}% RTSP:{link.loss_rtsp:.1f}% | "
+                                f"Times(ms) Cap:{cap_ms:.1f} Proc:{(t3 - t2) * 1000:.1f} Enc:{(t4 - t3) * 1000:.1f} | Enc thread:{enc_thread} | "
+                                f"Util Cap:{cap_util:.0f}% Enc:{enc_util:.0f}% (Bound: {bound}) | Stale:{frame_slot.overwritten} | "
+                                f"Pool Hit:{pool_hits} Miss:{pool_misses} ({pool_bytes / 1024 / 1024:.1f} MB) | "
+                                f"Cursor-only:{cursor_only} Skip frames:{skipped} | Simulcast:{simulcast.summary()} | Tiles:{'ON' if tiles_active else 'OFF'} ({tiles_sent} sent) | Cursor msgs:{cursor_msgs} | Idle ticks:{capture_worker.idle_ticks} | "
+                                f"Minor held:{capture_worker.change_filter.suppressed} Masked:{capture_worker.change_filter.masked} | "
+                                f"Content rate:{link.content_fps} (paced:{capture_worker.paced_ticks})")
+                    frame_slot.overwritten = 0
+                    capture_worker.idle_ticks = 0
+                    capture_worker.change_filter.suppressed = capture_worker.change_filter.masked = 0
+                    capture_worker.paced_ticks = 0
+                    last_log_time = t_now
+                # Logic block was removed here.
                 
-                frame_count += 1
+                byte_count = 0
+                frame_count = 0
+                last_stat_time = t_now
                 
-                # Update Stats
-                t_now = time.time()
-                if t_now - last_stat_time >= 0.5:
-                    elapsed = t_now - last_stat_time
-                    state.current_fps = int(frame_count / elapsed)
-                    state.current_mbps = ((byte_count * 8) / (1000 * 1000)) / elapsed
-                    
-                    # Calc Loss % (Independent)
-                    loss_tcp_pct = 0.0
-                    loss_rtsp_pct = 0.0
-                    
-                    if frames_total_sec > 0:
-                        loss_tcp_pct = (dropped_tcp_total / frames_total_sec) * 100.0
-                        loss_rtsp_pct = (dropped_rtsp_total / frames_total_sec) * 100.0
-                        
-                    # State Update
-                    state.loss_tcp = min(100.0, loss_tcp_pct)
-                    state.loss_rtsp = min(100.0, loss_rtsp_pct)
-                    state.loss_percent = min(100.0, max(loss_tcp_pct, loss_rtsp_pct))
-                         
-                    # Reset Window
-                    frames_total_sec = 0
-                    dropped_tcp_total = 0
-                    dropped_rtsp_total = 0 # Need to init these variables before loop
-
-                    # Profiling Log
-                    cap_ms = (t2 - t1) * 1000
-                    proc_ms = (t3 - t2) * 1000
-                    if t_now - last_log_time >= 5.0:
-                        capture_mode = "DXCAM" if state.backend == "DXCam" else "MSS"
-                        
-                        # [DEBUG] Show Target FPS vs Actual
-                        logger.info(f"[{capture_mode}] Target:{state.fps} | FPS:{state.current_fps} | Mbps:{state.current_mbps:.1f} | " 
-                                    f"Q_TCP:{buffer_tcp.q.qsize()} Q_RTSP:{buffer_rtsp.q.qsize()} | "
-                                    f"Loss TCP:{state.loss_tcp:.1f}% RTSP:{state.loss_rtsp:.1f}% | "
-                                    f"Times(ms) Cap:{t1-t0_start:.1f} Proc:{t2-t1:.1f} Enc:{t4-t3:.1f} Tot:{t4-t0_start:.1f}")
-                        last_log_time = t_now
-                    # Logic block was removed here.
-                    
-                    byte_count = 0
-                    frame_count = 0
-                    last_stat_time = t_now
-                    
         except Exception as e:
-            logger.error(f"Stream Loop Error: {e}")
+            logger.error(f"{label}Stream Loop Error: {e}")
             pass
             
-        # [FIX] FPS Limiter at END of loop to minimize input latency
-        proc_duration = time.perf_counter() - loop_start_time
-        target_dt = 1.0 / max(1, state.fps)
-        if proc_duration < target_dt:
-             time.sleep(target_dt - proc_duration)
-        
-        loop_start_time = time.perf_counter()
-        
-        # [OPTIM] Sleep optimization (Input Lag)
-        # Capture -> Send -> Sleep -> Capture
-        # This was already handled by the logic above (lines 447-451).
-        # We remove the redundant sleep block here to avoid double-waiting.
+        # [OPTIM] No FPS Limiter here: the capture stage paces the pipeline,
+        # the encode stage just waits on the slot (no sleep added to input latency).
 
     # Cleanup when loop ends
     buffer_tcp.running = False
@@ -474,9 +666,10 @@ def stream_thread_func():
     if conn and hasattr(conn, 'close'): 
         try: conn.close()
         except: pass
-    state.client_connected = False
+    link.client_connected = False
     
-    if dxcam_camera: dxcam_camera.stop()
+    if capture_worker: capture_worker.stop()
+    if capture: capture.close()
     if encoder: encoder.close()
+    simulcast.close()
     server.close()
-    logger.info("Stream Thread Stopped")
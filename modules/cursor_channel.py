@@ -0,0 +1,73 @@
+import zlib
+import struct
+import cv2
+from modules.custom_utils import cursor_sprites
+
+# --- CURSOR METADATA (TCP app protocol) ---
+# The cursor is not drawn into the video: the receiver draws it over its surface.
+# A mouse move over a static screen costs one 11-byte message instead of a video frame.
+#
+# Messages (one TCP app frame each, [Size (4 bytes)] + [Data] like H.264 packets):
+#   CURSOR_POS  : magic b"CURS", x, y (hotspot, video pixels), shape id, visible
+#   CURSOR_SHAPE: magic b"CSHP", shape id, width, height, hotspot x, hotspot y, zlib(RGBA pixels)
+# A shape is sent once per client, before the first position that uses it.
+# Same format as the reader in stream_receiver.py (standalone script, no modules import).
+
+CURSOR_MAGIC = b"CURS"
+SHAPE_MAGIC = b"CSHP"
+CURSOR_POS = struct.Struct(">4shhHB")
+CURSOR_SHAPE = struct.Struct(">4sHHHhh")
+
+
+class CursorChannel:
+    def __init__(self, cache=None):
+        """
+        Sender side of the cursor metadata channel (one per pipeline).
+        :param cache: CursorSpriteCache rendering the shapes (default: global cursor_sprites)
+        """
+        self.cache = cache or cursor_sprites
+        self.ids = {}       # (hcursor, scale) -> shape id
+        self.sent = set()   # Shape ids the client already has
+        self.last = None    # Last position message
+        self.messages = 0   # Stats
+
+    def reset(self):
+        """New client (or channel re-enabled): shapes and position are sent again."""
+        self.sent.clear()
+        self.last = None
+
+    def hide(self):
+        """Message hiding the receiver's cursor (channel disabled: the cursor is in the video again)."""
+        self.last = None
+        return CURSOR_POS.pack(CURSOR_MAGIC, 0, 0, 0, 0)
+
+    def update(self, x, y, hcursor=None, scale=1.0, visible=True):
+        """
+        :param x, y: Hotspot position in video pixels
+        :param hcursor: Cursor handle (None = arrow)
+        :param scale: Cursor scale (same as CursorOverlay)
+        :param visible: False = hidden / outside the captured area
+        Returns the messages to send (empty if nothing changed).
+        """
+        out = []
+        shape_id = 0
+        if visible:
+            key = (hcursor, round(scale, 2))
+            shape_id = self.ids.get(key)
+            if shape_id is None:
+                if len(self.ids) >= 0xFFFF: self.ids.clear(); self.sent.clear()
+                shape_id = self.ids[key] = len(self.ids) + 1
+            if shape_id not in self.sent:
+                sprite, (hx, hy) = self.cache.sprite(hcursor, scale)
+                rgba = cv2.cvtColor(sprite, cv2.COLOR_BGRA2RGBA)
+                h, w = rgba.shape[:2]
+                out.append(CURSOR_SHAPE.pack(SHAPE_MAGIC, shape_id, w, h, hx, hy) + zlib.compress(rgba.tobytes(), 6))
+                self.sent.add(shape_id)
+        else:
+            x = y = 0
+        msg = CURSOR_POS.pack(CURSOR_MAGIC, x, y, shape_id, 1 if visible else 0)
+        if msg != self.last:
+            out.append(msg)
+            self.last = msg
+        self.messages += len(out)
+        return out
@@ -1,14 +1,21 @@
 import logging
 import queue
 import mss
-import dxcam
 import cv2
 import numpy as np
 import psutil
 import subprocess
 import threading
 import time
-from ctypes import windll, Structure, c_long, c_uint, c_void_p, byref
+from ctypes import create_unicode_buffer, Structure, c_int, c_long, c_uint, c_ushort, c_ubyte, c_void_p, byref, sizeof
+
+# Windows-only APIs: the engine must also import on Linux (X11 backend, build/benchmark agents)
+try:
+    from ctypes import windll, WINFUNCTYPE
+except ImportError:
+    windll = WINFUNCTYPE = None
+
+logger = logging.getLogger("SenderGUI")
 
 # --- LOGGING GUI HANDLER (BATCHED) ---
 class TextHandler(logging.Handler):
@@ -103,26 +110,109 @@ buffer_tcp = StreamBuffer(maxsize=200)
 buffer_rtsp = StreamBuffer(maxsize=200) 
 
 # --- HELPER: MONITOR DISCOVERY & MAPPING ---
-def get_monitors():
+# [OPTIM] Monitor topology is probed ONCE and cached by the MonitorRegistry.
+# Before: every stream start created up to 10 dxcam instances (mapping) and every
+# re-init opened a temporary mss.mss() (geometry). Now both are served from the cache,
+# which is invalidated only when the display configuration really changes.
+SM_CXSCREEN, SM_CYSCREEN = 0, 1
+SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CMONITORS = 76, 77, 78, 79, 80
+
+def _probe_monitors():
+    """[(left, top, width, height), ...] in GUI order (mss: 0=All is skipped)."""
     try:
         with mss.mss() as sct:
-            mons = []
-            # mss monitors: 0=All, 1=1st, 2=2nd...
-            # We want to list individual monitors
-            for i, m in enumerate(sct.monitors[1:]):
-                mons.append(f"Ecran {i} ({m['width']}x{m['height']})")
-            return mons
+            return [(m["left"], m["top"], m["width"], m["height"]) for m in sct.monitors[1:]]
     except:
-        return ["Ecran 0 (Defaut)"]
+        return []
+
+def _topology_signature():
+    """Cheap fingerprint of the display configuration (Windows: a few GetSystemMetrics calls)."""
+    if windll is not None:
+        metrics = windll.user32.GetSystemMetrics
+        return tuple(metrics(i) for i in (SM_CMONITORS, SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN,
+                                          SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CXSCREEN, SM_CYSCREEN))
+    return tuple(_probe_monitors()) # X11: XRandR through mss (only from the watcher thread)
+
+class MonitorRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.monitors = None  # Cached geometries (None = not probed)
+        self.mapping = None   # Cached DXCam mapping (computed on first use)
+        self.signature = None
+        self.version = 0      # Incremented on every topology change (engine re-init)
+        self.watcher = None
+
+    def _ensure(self):
+        if self.monitors is None:
+            self.signature = _topology_signature()
+            monitors = _probe_monitors()
+            self.monitors = monitors or None # Probe failed: retry on next call
+            return monitors
+        return self.monitors
+
+    def get_monitors(self):
+        with self.lock:
+            return list(self._ensure())
+
+    def geometry(self, monitor_idx):
+        with self.lock:
+            monitors = self._ensure()
+            if 0 <= monitor_idx < len(monitors): return monitors[monitor_idx]
+            return None
+
+    def dxcam_mapping(self):
+        with self.lock:
+            monitors = self._ensure()
+            if self.mapping is None and monitors: self.mapping = _probe_dxcam_mapping(monitors)
+            return dict(self.mapping or {})
+
+    def check(self):
+        """Re-probes only if the topology fingerprint changed. Returns True on change."""
+        signature = _topology_signature()
+        with self.lock:
+            if self.monitors is None or signature == self.signature: return False
+            old = self.monitors
+            self.signature = signature
+            self.monitors = _probe_monitors()
+            self.mapping = None
+            if self.monitors == old: return False # e.g. DPI/primary change with same geometry
+            self.version += 1
+        logger.info(f"Display configuration changed: {len(self.monitors)} monitor(s) {self.monitors}")
+        return True
+
+    def start_watcher(self, interval=2.0):
+        """Background hot-plug detection (idempotent)."""
+        if self.watcher and self.watcher.is_alive(): return
+        def _watch():
+            while True:
+                time.sleep(interval)
+                try: self.check()
+                except Exception: pass
+        self.watcher = threading.Thread(target=_watch, daemon=True, name="MonitorWatcher")
+        self.watcher.start()
+
+# GLOBAL MONITOR REGISTRY
+monitor_registry = MonitorRegistry()
+
+def get_monitors():
+    mons = [f"Ecran {i} ({w}x{h})" for i, (_, _, w, h) in enumerate(monitor_registry.get_monitors())]
+    return mons or ["Ecran 0 (Defaut)"]
+
+def get_monitor_geometry(monitor_idx):
+    """Returns (left, top, width, height) of a GUI monitor index, or None."""
+    return monitor_registry.geometry(monitor_idx)
 
 def map_dxcam_monitors():
-    mapping = {}
-    mss_geometries = []
+    return monitor_registry.dxcam_mapping()
+
+def _probe_dxcam_mapping(monitors):
+    """GUI (mss) index -> DXCam output index. Expensive: creates one dxcam instance per output."""
     try:
-        with mss.mss() as sct:
-             for m in sct.monitors[1:]:
-                 mss_geometries.append((m['width'], m['height']))
-    except: return {}
+        import dxcam # Windows only (DXGI)
+    except Exception:
+        return {}
+    mapping = {}
+    mss_geometries = [(m[2], m[3]) for m in monitors]
 
     dxcam_geometries = []
     for i in range(10):
@@ -157,35 +247,287 @@ def map_dxcam_monitors():
             mapping[gui_idx] = gui_idx 
     return mapping
 
-# --- CURSOR LOGIC ---
-class CURSORINFO(Structure):
-    _fields_ = [("cbSize", c_uint), ("flags", c_uint), ("hCursor", c_void_p), ("ptScreenPos", type('POINT', (Structure,), {'_fields_': [("x", c_long), ("y", c_long)]}))]
+# --- HELPER: WINDOW LOOKUP (Region capture) ---
+class RECT(Structure):
+    _fields_ = [("left", c_long), ("top", c_long), ("right", c_long), ("bottom", c_long)]
+
+DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+def find_window(spec):
+    """
+    Finds a top-level visible window.
+    :param spec: Handle ("0x1A2B" / "12345") or case-insensitive title substring
+    :return: hwnd (int) or None
+    """
+    spec = str(spec).strip()
+    if not spec or windll is None: return None
+    try:
+        hwnd = int(spec, 0)
+        return hwnd if windll.user32.IsWindow(c_void_p(hwnd)) else None
+    except ValueError: pass
+
+    user32 = windll.user32
+    needle = spec.lower()
+    found = []
+
+    @WINFUNCTYPE(c_int, c_void_p, c_void_p)
+    def _enum(hwnd, _):
+        if not user32.IsWindowVisible(hwnd): return True
+        length = user32.GetWindowTextLengthW(hwnd)
+        if length <= 0: return True
+        buf = create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, buf, length + 1)
+        if needle in buf.value.lower():
+            found.append(hwnd)
+            return False # Stop at the first match (Z-order: topmost first)
+        return True
+
+    user32.EnumWindows(_enum, 0)
+    return found[0] if found else None
+
+def get_window_rect(hwnd):
+    """
+    Visible bounds of a window in desktop coordinates: (left, top, width, height).
+    None if the window is gone or minimized.
+    """
+    if windll is None: return None
+    user32 = windll.user32
+    if not hwnd or not user32.IsWindow(c_void_p(hwnd)) or user32.IsIconic(c_void_p(hwnd)): return None
+    r = RECT()
+    # DWM bounds exclude the invisible resize borders of Win10/11 (GetWindowRect includes them)
+    try:
+        if windll.dwmapi.DwmGetWindowAttribute(c_void_p(hwnd), DWMWA_EXTENDED_FRAME_BOUNDS, byref(r), sizeof(r)) != 0:
+            raise OSError
+    except Exception:
+        if not user32.GetWindowRect(c_void_p(hwnd), byref(r)): return None
+    return r.left, r.top, r.right - r.left, r.bottom - r.top
 
+# --- CURSOR LOGIC ---
 class POINT(Structure):
     _fields_ = [("x", c_long), ("y", c_long)]
 
+class CURSORINFO(Structure):
+    _fields_ = [("cbSize", c_uint), ("flags", c_uint), ("hCursor", c_void_p), ("ptScreenPos", POINT)]
+
+class ICONINFO(Structure):
+    _fields_ = [("fIcon", c_int), ("xHotspot", c_uint), ("yHotspot", c_uint), ("hbmMask", c_void_p), ("hbmColor", c_void_p)]
+
+class BITMAPINFOHEADER(Structure):
+    _fields_ = [("biSize", c_uint), ("biWidth", c_long), ("biHeight", c_long), ("biPlanes", c_ushort),
+                ("biBitCount", c_ushort), ("biCompression", c_uint), ("biSizeImage", c_uint),
+                ("biXPelsPerMeter", c_long), ("biYPelsPerMeter", c_long), ("biClrUsed", c_uint), ("biClrImportant", c_uint)]
+
+CURSOR_SHOWING = 0x1
+DI_NORMAL = 0x3
+SM_CXCURSOR, SM_CYCURSOR = 13, 14
+
 def get_cursor_pos_fast():
+    if windll is None: return get_cursor_info()[:2]
     pt = POINT()
     windll.user32.GetCursorPos(byref(pt))
     return pt.x, pt.y
 
+def get_cursor_info():
+    """Returns (x, y, hCursor). hCursor is None if the cursor is hidden."""
+    if windll is None:
+        from modules.x11_capture import get_cursor_info as x11_cursor_info # XFixes
+        return x11_cursor_info()
+    ci = CURSORINFO()
+    ci.cbSize = sizeof(CURSORINFO)
+    if not windll.user32.GetCursorInfo(byref(ci)):
+        x, y = get_cursor_pos_fast()
+        return x, y, None
+    handle = ci.hCursor if ci.flags & CURSOR_SHOWING else None
+    return ci.ptScreenPos.x, ci.ptScreenPos.y, handle
+
 IDC_ARROW, IDC_HAND, IDC_IBEAM = 32512, 32649, 32513
 
+# Arrow outline for 720p/1080p roughly
+# Points: Tip(0,0), BottomLeft(0,16), Inner(4,13), TailBott(7,20), TailTop(10,19), InnerRight(6,12), Right(11,11)
+ARROW_POINTS = [[0, 0], [0, 16], [4, 13], [7, 20], [10, 19], [6, 12], [11, 11]]
+
+def _arrow_polygon(x, y, scale):
+    pts = np.array([[x + int(px * scale), y + int(py * scale)] for px, py in ARROW_POINTS], np.int32)
+    return pts.reshape((-1, 1, 2))
+
 def draw_cursor_arrow(img, x, y, scale=1.0):
-    # Base coords for 720p/1080p roughly
-    # Points: Tip(0,0), BottomLeft(0,16), Inner(4,13), TailBott(7,20), TailTop(10,19), InnerRight(6,12), Right(11,11)
-    base_pts = [[0, 0], [0, 16], [4, 13], [7, 20], [10, 19], [6, 12], [11, 11]]
-    
-    # Scale points
-    scaled_pts = []
-    for px, py in base_pts:
-        scaled_pts.append([x + int(px * scale), y + int(py * scale)])
-        
-    pts = np.array(scaled_pts, np.int32)
-    pts = pts.reshape((-1, 1, 2))
+    pts = _arrow_polygon(x, y, scale)
     cv2.fillPoly(img, [pts], (255, 255, 255))
     cv2.polylines(img, [pts], True, (0, 0, 0), max(1, int(1 * scale)))
 
+def render_arrow_sprite(scale=1.0):
+    """Rasterizes the arrow ONCE into a BGRA sprite. Returns (sprite, (hot_x, hot_y))."""
+    lw = max(1, int(1 * scale))
+    pad = lw + 1
+    w = int(11 * scale) + 2 * pad + 1
+    h = int(20 * scale) + 2 * pad + 1
+    sprite = np.zeros((h, w, 4), dtype=np.uint8)
+    pts = _arrow_polygon(pad, pad, scale)
+    cv2.fillPoly(sprite, [pts], (255, 255, 255, 255))
+    cv2.polylines(sprite, [pts], True, (0, 0, 0, 255), lw)
+    return sprite, (pad, pad)
+
+def render_system_cursor(hcursor):
+    """
+    Renders a Windows cursor handle into a BGRA sprite (GDI DrawIconEx).
+    The cursor is drawn on black then on white: the difference gives the alpha,
+    which also covers monochrome/legacy cursors. Returns (sprite, (hot_x, hot_y)) or None.
+    """
+    user32, gdi32 = windll.user32, windll.gdi32
+    gdi32.CreateCompatibleDC.restype = c_void_p
+    gdi32.CreateDIBSection.restype = c_void_p
+    gdi32.SelectObject.restype = c_void_p
+    gdi32.SelectObject.argtypes = [c_void_p, c_void_p]
+    gdi32.DeleteObject.argtypes = [c_void_p]
+    gdi32.DeleteDC.argtypes = [c_void_p]
+    user32.GetIconInfo.argtypes = [c_void_p, c_void_p]
+    user32.DrawIconEx.argtypes = [c_void_p, c_int, c_int, c_void_p, c_int, c_int, c_uint, c_void_p, c_uint]
+
+    info = ICONINFO()
+    if not user32.GetIconInfo(hcursor, byref(info)): return None
+    w, h = user32.GetSystemMetrics(SM_CXCURSOR), user32.GetSystemMetrics(SM_CYCURSOR)
+    renders = []
+    hdc = gdi32.CreateCompatibleDC(None)
+    try:
+        bmi = BITMAPINFOHEADER()
+        bmi.biSize = sizeof(BITMAPINFOHEADER)
+        bmi.biWidth, bmi.biHeight = w, -h # Top-down
+        bmi.biPlanes, bmi.biBitCount = 1, 32
+        bits = c_void_p()
+        hbmp = gdi32.CreateDIBSection(hdc, byref(bmi), 0, byref(bits), None, 0)
+        if not hbmp: return None
+        old = gdi32.SelectObject(hdc, hbmp)
+        pixels = np.ctypeslib.as_array((c_ubyte * (w * h * 4)).from_address(bits.value)).reshape(h, w, 4)
+        for bg in (0, 255):
+            pixels[:] = bg
+            user32.DrawIconEx(hdc, 0, 0, hcursor, w, h, 0, None, DI_NORMAL)
+            renders.append(pixels[..., :3].astype(np.int16))
+        gdi32.SelectObject(hdc, old)
+        gdi32.DeleteObject(hbmp)
+    finally:
+        gdi32.DeleteDC(hdc)
+        if info.hbmMask: gdi32.DeleteObject(info.hbmMask)
+        if info.hbmColor: gdi32.DeleteObject(info.hbmColor)
+
+    on_black, on_white = renders
+    alpha = np.clip(255 - (on_white - on_black).max(axis=2), 0, 255)
+    # Un-premultiply: on_black = color * alpha / 255
+    color = np.where(alpha[..., None] > 0, on_black * 255 // np.maximum(alpha, 1)[..., None], 0)
+    sprite = np.dstack((np.clip(color, 0, 255), alpha)).astype(np.uint8)
+    return sprite, (int(info.xHotspot), int(info.yHotspot))
+
+class CursorSpriteCache:
+    """
+    Cursor rendered ONCE per (cursor handle, scale) into a BGRA sprite, then alpha-blended
+    into the small region under the cursor (no per-frame polygon rasterization on the full frame).
+    hCursor=None (or rendering failure) -> drawn arrow.
+    """
+    MAX_SPRITES = 64
+
+    def __init__(self):
+        self.sprites = {}
+        self.shapes = {} # Handle -> (sprite, hotspot) provided by a capture backend (X11/XFixes)
+
+    def register(self, handle, sprite, hotspot):
+        """Adds a cursor image (BGRA, straight alpha) captured by a backend, drawn for 'handle'."""
+        if len(self.shapes) >= self.MAX_SPRITES: self.shapes.clear()
+        self.shapes[handle] = (sprite, hotspot)
+
+    def get(self, hcursor, scale):
+        """Returns the cached entry [hotspot, alpha weights, inverse weights, {(channels, pix_fmt): color}]."""
+        key = (hcursor, round(scale, 2))
+        entry = self.sprites.get(key)
+        if entry is None:
+            rendered = None
+            if hcursor:
+                try:
+                    rendered = self.shapes.get(hcursor)
+                    if rendered is None and windll is not None:
+                        rendered = render_system_cursor(hcursor)
+                    if rendered is not None and scale != 1.0:
+                        sprite, (hx, hy) = rendered
+                        size = (max(1, int(sprite.shape[1] * scale)), max(1, int(sprite.shape[0] * scale)))
+                        rendered = (cv2.resize(sprite, size, interpolation=cv2.INTER_AREA), (int(hx * scale), int(hy * scale)))
+                except Exception:
+                    rendered = None
+            if rendered is None:
+                rendered = render_arrow_sprite(scale)
+            sprite, hotspot = rendered
+            weights = sprite[..., 3].astype(np.float32) / 255.0
+            entry = [hotspot, weights, 1.0 - weights, {"sprite": sprite}]
+            if len(self.sprites) >= self.MAX_SPRITES: self.sprites.clear()
+            self.sprites[key] = entry
+        return entry
+
+    def sprite(self, hcursor, scale):
+        """(BGRA sprite with straight alpha, hotspot) as drawn at this scale."""
+        entry = self.get(hcursor, scale)
+        return entry[3]["sprite"], entry[0]
+
+    @staticmethod
+    def _color(colors, channels, pix_fmt):
+        # Sprite color in the target layout (built once per layout)
+        key = (channels, pix_fmt == "rgb24")
+        color = colors.get(key)
+        if color is None:
+            sprite = colors["sprite"]
+            color = sprite[..., [2, 1, 0, 3]] if key[1] else sprite
+            color = np.ascontiguousarray(color[..., :channels])
+            colors[key] = color
+        return color
+
+    def bounds(self, x, y, hcursor, scale, width, height):
+        """Region (x0, y0, x1, y1) covered by the cursor, clipped to width x height. None if off-screen."""
+        (hx, hy), weights = self.get(hcursor, scale)[:2]
+        sh, sw = weights.shape
+        x0, y0 = x - hx, y - hy
+        cx0, cy0 = max(0, x0), max(0, y0)
+        cx1, cy1 = min(width, x0 + sw), min(height, y0 + sh)
+        if cx0 >= cx1 or cy0 >= cy1: return None
+        return cx0, cy0, cx1, cy1
+
+    def draw(self, img, x, y, hcursor=None, scale=1.0, pix_fmt="bgra"):
+        """
+        Alpha-blends the cursor at (x, y) (hotspot position) into img (3 or 4 channels), in place.
+        Returns the modified region (x0, y0, x1, y1) or None if off-screen.
+        """
+        ih, iw = img.shape[:2]
+        rect = self.bounds(x, y, hcursor, scale, iw, ih)
+        if rect is None: return None
+        cx0, cy0, cx1, cy1 = rect
+        (hx, hy), weights, inv_weights, colors = self.get(hcursor, scale)
+        x0, y0 = x - hx, y - hy
+
+        sy, sx = slice(cy0 - y0, cy1 - y0), slice(cx0 - x0, cx1 - x0)
+        color = self._color(colors, img.shape[2], pix_fmt)
+        roi = img[cy0:cy1, cx0:cx1]
+        # In place on the ROI only (the 4th byte of BGRA is ignored by the encoder)
+        cv2.blendLinear(roi, color[sy, sx], inv_weights[sy, sx], weights[sy, sx], dst=roi)
+        return cx0, cy0, cx1, cy1
+
+# GLOBAL CURSOR CACHE
+cursor_sprites = CursorSpriteCache()
+
+class CursorOverlay:
+    """
+    Cursor draw request handed to the encoder's conversion stage.
+    Callable (draws, returns the region) + bounds() so the converter can save the pixels under it.
+    """
+    __slots__ = ("x", "y", "hcursor", "scale", "pix_fmt", "cache")
+
+    def __init__(self, x, y, hcursor=None, scale=1.0, pix_fmt="bgra", cache=None):
+        self.x, self.y = x, y
+        self.hcursor = hcursor
+        self.scale = scale
+        self.pix_fmt = pix_fmt
+        self.cache = cache or cursor_sprites
+
+    def bounds(self, width, height):
+        return self.cache.bounds(self.x, self.y, self.hcursor, self.scale, width, height)
+
+    def __call__(self, img):
+        return self.cache.draw(img, self.x, self.y, self.hcursor, self.scale, self.pix_fmt)
+
 # --- SYSTEM METRICS (CPU/GPU) ---
 
 def get_cpu_usage():
@@ -205,8 +547,10 @@ def get_gpu_usage():
         cmd = ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"]
         
         # Prevent console window flashing on Windows
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        startupinfo = None
+        if hasattr(subprocess, "STARTUPINFO"):
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
         
         result = subprocess.run(cmd, capture_output=True, text=True, startupinfo=startupinfo, timeout=0.5)
         if result.returncode == 0:
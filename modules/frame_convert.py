@@ -0,0 +1,188 @@
+import av
+import cv2
+import logging
+import numpy as np
+from modules.buffer_pool import frame_pool
+from modules.resize_engine import Resizer, cached_resize_method
+
+logger = logging.getLogger("SenderGUI")
+
+# --- FUSED SCALE + I420 CONVERSION STAGE ---
+# Native capture buffer (bgra/rgb24/bgr24) -> scaled -> YUV420p (I420), written straight
+# into the planes of a pool of pre-allocated av.VideoFrame owned by the encoder.
+# Steady state: no per-frame large allocation (scaled and I420 buffers come from the
+# BufferPool) and PyAV no longer runs its own swscale conversion (the frame already
+# matches the codec).
+# The scale step is a selectable Resizer (modules/resize_engine.py), 'auto' = calibrated on
+# the first frame of each capture size (once per process, see cached_resize_method).
+
+I420_CODES = {
+    "bgra": cv2.COLOR_BGRA2YUV_I420,
+    "rgb24": cv2.COLOR_RGB2YUV_I420,
+    "bgr24": cv2.COLOR_BGR2YUV_I420,
+}
+
+
+def plane_view(plane):
+    """Writable (height, width) numpy view on an av VideoPlane (skips line padding)."""
+    buf = np.frombuffer(plane, dtype=np.uint8)
+    return buf.reshape(plane.height, plane.line_size)[:, :plane.width]
+
+
+class FrameConverter:
+    def __init__(self, width, height, pool_size=3, buffer_pool=None, resize_method="bilinear", resize_budget_ms=4.0):
+        """
+        :param width: Output width (even)
+        :param height: Output height (even)
+        :param pool_size: Number of rotating VideoFrames (a frame is rewritten
+                          pool_size conversions later, after the encoder consumed it)
+        :param buffer_pool: BufferPool for the scaled/I420 intermediates (default: global frame_pool)
+        :param resize_method: See resize_engine.RESIZE_METHODS
+        :param resize_budget_ms: Max resize time per frame for 'auto'
+        """
+        self.width = width
+        self.height = height
+        self.frames = [av.VideoFrame(width, height, "yuv420p") for _ in range(pool_size)]
+        self.planes = [[plane_view(p) for p in f.planes] for f in self.frames]
+        self.index = 0
+        self.buffer_pool = buffer_pool or frame_pool
+        self.resize_method = resize_method
+        self.resize_budget_ms = resize_budget_ms
+        self.resizer = None
+        # Save-under state (cursor-only updates)
+        self.composed = None     # Last composed scaled image (owned buffer), None = not reusable
+        self.composed_fmt = None
+        self.i420 = None         # I420 of self.composed
+        self.under = None        # (x0, y0, x1, y1, clean pixels) under the drawn cursor
+        self.fast_updates = 0    # Frames served by update_overlay()
+        self.in_use = set()      # id() of frames still queued/encoding (encoder thread): not rewritten
+
+    def _i420_planes(self, i420, w=None, h=None):
+        """Y, U, V views of a contiguous OpenCV I420 buffer ((h*3/2) x w)."""
+        w, h = w or self.width, h or self.height
+        cw, ch = w // 2, h // 2
+        flat = i420.reshape(-1)
+        y_size = w * h
+        return (i420[:h],
+                flat[y_size:y_size + cw * ch].reshape(ch, cw),
+                flat[y_size + cw * ch:].reshape(ch, cw))
+
+    def convert(self, src, pix_fmt, overlay=None):
+        """
+        Scales and converts a native frame into the next pooled yuv420p VideoFrame.
+        :param src: HxWxC uint8 native buffer (never modified), or an I420 buffer ((h*3/2) x w) at the output size
+        :param pix_fmt: 'bgra', 'rgb24', 'bgr24' or 'i420'
+        :param overlay: Optional callable(img) drawing on the scaled native image (cursor).
+                        If it also has bounds(w, h), the pixels under it are saved for update_overlay()
+        :return: av.VideoFrame (valid until pool_size further conversions)
+        """
+        if pix_fmt == "i420":
+            # Already converted at this size by another encoder (simulcast): copy only, no save-under
+            self.composed = self.under = self.i420 = None
+            return self._emit(src)
+        code = I420_CODES.get(pix_fmt)
+        if code is None: raise ValueError(f"Unsupported input format: {pix_fmt}")
+
+        h, w = src.shape[:2]
+        scaled_shape = (self.height, self.width, src.shape[2])
+        if (w, h) != (self.width, self.height):
+            scaled = self.buffer_pool.get(scaled_shape, tag="convert.scaled")
+            self._get_resizer(src, pix_fmt)(src, scaled)
+        elif overlay is not None:
+            # Same size but we must draw: work on our own buffer, not on the capture buffer
+            scaled = self.buffer_pool.get(scaled_shape, tag="convert.scaled")
+            np.copyto(scaled, src)
+        else:
+            scaled = src
+
+        # Keep the clean pixels under the cursor (save-under) before drawing it
+        self.under = None
+        self.composed = scaled if scaled is not src else None # Capture buffers are not ours
+        self.composed_fmt = pix_fmt
+        if overlay is not None:
+            if hasattr(overlay, "bounds"):
+                self.under = self._save_under(scaled, overlay)
+            else:
+                self.composed = None # Unknown drawn area: no fast path
+            overlay(scaled)
+
+        i420 = self.buffer_pool.get((self.height * 3 // 2, self.width), tag="convert.i420")
+        cv2.cvtColor(scaled, code, dst=i420)
+        self.i420 = i420
+        return self._emit(i420)
+
+    def _get_resizer(self, src, pix_fmt):
+        """Resizer for this capture size (built, and calibrated for 'auto', on size change)."""
+        src_size = (src.shape[1], src.shape[0])
+        if self.resizer is None or self.resizer.src_size != src_size:
+            method = self.resize_method
+            if method == "auto":
+                method, results = cached_resize_method(src, pix_fmt, (self.width, self.height), self.resize_budget_ms)
+                summary = " | ".join(f"{r['method']}: {r['ms']:.1f}ms {r['bytes'] / 1024:.0f}KB {r['psnr']:.1f}dB" for r in results)
+                logger.info(f"[RESIZE] Auto -> {method} (budget {self.resize_budget_ms:.1f}ms) | {summary or 'cached'}")
+            self.resizer = Resizer(method, src_size, (self.width, self.height))
+        return self.resizer
+
+    def update_overlay(self, pix_fmt, overlay=None):
+        """
+        [OPTIM] Save-under fast path: content unchanged, only the cursor moved.
+        Restores the clean pixels under the previous cursor, draws the new one and
+        re-converts only those two areas in the persistent I420 buffer (no capture buffer,
+        no resize, no full-frame conversion).
+        :param pix_fmt: Native format of the previous convert() (must match)
+        :param overlay: New cursor overlay (with bounds()) or None (cursor hidden/outside)
+        :return: av.VideoFrame, or None if a full convert() is required
+        """
+        img = self.composed
+        if img is None or pix_fmt != self.composed_fmt: return None
+        if overlay is not None and not hasattr(overlay, "bounds"): return None
+
+        areas = []
+        if self.under is not None:
+            x0, y0, x1, y1, pixels = self.under
+            img[y0:y1, x0:x1] = pixels
+            areas.append((x0, y0, x1, y1))
+            self.under = None
+        if overlay is not None:
+            self.under = self._save_under(img, overlay)
+            rect = overlay(img)
+            if rect: areas.append(rect)
+
+        code = I420_CODES[pix_fmt]
+        for rect in areas:
+            self._convert_area(img, code, rect)
+        self.fast_updates += 1
+        return self._emit(self.i420)
+
+    def _save_under(self, img, overlay):
+        rect = overlay.bounds(self.width, self.height)
+        if rect is None: return None
+        x0, y0, x1, y1 = rect
+        return x0, y0, x1, y1, img[y0:y1, x0:x1].copy()
+
+    def _convert_area(self, img, code, rect):
+        """Re-converts one area of img into self.i420 (aligned on the 2x2 chroma blocks)."""
+        x0, y0, x1, y1 = rect
+        x0, y0 = x0 & ~1, y0 & ~1
+        x1, y1 = min(self.width, (x1 + 1) & ~1), min(self.height, (y1 + 1) & ~1)
+        w, h = x1 - x0, y1 - y0
+        if w <= 0 or h <= 0: return
+        part = cv2.cvtColor(np.ascontiguousarray(img[y0:y1, x0:x1]), code)
+        dst_y, dst_u, dst_v = self._i420_planes(self.i420)
+        src_y, src_u, src_v = self._i420_planes(part, w, h)
+        dst_y[y0:y1, x0:x1] = src_y
+        dst_u[y0 // 2:y1 // 2, x0 // 2:x1 // 2] = src_u
+        dst_v[y0 // 2:y1 // 2, x0 // 2:x1 // 2] = src_v
+
+    def _emit(self, i420):
+        for _ in range(len(self.frames)):
+            if id(self.frames[self.index]) not in self.in_use: break
+            self.index = (self.index + 1) % len(self.frames)
+        frame = self.frames[self.index]
+        planes = self.planes[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        for plane, data in zip(planes, self._i420_planes(i420)):
+            np.copyto(plane, data)
+
+        frame.pict_type = av.video.frame.PictureType.NONE # Pooled frame: clear a previous forced IDR
+        return frame
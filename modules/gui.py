@@ -11,6 +11,7 @@ import paramiko
 import webbrowser
 from modules.config import state
 from modules.core import stream_thread_func
+from modules.codec_probe import codec_probe
 from modules.custom_utils import TextHandler, get_monitors, get_cpu_usage, get_gpu_usage
 
 logger = logging.getLogger("SenderGUI")
@@ -146,11 +147,13 @@ class StreamApp(ctk.CTk):
         self.opt_mon.grid(row=0, column=0, sticky="ew", padx=(0, 5), pady=(0, 10))
         if state.monitor_idx < len(self.opt_mon._values): self.opt_mon.set(self.opt_mon._values[state.monitor_idx])
 
-        self.opt_engine = ctk.CTkOptionMenu(frm_grid, values=["GPU NVIDIA", "CPU"], command=self.on_engine_change, fg_color="#2B3240", button_color="#3B4252")
+        self.opt_engine = ctk.CTkOptionMenu(frm_grid, values=self.engine_options(), command=self.on_engine_change, fg_color="#2B3240", button_color="#3B4252")
         self.opt_engine.grid(row=0, column=1, sticky="ew", padx=(5, 0), pady=(0, 10))
         # Init logic
-        if state.backend == "DXCam": self.opt_engine.set("GPU NVIDIA")
+        if state.backend == "DXCam": self.opt_engine.set(self.engine_options()[0])
         else: self.opt_engine.set("CPU")
+        # [NEW] Encoders really tested in the background (cached on disk): menu restricted when done
+        codec_probe.start(on_done=lambda: self.after(0, self.update_engine_options))
         
         # Row 1: Preset | Resolution
         self.opt_preset = ctk.CTkOptionMenu(frm_grid, command=self.on_preset_change, fg_color="#2B3240", button_color="#3B4252")
@@ -185,17 +188,21 @@ class StreamApp(ctk.CTk):
         ctk.CTkLabel(self.frm_slds, text="Débit", font=self.F_BODY).grid(row=2, column=0, sticky="w", padx=10)
         self.sld_bit = ctk.CTkSlider(self.frm_slds, from_=0.1, to=25.0, number_of_steps=249, command=self.on_bitrate_change, progress_color=self.C_PRIMARY, button_color=self.C_PRIMARY, button_hover_color=self.C_PRIMARY)
         self.sld_bit.set(state.bitrate_mbps)
-        self.sld_bit.grid(row=3, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 15))
+        self.sld_bit.grid(row=3, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 2))
+        # Live reconfig limits (see run_pipeline B2)
+        ctk.CTkLabel(self.frm_slds, text="Débit appliqué en direct entre 50 et 100 % du débit de départ.\n"
+                                        "Changement de FPS ou débit plus haut : nouvel encodeur (image clé).",
+                     font=self.F_SMALL, text_color=self.C_TEXT_DIM, justify="left").grid(row=4, column=0, columnspan=2, sticky="w", padx=10, pady=(0, 15))
 
 
         # Latency (Restored)
         self.lbl_lat = ctk.CTkLabel(self.frm_slds, text=f"Buffering: {state.latency_value}%", font=self.F_H2, text_color=self.C_WARN)
-        self.lbl_lat.grid(row=4, column=1, sticky="e", padx=10)
-        ctk.CTkLabel(self.frm_slds, text="Latence", font=self.F_BODY).grid(row=4, column=0, sticky="w", padx=10)
+        self.lbl_lat.grid(row=5, column=1, sticky="e", padx=10)
+        ctk.CTkLabel(self.frm_slds, text="Latence", font=self.F_BODY).grid(row=5, column=0, sticky="w", padx=10)
         
         self.sld_lat = ctk.CTkSlider(self.frm_slds, from_=1, to=100, number_of_steps=99, command=self.on_latency_change, progress_color=self.C_WARN, button_color=self.C_WARN, button_hover_color=self.C_WARN)
         self.sld_lat.set(state.latency_value)
-        self.sld_lat.grid(row=5, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 15))
+        self.sld_lat.grid(row=6, column=0, columnspan=2, sticky="ew", padx=10, pady=(0, 15))
 
         
         # 3. AUDIO CARD
@@ -485,6 +492,7 @@ class StreamApp(ctk.CTk):
         if state.streaming:
             client_status = "Connecté" if state.client_connected else "En attente..."
             msg = f"Status: En Ligne ({client_status}) | {state.current_fps} FPS | {state.current_mbps:.2f} Mbps"
+            if state.adaptive_fps: msg += f" | Cadence: {state.content_fps}/{state.fps}"
             color = "green" if state.client_connected else "orange"
             
             # --- BUTTON STATE MANAGEMENT (STICKY) ---
@@ -554,10 +562,28 @@ class StreamApp(ctk.CTk):
         state.monitor_idx = idx
         self.save_config()
 
+    def engine_options(self):
+        """Engine menu entries: GPU only if NVENC/AMF opened in the codec probe (both offered until it is done)."""
+        nvenc, amf = codec_probe.works("h264_nvenc"), codec_probe.works("h264_amf")
+        if nvenc is not False: return ["GPU NVIDIA", "CPU"]
+        if amf is not False: return ["GPU AMD", "CPU"]
+        return ["CPU"]
+
+    def update_engine_options(self):
+        values = self.engine_options()
+        self.opt_engine.configure(values=values)
+        if state.backend != "DXCam": return
+        if values[0] == "CPU":
+            logger.warning(f"No working GPU encoder ({codec_probe.summary()}): CPU engine selected.")
+            self.opt_engine.set("CPU")
+            self.on_engine_change("CPU")
+        else:
+            self.opt_engine.set(values[0])
+
     def on_engine_change(self, choice):
-        if "NVIDIA" in choice:
+        if "GPU" in choice:
             state.backend = "DXCam"
-            state.codec_choice = "auto" # Auto prefers NVENC
+            state.codec_choice = "auto" # Auto prefers NVENC, then AMF
         else:
             state.backend = "MSS"
             state.codec_choice = "x264"
@@ -0,0 +1,398 @@
+import re
+import logging
+
+logger = logging.getLogger("SenderGUI")
+
+# --- H.264 SKIP FRAMES (cheap CFR repeats) ---
+# RTSP/WebRTC needs a constant frame rate, but on a static desktop every repeat is the
+# same picture. Instead of running the encoder, we emit a synthesized P picture where every
+# macroblock is P_Skip (a copy of the previous picture): a few bytes, no conversion, no encode.
+#
+# The encoder does not know about the inserted pictures, so its following slices are
+# patched: frame_num (and pic_order_cnt_lsb for POC type 0) are shifted by the number of
+# inserted pictures. Both are fixed-width fields of the slice header: rewritten in place.
+# Offsets are reset by the next IDR.
+#
+# Only enabled when the stream allows it without drift:
+#   - max_num_ref_frames == 1: the encoder's next P picture references "its" previous picture,
+#     which for the decoder is the last skip picture (same pixels)
+#   - progressive (frame_mbs_only), POC type 0 or 2, one slice group
+# CAVLC (baseline, x264 here) and CABAC (main/high, NVENC/AMF) slice data are both supported.
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SPS = 7
+NAL_PPS = 8
+SLICE_P = 5 # slice_type 5: P, every slice of the picture
+
+START_CODE = re.compile(b"\x00\x00\x01")
+_EPB = re.compile(b"\x00\x00(?=[\x00-\x03])")
+
+HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+
+def split_nals(data):
+    """Annex B access unit -> list of NAL units (bytes, start codes stripped)."""
+    starts = [m.end() for m in START_CODE.finditer(data)]
+    nals = []
+    for i, s in enumerate(starts):
+        e = starts[i + 1] - 3 if i + 1 < len(starts) else len(data)
+        nal = data[s:e]
+        nals.append(nal.rstrip(b"\x00") if i + 1 < len(starts) else nal) # 4-byte start code / trailing_zero
+    return nals
+
+
+def unescape(nal):
+    """NAL payload -> RBSP (emulation prevention bytes removed)."""
+    return nal.replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+def escape(rbsp):
+    """RBSP -> NAL payload (emulation prevention bytes inserted)."""
+    return _EPB.sub(b"\x00\x00\x03", rbsp)
+
+
+class BitReader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0 # Bit position
+
+    def u(self, n):
+        v = 0
+        for _ in range(n):
+            byte = self.data[self.pos >> 3]
+            v = (v << 1) | ((byte >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return v
+
+    def ue(self):
+        zeros = 0
+        while self.u(1) == 0:
+            zeros += 1
+        return (1 << zeros) - 1 + self.u(zeros)
+
+    def se(self):
+        k = self.ue()
+        return (k + 1) // 2 if k & 1 else -(k // 2)
+
+
+class BitWriter:
+    def __init__(self):
+        self.bits = []
+
+    def u(self, n, v):
+        self.bits.extend((v >> (n - 1 - i)) & 1 for i in range(n))
+
+    def ue(self, v):
+        v += 1
+        n = v.bit_length()
+        self.u(n - 1, 0)
+        self.u(n, v)
+
+    def se(self, v):
+        self.ue(2 * v - 1 if v > 0 else -2 * v)
+
+    def aligned(self):
+        return len(self.bits) % 8 == 0
+
+    def tobytes(self):
+        bits = self.bits + [0] * (-len(self.bits) % 8)
+        return bytes(int("".join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8))
+
+
+def write_bits(buf, pos, n, v):
+    """Overwrites n bits at bit position pos of a bytearray."""
+    for i in range(n):
+        bit = (v >> (n - 1 - i)) & 1
+        byte, shift = (pos + i) >> 3, 7 - ((pos + i) & 7)
+        buf[byte] = (buf[byte] & ~(1 << shift)) | (bit << shift)
+
+
+def _skip_scaling_list(r, size):
+    last, nxt = 8, 8
+    for _ in range(size):
+        if nxt:
+            nxt = (last + r.se() + 256) % 256
+        last = nxt or last
+
+
+def parse_sps(rbsp):
+    r = BitReader(rbsp)
+    profile = r.u(8)
+    r.u(16) # constraint flags + level
+    sps = {"id": r.ue(), "chroma_format_idc": 1, "separate_colour_plane": 0}
+    if profile in HIGH_PROFILES:
+        sps["chroma_format_idc"] = r.ue()
+        if sps["chroma_format_idc"] == 3: sps["separate_colour_plane"] = r.u(1)
+        r.ue(); r.ue(); r.u(1) # bit depths, qpprime_y_zero_transform_bypass
+        if r.u(1): # seq_scaling_matrix_present
+            for i in range(8 if sps["chroma_format_idc"] != 3 else 12):
+                if r.u(1): _skip_scaling_list(r, 16 if i < 6 else 64)
+    sps["log2_max_frame_num"] = r.ue() + 4
+    sps["poc_type"] = r.ue()
+    if sps["poc_type"] == 0:
+        sps["log2_max_poc_lsb"] = r.ue() + 4
+    elif sps["poc_type"] == 1:
+        r.u(1); r.se(); r.se()
+        for _ in range(r.ue()): r.se()
+    sps["num_ref_frames"] = r.ue()
+    r.u(1) # gaps_in_frame_num_value_allowed
+    sps["mb_width"] = r.ue() + 1
+    sps["mb_height"] = r.ue() + 1
+    sps["frame_mbs_only"] = r.u(1)
+    return sps
+
+
+def parse_pps(rbsp):
+    r = BitReader(rbsp)
+    pps = {"id": r.ue(), "sps_id": r.ue()}
+    pps["cabac"] = r.u(1)
+    pps["bottom_field_poc"] = r.u(1)
+    pps["slice_groups"] = r.ue() + 1
+    if pps["slice_groups"] > 1: return pps # Unsupported (FMO), nothing else needed
+    r.ue(); r.ue() # num_ref_idx_l0/l1_default_active_minus1
+    pps["weighted_pred"] = r.u(1)
+    r.u(2)
+    pps["init_qp"] = 26 + r.se()
+    r.se(); r.se() # pic_init_qs, chroma_qp_index_offset
+    pps["deblocking_control"] = r.u(1)
+    r.u(1) # constrained_intra_pred
+    pps["redundant_pic_cnt"] = r.u(1)
+    return pps
+
+
+# CABAC tables (ITU-T H.264 9.3.1.2 / 9.3.3.2)
+RANGE_TAB_LPS = (
+    (128, 176, 208, 240), (128, 167, 197, 227), (128, 158, 187, 216), (123, 150, 178, 205),
+    (116, 142, 169, 195), (111, 135, 160, 185), (105, 128, 152, 175), (100, 122, 144, 166),
+    (95, 116, 137, 158), (90, 110, 130, 150), (85, 104, 123, 142), (81, 99, 117, 135),
+    (77, 94, 111, 128), (73, 89, 105, 122), (69, 85, 100, 116), (66, 80, 95, 110),
+    (62, 76, 90, 104), (59, 72, 86, 99), (56, 69, 81, 94), (53, 65, 77, 89),
+    (51, 62, 73, 85), (48, 59, 69, 80), (46, 56, 66, 76), (43, 53, 63, 72),
+    (41, 50, 59, 69), (39, 48, 56, 65), (37, 45, 54, 62), (35, 43, 51, 59),
+    (33, 41, 48, 56), (32, 39, 46, 53), (30, 37, 43, 50), (29, 35, 41, 48),
+    (27, 33, 39, 45), (26, 31, 37, 43), (24, 30, 35, 41), (23, 28, 33, 39),
+    (22, 27, 32, 37), (21, 26, 30, 35), (20, 24, 29, 33), (19, 23, 27, 31),
+    (18, 22, 26, 30), (17, 21, 25, 28), (16, 20, 23, 27), (15, 19, 22, 25),
+    (14, 18, 21, 24), (14, 17, 20, 23), (13, 16, 19, 22), (12, 15, 18, 21),
+    (12, 14, 17, 20), (11, 14, 16, 19), (11, 13, 15, 18), (10, 12, 15, 17),
+    (10, 12, 14, 16), (9, 11, 13, 15), (9, 11, 12, 14), (8, 10, 12, 14),
+    (8, 9, 11, 13), (7, 9, 11, 12), (7, 9, 10, 12), (7, 8, 10, 11),
+    (6, 8, 9, 11), (6, 7, 9, 10), (6, 7, 8, 9), (2, 2, 2, 2),
+)
+TRANS_IDX_LPS = (
+    0, 0, 1, 2, 2, 4, 4, 5, 6, 7, 8, 9, 9, 11, 11, 12,
+    13, 13, 15, 15, 16, 16, 18, 18, 19, 19, 21, 21, 22, 22, 23, 24,
+    24, 25, 26, 26, 27, 27, 28, 29, 29, 30, 30, 30, 31, 32, 32, 33,
+    33, 33, 34, 34, 35, 35, 35, 36, 36, 36, 37, 37, 37, 38, 38, 63,
+)
+MB_SKIP_CTX_INIT = (23, 33) # ctxIdx 11 (mb_skip_flag, both neighbours skipped), cabac_init_idc 0
+
+
+class CabacEncoder:
+    """Arithmetic encoder (9.3.4.2), writing into a BitWriter."""
+
+    def __init__(self, writer):
+        self.w = writer
+        self.low = 0
+        self.range = 510
+        self.outstanding = 0
+        self.first = True
+
+    def _put(self, b):
+        if self.first:
+            self.first = False
+        else:
+            self.w.bits.append(b)
+        while self.outstanding:
+            self.w.bits.append(1 - b)
+            self.outstanding -= 1
+
+    def _renorm(self):
+        while self.range < 256:
+            if self.low < 256:
+                self._put(0)
+            elif self.low >= 512:
+                self.low -= 512
+                self._put(1)
+            else:
+                self.low -= 256
+                self.outstanding += 1
+            self.range <<= 1
+            self.low <<= 1
+
+    def decision(self, ctx, bin_val):
+        """ctx: [pStateIdx, valMPS] (updated)."""
+        state, mps = ctx
+        lps = RANGE_TAB_LPS[state][(self.range >> 6) & 3]
+        self.range -= lps
+        if bin_val != mps:
+            self.low += self.range
+            self.range = lps
+            if state == 0: ctx[1] = 1 - mps
+            ctx[0] = TRANS_IDX_LPS[state]
+        else:
+            ctx[0] = min(state + 1, 62)
+        self._renorm()
+
+    def terminate(self, bin_val):
+        self.range -= 2
+        if bin_val:
+            self.low += self.range
+            # Flush: the last written bit is the rbsp_stop_one_bit
+            self.range = 2
+            self._renorm()
+            self._put((self.low >> 9) & 1)
+            self.w.u(2, ((self.low >> 7) & 3) | 1)
+        else:
+            self._renorm()
+
+
+def cabac_context(m, n, qp):
+    pre = max(1, min(126, ((m * max(0, min(51, qp))) >> 4) + n))
+    return [63 - pre, 0] if pre <= 63 else [pre - 64, 1]
+
+
+class SkipFrameGenerator:
+    def __init__(self):
+        self.sps = {}
+        self.pps = {}
+        self.pps_id = None          # PPS of the last encoder picture
+        self.last_frame_num = None  # frame_num of the last picture sent (after rewrite)
+        self.last_poc_lsb = 0
+        self.frame_num_offset = 0   # Pictures inserted since the last IDR
+        self.poc_offset = 0
+        self.inserted = 0           # Total skip pictures (stats)
+        self._reason = None
+
+    def unsupported_reason(self):
+        """None if skip pictures can be inserted now, else why not."""
+        if self.pps_id is None or self.last_frame_num is None: return "no picture yet"
+        pps = self.pps.get(self.pps_id)
+        sps = self.sps.get(pps["sps_id"]) if pps else None
+        if sps is None: return "no SPS/PPS"
+        if sps["num_ref_frames"] != 1: return f"{sps['num_ref_frames']} reference frames"
+        if not sps["frame_mbs_only"]: return "interlaced"
+        if sps["poc_type"] == 1: return "POC type 1"
+        if sps["separate_colour_plane"]: return "separate colour planes"
+        if pps["slice_groups"] > 1: return "slice groups"
+        return None
+
+    # --- Encoder output: learn parameter sets, track/patch slice headers ---
+    def process(self, data):
+        """
+        Inspects an encoder access unit (Annex B) and shifts frame_num/POC after inserted pictures.
+        :return: data, or a patched copy
+        """
+        out = []
+        changed = False
+        for nal in split_nals(data):
+            if not nal:
+                continue
+            nal_type = nal[0] & 0x1F
+            if nal_type == NAL_SPS:
+                sps = parse_sps(unescape(nal[1:]))
+                self.sps[sps["id"]] = sps
+            elif nal_type == NAL_PPS:
+                pps = parse_pps(unescape(nal[1:]))
+                self.pps[pps["id"]] = pps
+            elif nal_type in (NAL_SLICE, NAL_IDR):
+                patched = self._slice(nal, nal_type)
+                if patched is not nal:
+                    nal, changed = patched, True
+            out.append(nal)
+        if not changed: return data
+        return b"".join(b"\x00\x00\x00\x01" + nal for nal in out)
+
+    def _slice(self, nal, nal_type):
+        rbsp = unescape(nal)
+        r = BitReader(rbsp)
+        r.pos = 8 # NAL header
+        first_mb = r.ue()
+        r.ue() # slice_type
+        pps = self.pps.get(r.ue())
+        if pps is None: return nal
+        sps = self.sps.get(pps["sps_id"])
+        if sps is None: return nal
+        if sps["separate_colour_plane"]: r.u(2)
+        fn_pos = r.pos
+        frame_num = r.u(sps["log2_max_frame_num"])
+        if nal_type == NAL_IDR:
+            r.ue() # idr_pic_id
+            self.frame_num_offset = self.poc_offset = 0
+        poc_pos = r.pos
+        poc_lsb = r.u(sps["log2_max_poc_lsb"]) if sps["poc_type"] == 0 else 0
+
+        patched = nal
+        if self.frame_num_offset:
+            frame_num = (frame_num + self.frame_num_offset) % (1 << sps["log2_max_frame_num"])
+            buf = bytearray(rbsp)
+            write_bits(buf, fn_pos, sps["log2_max_frame_num"], frame_num)
+            if sps["poc_type"] == 0:
+                poc_lsb = (poc_lsb + self.poc_offset) % (1 << sps["log2_max_poc_lsb"])
+                write_bits(buf, poc_pos, sps["log2_max_poc_lsb"], poc_lsb)
+            patched = escape(bytes(buf))
+
+        if first_mb == 0:
+            self.pps_id = pps["id"]
+            if nal[0] & 0x60: self.last_frame_num = frame_num # nal_ref_idc != 0
+            self.last_poc_lsb = poc_lsb
+        return patched
+
+    # --- Skip picture ---
+    def skip_frame(self):
+        """Annex B access unit of an all-P_Skip reference picture, or None if not possible."""
+        reason = self.unsupported_reason()
+        if reason:
+            if reason != self._reason: logger.info(f"Skip frames disabled: {reason}")
+            self._reason = reason
+            return None
+        self._reason = None
+        pps = self.pps[self.pps_id]
+        sps = self.sps[pps["sps_id"]]
+        frame_num = (self.last_frame_num + 1) % (1 << sps["log2_max_frame_num"])
+        poc_lsb = (self.last_poc_lsb + 2) % (1 << sps.get("log2_max_poc_lsb", 4))
+        total_mbs = sps["mb_width"] * sps["mb_height"]
+
+        w = BitWriter()
+        w.u(8, 0x21) # nal_ref_idc 1, coded slice of a non-IDR picture
+        w.ue(0) # first_mb_in_slice
+        w.ue(SLICE_P)
+        w.ue(pps["id"])
+        w.u(sps["log2_max_frame_num"], frame_num)
+        if sps["poc_type"] == 0:
+            w.u(sps["log2_max_poc_lsb"], poc_lsb)
+            if pps["bottom_field_poc"]: w.se(0)
+        if pps["redundant_pic_cnt"]: w.ue(0)
+        w.u(1, 1) # num_ref_idx_active_override_flag
+        w.ue(0) # One reference: the previous picture
+        w.u(1, 0) # ref_pic_list_modification_flag_l0
+        if pps["weighted_pred"]:
+            # Explicit weights signalled as absent: default (copy) prediction
+            chroma = sps["chroma_format_idc"] != 0
+            w.ue(0) # luma_log2_weight_denom
+            if chroma: w.ue(0) # chroma_log2_weight_denom
+            w.u(1, 0) # luma_weight_l0_flag
+            if chroma: w.u(1, 0) # chroma_weight_l0_flag
+        w.u(1, 0) # adaptive_ref_pic_marking_mode_flag (sliding window)
+        if pps["cabac"]: w.ue(0) # cabac_init_idc
+        w.se(0) # slice_qp_delta
+        if pps["deblocking_control"]: w.ue(1) # disable_deblocking_filter_idc: nothing to filter
+
+        if pps["cabac"]:
+            while not w.aligned(): w.u(1, 1) # cabac_alignment_one_bit
+            enc = CabacEncoder(w)
+            ctx = cabac_context(MB_SKIP_CTX_INIT[0], MB_SKIP_CTX_INIT[1], pps["init_qp"])
+            for i in range(total_mbs):
+                enc.decision(ctx, 1) # mb_skip_flag
+                enc.terminate(1 if i == total_mbs - 1 else 0) # end_of_slice_flag
+        else:
+            w.ue(total_mbs) # mb_skip_run: every macroblock
+            w.u(1, 1) # rbsp_stop_one_bit
+
+        self.last_frame_num = frame_num
+        self.last_poc_lsb = poc_lsb
+        self.frame_num_offset += 1
+        self.poc_offset += 2
+        self.inserted += 1
+        return b"\x00\x00\x00\x01" + escape(w.tobytes())
@@ -12,9 +12,17 @@ logger = logging.getLogger("SenderGUI")
 
 # --- THREADS (Updated for Real-time Config) ---
 # --- THREADS (Updated for Real-time Config) ---
-def sender_loop(sock):
+def sender_loop(sock, buffer=None, link=None):
+    """
+    TCP client sender.
+    :param sock: Connected client socket
+    :param buffer: StreamBuffer to drain (default: primary pipeline buffer_tcp)
+    :param link: Pipeline state flagged on disconnect (default: state)
+    """
+    buffer = buffer or buffer_tcp
+    link = link or state
     logger.info(f"Sender Loop: STARTING with socket {sock}")
-    buffer_tcp.running = True
+    buffer.running = True
     import select # Import here to avoid circular or top-level issues if any
     
     # Counter for debug
@@ -38,7 +46,7 @@ def sender_loop(sock):
                  break
             
             # 2. Get Data
-            packet = buffer_tcp.get(timeout=0.1)
+            packet = buffer.get(timeout=0.1)
             
             # If timeout, loop back to check connection status again
             if packet is None: continue 
@@ -60,15 +68,23 @@ def sender_loop(sock):
         logger.error(traceback.format_exc())
     finally:
         logger.info("Sender Loop Exiting. Cleaning up connection.")
-        state.client_connected = False
+        link.client_connected = False
         try: sock.shutdown(socket.SHUT_RDWR)
         except: pass
         try: sock.close()
         except: pass
 
-def rtsp_publisher_loop():
-    buffer_rtsp.running = True
-    url = "rtsp://127.0.0.1:8554/stream"
+def rtsp_publisher_loop(path="stream", buffer=None, link=None):
+    """
+    Publishes encoded packets to MediaMTX.
+    :param path: Stream path (rtsp://127.0.0.1:8554/<path>)
+    :param buffer: StreamBuffer to drain (default: primary pipeline buffer_rtsp)
+    :param link: Pipeline state holding the encoder (default: state)
+    """
+    buffer = buffer or buffer_rtsp
+    link = link or state
+    buffer.running = True
+    url = f"rtsp://127.0.0.1:8554/{path}"
     
     logger.info("RTSP Publisher Loop: Enter")
     
@@ -98,10 +114,12 @@ def rtsp_publisher_loop():
                 continue 
             
              # 2. SETUP STREAM
-             stream = container.add_stream('h264', rate=state.fps)
+             # Size/rate of the encoder feeding this sink (main stream or simulcast rendition)
+             encoder = link.encoder
+             stream = container.add_stream('h264', rate=encoder.fps if encoder else state.fps)
              stream.time_base = Fraction(1, 90000) 
-             stream.width = state.target_w
-             stream.height = state.target_h
+             stream.width = encoder.width if encoder else state.target_w
+             stream.height = encoder.height if encoder else state.target_h
              stream.pix_fmt = 'yuv420p'
 
              # 3. EXTRADATA CHECK (Non-blocking)
@@ -112,9 +130,9 @@ def rtsp_publisher_loop():
              # Small delay to allow encoder to init if it was just created
              time.sleep(0.5) 
              
-             if state.encoder and state.encoder.ctx and state.encoder.ctx.extradata:
-                 logger.info(f"RTSP: Extradata found ({len(state.encoder.ctx.extradata)} bytes). Applying.")
-                 stream.codec_context.extradata = state.encoder.ctx.extradata
+             if link.encoder and link.encoder.ctx and link.encoder.ctx.extradata:
+                 logger.info(f"RTSP: Extradata found ({len(link.encoder.ctx.extradata)} bytes). Applying.")
+                 stream.codec_context.extradata = link.encoder.ctx.extradata
              else:
                  logger.info("RTSP: No Global Extradata found. Relying on Inline Headers (Annex B).")
 
@@ -123,7 +141,7 @@ def rtsp_publisher_loop():
              logger.info("RTSP: Connected & Ready! Streaming loop start...")
              
              # 4. STREAM LOOP
-             buffer_rtsp.clear()
+             buffer.clear()
              
              # Timestamp Management
              pts_offset = 0
@@ -131,31 +149,35 @@ def rtsp_publisher_loop():
              last_mux_dts = -1 # Track output to prevent rollback
              
              # [FIX] Force immediate Keyframe (IDR) to prevent initial freeze
-             if state.encoder: state.encoder.force_next_keyframe()
+             if link.encoder: link.encoder.force_next_keyframe()
 
              error_count = 0
              
              while state.streaming and state.rtsp_mode:
-                packet = buffer_rtsp.get()
+                packet = buffer.get()
                 if packet is None: continue
                 
                 try:
+                    # [FIX] Encoder time base (1/fps) read BEFORE assigning the stream: an FPS change
+                    # (new encoder context, rescaled PTS) keeps the same timeline
+                    time_base = packet.time_base or Fraction(1, state.fps)
+                    
                     # Assign stream first so PyAV knows the context
                     packet.stream = stream
                     
                     if packet.pts is None: packet.pts = 0
+                    raw_pts = int(packet.pts * time_base * 90000) # 90 kHz
                     
                     # [FIX 1] Monotonic Input Detection (Encoder Reset)
-                    if packet.pts < last_raw_pts:
-                        pts_offset += (last_raw_pts + 100) # Small gap to be safe
+                    if raw_pts < last_raw_pts:
+                        pts_offset += last_raw_pts + int(100 * 90000 / state.fps) # Small gap to be safe
                         logger.info(f"RTSP: Encoder Reset Detected. Offset={pts_offset}")
-                    last_raw_pts = packet.pts
+                    last_raw_pts = raw_pts
                     
                     # [FIX 2] Strict Output Monotonicity (Avoid Errno 22)
                     # We calculate target PTS, but we MUST ensure it is > last sent DTS
                     
-                    scale_factor = 90000 / state.fps
-                    target_pts = int((packet.pts + pts_offset) * scale_factor)
+                    target_pts = raw_pts + pts_offset
                     
                     if target_pts <= last_mux_dts:
                         target_pts = last_mux_dts + 1
@@ -0,0 +1,258 @@
+import os
+import math
+import time
+import threading
+import logging
+from modules.change_detector import TileChangeDetector, ChangeFilter
+
+logger = logging.getLogger("SenderGUI")
+
+# --- PIPELINED ENGINE ---
+# Capture stage (own thread): grab -> cursor -> dedup on the raw buffer -> LatestFrameSlot
+# Encode stage (stream thread): always takes the FRESHEST frame from the slot.
+# The slot holds ONE frame: a frame not consumed in time is overwritten (never queued),
+# so capture latency no longer adds to encode latency and stale frames are never encoded.
+# Event-driven sources (poll_damage) are grabbed only after the OS reported a change.
+# Dirty rects then go through the noise policy (ChangeFilter: ignore masks, batched minor changes)
+# and the motion-adaptive content rate (MotionRateController).
+
+
+class StageStats:
+    """Busy-time accounting for one pipeline stage (utilization = busy / wall time)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.busy = 0.0
+        self.count = 0
+        self.window_start = time.perf_counter()
+
+    def add(self, seconds):
+        with self.lock:
+            self.busy += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """Returns (utilization 0-100%, avg ms per item, items) and starts a new window."""
+        with self.lock:
+            now = time.perf_counter()
+            wall = max(1e-6, now - self.window_start)
+            util = min(100.0, self.busy / wall * 100.0)
+            avg_ms = (self.busy / self.count * 1000.0) if self.count else 0.0
+            count = self.count
+            self.busy = 0.0
+            self.count = 0
+            self.window_start = now
+        return util, avg_ms, count
+
+
+class CapturedFrame:
+    __slots__ = ("raw", "pixel_format", "dirty_rects", "cursor", "cursor_shape", "timestamp")
+
+    def __init__(self, raw, pixel_format, dirty_rects, cursor, timestamp, cursor_shape=None):
+        self.raw = raw                  # Native buffer (HxWxC)
+        self.pixel_format = pixel_format
+        self.dirty_rects = dirty_rects  # Capture coordinates, [] = content unchanged
+        self.cursor = cursor            # (x, y) relative to the captured area (region/window may move)
+        self.cursor_shape = cursor_shape # Cursor handle (sprite cache key), None = arrow
+        self.timestamp = timestamp      # perf_counter() at grab time
+
+
+class LatestFrameSlot:
+    """Single-slot 'freshest frame' mailbox. put() overwrites, get() takes."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.overwritten = 0 # Stale frames replaced before being consumed
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                # The consumer never saw the old frame: its dirty area is still dirty
+                self.overwritten += 1
+                if item.dirty_rects is not None and self.item.dirty_rects:
+                    item.dirty_rects = self.item.dirty_rects + item.dirty_rects
+            self.item = item
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Returns the freshest frame (and empties the slot), or None after timeout."""
+        with self.cond:
+            if self.item is None:
+                self.cond.wait(timeout)
+            item, self.item = self.item, None
+            return item
+
+    def clear(self):
+        with self.cond:
+            self.item = None
+
+
+class EncodeWorkerPool:
+    """
+    Bounded pool of encode slots shared by the pipelines of one process (multi-monitor).
+    Each pipeline encodes in its own thread inside 'with pool:'. PyAV/FFmpeg and OpenCV release
+    the GIL, so encoders run in parallel, at most one per spare core (the rest wait their turn
+    instead of thrashing the capture threads).
+    """
+
+    def __init__(self, pipelines, max_workers=None):
+        """
+        :param pipelines: Number of pipelines sharing the pool
+        :param max_workers: Concurrent encodes (default: min(pipelines, cores - 1), at least 1)
+        """
+        if max_workers is None:
+            max_workers = min(pipelines, max(1, (os.cpu_count() or 2) - 1))
+        self.max_workers = max(1, max_workers)
+        self.sem = threading.BoundedSemaphore(self.max_workers)
+
+    def __enter__(self):
+        self.sem.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.sem.release()
+        return False
+
+
+class MotionRateController:
+    """
+    Motion-adaptive content rate: changed area per tick -> content FPS between min_fps and max_fps.
+    Instant ramp-up on motion (a full-screen video or scroll gets max_fps from its first frame),
+    slow decay (decay_s) when the screen calms down (a terminal line stays at a low rate).
+    The capture stage still polls at max_fps: an isolated change after a quiet period is posted
+    immediately, only SUSTAINED small changes are paced.
+    """
+
+    def __init__(self, max_fps, min_fps=10, full_motion=0.25, decay_s=0.5):
+        """
+        :param max_fps: Configured FPS (high motion)
+        :param min_fps: Content rate of a nearly static screen
+        :param full_motion: Changed area ratio (0-1) that gets max_fps
+        :param decay_s: Time constant of the ramp-down
+        """
+        self.max_fps = max(1, max_fps)
+        self.min_fps = max(1, min(min_fps, self.max_fps))
+        self.full_motion = max(1e-3, full_motion)
+        self.decay_s = max(1e-3, decay_s)
+        self.level = 1.0 # Smoothed changed area ratio (start at full rate)
+        self.fps = self.max_fps
+        self.last_t = None
+
+    def update(self, changed_ratio, now):
+        """Feeds the changed area ratio of one tick, returns the content FPS."""
+        if self.last_t is not None:
+            self.level *= math.exp(-(now - self.last_t) / self.decay_s)
+        self.last_t = now
+        self.level = max(self.level, changed_ratio)
+        motion = min(1.0, self.level / self.full_motion)
+        self.fps = int(round(self.min_fps + (self.max_fps - self.min_fps) * motion))
+        return self.fps
+
+
+class CaptureWorker:
+    def __init__(self, source, slot, fps, cfr=None):
+        """
+        Capture stage thread.
+        :param source: Opened CaptureSource (grab() buffers must stay valid for 2 more grabs)
+        :param slot: LatestFrameSlot to fill
+        :param fps: Capture rate (the encode stage is paced by this stage)
+        :param cfr: Callable -> True to post unchanged frames too (RTSP constant frame rate)
+        """
+        self.source = source
+        self.slot = slot
+        self.fps = max(1, fps)
+        self.cfr = cfr or (lambda: False)
+        self.detector = TileChangeDetector()
+        self.change_filter = ChangeFilter(self.detector.tile_size) # Noise policy (off until configured)
+        self.rate_controller = None # MotionRateController (None = content posted at every change)
+        self.paced_ticks = 0 # Changes held back by the adaptive rate
+        self.stats = StageStats("capture")
+        self.idle_ticks = 0 # Ticks without grab (event-driven source reported no change)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="CaptureStage")
+        self.thread.start()
+
+    def set_fps(self, fps):
+        """Live capture rate change (the encode stage is paced by this stage)."""
+        self.fps = max(1, fps)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.slot.clear()
+
+    def _run(self):
+        mode = "event-driven" if self.source.poll_damage() is not None else "polling"
+        logger.info(f"Capture Stage Started ({self.source.name} @ {self.fps} FPS, {mode})")
+        last_cursor = None
+        last_shape = None
+        last_raw = None
+        held = [] # Dirty rects waiting for the next adaptive rate slot
+        last_content = 0.0
+        next_tick = time.perf_counter()
+
+        while self.running:
+            t0 = time.perf_counter()
+            period = 1.0 / self.fps # Live: set_fps()
+            try:
+                # [OPTIM] Event-driven sources: no grab (and no hashing) while the OS reports no change
+                damage = self.source.poll_damage() if last_raw is not None else None
+                if damage == []:
+                    raw, dirty = last_raw, []
+                    self.idle_ticks += 1
+                else:
+                    raw = self.source.grab()
+                    if raw is None:
+                        if damage: last_raw = None # Grab failed: next tick grabs + compares (damage not lost)
+                        raw, dirty = last_raw, [] # No new frame (DXGI not updated)
+                    elif damage:
+                        dirty = damage # The OS damage IS the dirty set
+                    else:
+                        # Damage learned while grabbing (DXGI dirty rects), not for the first frame
+                        dirty = self.source.grab_damage() if last_raw is not None else None
+                        if dirty is None:
+                            # [OPTIM] Dedup on the raw buffer: static frames are never posted
+                            dirty = self.detector.detect(raw)
+                if raw is not None:
+                    last_raw = raw
+                    dirty = self.change_filter.apply(dirty, raw.shape[1], raw.shape[0], t0)
+                    rate = self.rate_controller
+                    if rate is not None:
+                        # [OPTIM] Motion-adaptive content rate (cursor moves and CFR repeats are not paced)
+                        area = sum(w * h for _, _, w, h in dirty) / float(raw.shape[0] * raw.shape[1]) if dirty else 0.0
+                        fps = rate.update(area, t0)
+                        if dirty or held:
+                            if t0 - last_content + period / 2 < 1.0 / fps:
+                                if dirty: self.paced_ticks += 1
+                                held, dirty = held + dirty, []
+                            else:
+                                held, dirty = [], dirty + held
+                        if dirty: last_content = t0
+                    cx, cy, shape = self.source.cursor_info()
+                    cursor = (cx - self.source.left, cy - self.source.top) # Origin of THIS grab
+                    if dirty or cursor != last_cursor or shape != last_shape or self.cfr():
+                        self.slot.put(CapturedFrame(raw, self.source.pixel_format, dirty, cursor, t0, shape))
+                        last_cursor = cursor
+                        last_shape = shape
+            except Exception as e:
+                logger.error(f"Capture Stage Error: {e}")
+                time.sleep(0.1)
+            self.stats.add(time.perf_counter() - t0)
+
+            # FPS Limiter (Capture stage only: encode waits on the slot)
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter() # Late: don't try to catch up with a burst
+
+        logger.info("Capture Stage Stopped")
@@ -0,0 +1,184 @@
+import time
+import logging
+import threading
+from fractions import Fraction
+import cv2
+import numpy as np
+
+logger = logging.getLogger("SenderGUI")
+
+# --- RESIZE ENGINE ---
+# Scale step of the conversion stage (capture size -> encoder size), selectable:
+#   bilinear : cv2 INTER_LINEAR (historical default). Fast, but aliases on downscaled text:
+#              the aliasing is high-frequency noise the H.264 encoder pays for in bits.
+#   area     : cv2 INTER_AREA (box average of the source footprint, no aliasing).
+#   integer  : same output as 'area', fast paths for integer ratios (2x = bilinear on the exact
+#              pixel pairs, kx = box blur + one sample per block). Other ratios use 'area'.
+#   remap    : fixed-ratio sample maps precomputed once (fixed-point), cv2.remap per frame.
+#   auto     : calibrated on the first frame (see select_resize_method): the method with the
+#              fewest encoded bytes above the quality floor, within the frame-time budget.
+#              Calibrated once per (src size, dst size, format, budget) for the process
+#              (cached_resize_method): new encoders and simulcast renditions reuse it.
+
+RESIZE_METHODS = ("auto", "bilinear", "area", "integer", "remap")
+
+QUALITY_FLOOR_DB = 35.0 # Min PSNR vs the alias-free (area) reference to be selected by 'auto'
+PROBE_QP = "26"         # Fixed-QP intra encode used to compare encoded sizes
+BYTES_TOLERANCE = 0.01  # Sizes within 1% of the smallest are a tie: the fastest method wins
+
+_auto_cache = {} # (src_size, dst_size, pix_fmt, budget_ms) -> method
+_auto_lock = threading.Lock()
+
+
+def integer_ratio(src_size, dst_size):
+    """(kx, ky) if src is an exact integer multiple of dst on both axes (downscale), else None."""
+    (sw, sh), (dw, dh) = src_size, dst_size
+    if dw <= 0 or dh <= 0 or sw % dw or sh % dh: return None
+    kx, ky = sw // dw, sh // dh
+    return (kx, ky) if kx >= 1 and ky >= 1 else None
+
+
+class Resizer:
+    def __init__(self, method, src_size, dst_size):
+        """
+        Resize function for a fixed (source size, destination size) pair.
+        :param method: 'bilinear', 'area', 'integer' or 'remap' (see RESIZE_METHODS, not 'auto')
+        :param src_size: (width, height) of the input
+        :param dst_size: (width, height) of the output
+        """
+        if method not in RESIZE_METHODS or method == "auto":
+            raise ValueError(f"Unknown resize method: {method}")
+        self.method = method
+        self.src_size = tuple(src_size)
+        self.dst_size = tuple(dst_size)
+        self.interpolation = cv2.INTER_LINEAR
+        self.ratio = None
+        self.maps = None
+        self.box = None # Blurred intermediate (integer path, k > 2)
+
+        upscale = dst_size[0] >= src_size[0] and dst_size[1] >= src_size[1]
+        if method == "area" and not upscale:
+            self.interpolation = cv2.INTER_AREA
+        elif method == "integer":
+            self.ratio = integer_ratio(src_size, dst_size)
+            if self.ratio is None:
+                if not upscale: self.interpolation = cv2.INTER_AREA
+            elif self.ratio == (2, 2) or self.ratio == (1, 1):
+                self.ratio = None # Bilinear at exactly 2x samples between 2x2 pixels: the box average
+        elif method == "remap":
+            self.maps = self._build_maps()
+
+    def _build_maps(self):
+        # Sample at the center of each destination pixel footprint (same geometry as cv2.resize)
+        (sw, sh), (dw, dh) = self.src_size, self.dst_size
+        map_x = ((np.arange(dw, dtype=np.float32) + 0.5) * (sw / dw) - 0.5).clip(0, sw - 1)
+        map_y = ((np.arange(dh, dtype=np.float32) + 0.5) * (sh / dh) - 0.5).clip(0, sh - 1)
+        mx, my = np.meshgrid(map_x, map_y)
+        return cv2.convertMaps(mx, my, cv2.CV_16SC2) # Fixed point: no float math per frame
+
+    def __call__(self, src, dst):
+        """Resizes src (HxWxC) into dst (preallocated, destination size)."""
+        if self.maps is not None:
+            cv2.remap(src, self.maps[0], self.maps[1], cv2.INTER_LINEAR, dst=dst)
+        elif self.ratio is not None:
+            # Box average of each kx x ky block: mean over [x, x+k) then one sample per block
+            kx, ky = self.ratio
+            if self.box is None or self.box.shape != src.shape:
+                self.box = np.empty_like(src)
+            cv2.blur(src, (kx, ky), dst=self.box, anchor=(0, 0), borderType=cv2.BORDER_REPLICATE)
+            cv2.resize(self.box, self.dst_size, dst=dst, interpolation=cv2.INTER_NEAREST)
+        else:
+            cv2.resize(src, self.dst_size, dst=dst, interpolation=self.interpolation)
+        return dst
+
+
+def _intra_bytes(img, pix_fmt):
+    """Encoded size of img as one fixed-QP H.264 intra frame (bits the content costs)."""
+    import av
+    from modules.frame_convert import I420_CODES
+    h, w = img.shape[:2]
+    ctx = av.codec.CodecContext.create("libx264", "w")
+    ctx.width, ctx.height = w, h
+    ctx.pix_fmt = "yuv420p"
+    ctx.time_base = Fraction(1, 30)
+    ctx.options = {"preset": "ultrafast", "tune": "zerolatency", "qp": PROBE_QP}
+    ctx.open()
+    frame = av.VideoFrame.from_ndarray(cv2.cvtColor(img, I420_CODES[pix_fmt]), format="yuv420p")
+    packets = list(ctx.encode(frame)) + list(ctx.encode(None))
+    return sum(p.size for p in packets)
+
+
+def evaluate_resize(src, pix_fmt, dst_size, methods=None, runs=3, budget_ms=None):
+    """
+    Measures every method on one frame.
+    :param src: HxWxC native frame
+    :param pix_fmt: 'bgra', 'rgb24' or 'bgr24'
+    :param dst_size: (width, height)
+    :param methods: Methods to measure (default: all but 'auto')
+    :param runs: Timing runs (median)
+    :param budget_ms: Methods slower than 2x this budget at warm-up are timed once (calibration cost)
+    :return: list of dict(method, ms, bytes, psnr) - psnr vs the 'area' output (361 dB = identical)
+    """
+    methods = methods or [m for m in RESIZE_METHODS if m != "auto"]
+    src_size = (src.shape[1], src.shape[0])
+    shape = (dst_size[1], dst_size[0], src.shape[2])
+    reference = Resizer("area", src_size, dst_size)(src, np.empty(shape, np.uint8))
+    results = []
+    for method in methods:
+        resizer = Resizer(method, src_size, dst_size)
+        out = np.empty(shape, np.uint8)
+        t0 = time.perf_counter()
+        resizer(src, out) # Warm-up (buffers, maps)
+        warm = time.perf_counter() - t0
+        if budget_ms is not None and warm * 1000 > 2 * budget_ms:
+            times = [warm] # Clearly over budget: not worth more runs
+        else:
+            times = []
+            for _ in range(max(1, runs)):
+                t0 = time.perf_counter()
+                resizer(src, out)
+                times.append(time.perf_counter() - t0)
+        try:
+            size = _intra_bytes(out, pix_fmt)
+        except Exception as e:
+            logger.warning(f"Resize probe encode failed ({e})")
+            size = 0
+        results.append({"method": method, "ms": sorted(times)[len(times) // 2] * 1000,
+                        "bytes": size, "psnr": cv2.PSNR(out, reference)})
+    return results
+
+
+def select_resize_method(src, pix_fmt, dst_size, budget_ms):
+    """
+    'auto': fewest encoded bytes among the methods within budget_ms and above QUALITY_FLOOR_DB
+    (ties within BYTES_TOLERANCE: the fastest). If none qualifies, the fastest method.
+    Returns (method, evaluate_resize results).
+    """
+    if (src.shape[1], src.shape[0]) == tuple(dst_size):
+        return "bilinear", [] # No resize
+    results = evaluate_resize(src, pix_fmt, dst_size, budget_ms=budget_ms)
+    ok = [r for r in results if r["ms"] <= budget_ms and r["psnr"] >= QUALITY_FLOOR_DB]
+    if not ok:
+        return min(results, key=lambda r: r["ms"])["method"], results
+    smallest = min(r["bytes"] for r in ok)
+    ties = [r for r in ok if r["bytes"] <= smallest * (1 + BYTES_TOLERANCE)]
+    return min(ties, key=lambda r: r["ms"])["method"], results
+
+
+def cached_resize_method(src, pix_fmt, dst_size, budget_ms):
+    """
+    [OPTIM] select_resize_method() calibrated once per (src size, dst size, format, budget):
+    the calibration takes several frame times, it no longer runs for every new encoder.
+    Returns (method, evaluate_resize results), results = [] when it came from the cache.
+    :param src: Native frame, may be a live capture buffer (copied before measuring)
+    """
+    key = ((src.shape[1], src.shape[0]), tuple(dst_size), pix_fmt, round(budget_ms, 1))
+    with _auto_lock: # Encoders of several pipelines may calibrate at once: one measure at a time
+        method = _auto_cache.get(key)
+        if method is not None: return method, []
+        # [FIX] A capture buffer is rewritten 2 grabs later, the calibration lasts hundreds of ms:
+        # every method must be measured on the same frame (one copy per calibration)
+        frame = np.array(src)
+        method, results = select_resize_method(frame, pix_fmt, dst_size, budget_ms)
+        _auto_cache[key] = method
+    return method, results
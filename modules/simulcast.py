@@ -0,0 +1,199 @@
+import logging
+import numpy as np
+from modules.buffer_pool import BufferPool
+from modules.stream_encoder import VideoEncoder
+
+logger = logging.getLogger("SenderGUI")
+
+# --- SIMULCAST (one capture, several renditions) ---
+# The main rendition is the VideoEncoder of run_pipeline (state.resolution / fps / bitrate).
+# Extra renditions (state.renditions) get their own resolution, bitrate and FPS, e.g. the wired Pi
+# on TCP keeps 1080p / 8 Mbps while WebRTC phones (RTSP -> MediaMTX) get 480p / 1.5 Mbps.
+# Shared scaling: a rendition takes the main's SCALED picture (cursor already drawn) as input:
+#   same size as the main : its I420 is copied (no resize, no color conversion)
+#   smaller               : resized from the scaled picture, not from the full capture
+# Each rendition encodes in its own encoder thread (VideoEncoder async mode): parallel encodes,
+# bounded by the EncodeWorkerPool. Sinks subscribe by name (state.tcp_rendition / rtsp_rendition),
+# only renditions with a subscriber are created and fed.
+
+MAIN_RENDITION = "main"
+
+RENDITION_SIZES = {
+    "360p": (640, 360), "480p": (854, 480), "540p": (960, 540), "720p": (1280, 720),
+    "900p": (1600, 900), "1080p": (1920, 1080), "1440p": (2560, 1440), "4K": (3840, 2160),
+}
+
+
+def rendition_params(spec, main):
+    """
+    (width, height, fps, bitrate) of a rendition spec, relative to the main encoder.
+    The size keeps the main aspect ratio and never exceeds it (input = main's scaled picture),
+    the FPS never exceeds the main FPS (frames are picked from the main ticks).
+    :param spec: {"name": ..., "resolution": "480p", "bitrate_mbps": 1.5, "fps": 30} (missing = main value)
+    :param main: Main VideoEncoder
+    """
+    w, h = RENDITION_SIZES.get(spec.get("resolution"), (main.width, main.height))
+    fit = min(w / main.width, h / main.height, 1.0)
+    width, height = int(main.width * fit) & ~1, int(main.height * fit) & ~1
+    fps = max(1, min(int(spec.get("fps", main.fps)), main.fps))
+    bitrate = int(float(spec.get("bitrate_mbps", main.bitrate / 1e6)) * 1e6)
+    return max(2, width), max(2, height), fps, bitrate
+
+
+class Rendition:
+    def __init__(self, name, width, height, fps, bitrate, sink, codec_choice="auto", preset_choice="fast", initial_pts=0, encode_pool=None):
+        """
+        :param name: Rendition name (subscription key)
+        :param width, height: Encoder size
+        :param fps: Rendition frame rate (<= main FPS)
+        :param bitrate: bits/s
+        :param sink: Callable(packets) (called from the rendition's encoder thread)
+        :param encode_pool: Shared EncodeWorkerPool
+        """
+        self.name = name
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.params = None # (codec, preset, width, height, fps, bitrate) it was built with
+        # Own buffer pool: at the main size, the conversion buffers must not be the main's ones
+        self.pool = BufferPool()
+        self.encoder = VideoEncoder(width, height, fps, bitrate, codec_choice=codec_choice, preset_choice=preset_choice,
+                                    initial_pts=initial_pts, buffer_pool=self.pool, resize_method="auto",
+                                    async_depth=1, on_packets=sink, encode_pool=encode_pool)
+        self.next_t = None    # Next encode slot (perf_counter)
+        self.pending = True   # Picture changed since the last encoded frame
+        self.active = False   # Has a subscriber (fed by Simulcast.feed)
+        self.held = None      # (copy, pix_fmt) of a capture buffer this rendition has not encoded yet
+        self.frames = 0       # Stats
+
+    def feed(self, main, raw, pix_fmt, changed, cfr, now, skip_frames=True):
+        """
+        Called after the main encoder handled a frame (its converter holds the picture).
+        :param main: Main VideoEncoder
+        :param raw: Capture buffer given to the main encoder (used when the main did not scale or draw),
+                    None on idle ticks (capture buffers are only valid for the tick: see CaptureSource.grab)
+        :param pix_fmt: Its native format
+        :param changed: Picture (content or cursor) changed since the previous feed
+        :param cfr: Constant frame rate consumer (RTSP): unchanged frames are sent too, at this rendition's rate
+        :param now: perf_counter()
+        """
+        if changed:
+            self.pending = True
+            self.held = None
+        if not self.pending and not cfr: return
+        converter = main.converter
+        if converter is None: return
+        # Pictures owned by the main converter stay valid until its next conversion (stream thread)
+        if (self.encoder.width, self.encoder.height) == (main.width, main.height) and converter.i420 is not None:
+            image, fmt = converter.i420, "i420" # Same size: the main conversion is reused as is
+        elif converter.composed is not None:
+            image, fmt = converter.composed, converter.composed_fmt
+        elif raw is not None:
+            image, fmt = raw, pix_fmt # The main converted the capture buffer itself (same size, no cursor)
+        elif self.held is not None:
+            image, fmt = self.held
+        else:
+            return
+        if self.next_t is not None and now < self.next_t - self.period / 4:
+            # Not this rendition's tick. A capture buffer is reused by the capture thread: keep a copy
+            if self.pending and image is raw:
+                copy = self.pool.get(raw.shape, raw.dtype, tag="simulcast.held")
+                np.copyto(copy, raw)
+                self.held = (copy, pix_fmt)
+            return
+        self.encoder.encode(image, fmt, content_changed=self.pending, repeat=skip_frames and not self.pending)
+        self.pending = False
+        self.held = None
+        self.frames += 1
+        if self.next_t is None or now - self.next_t > self.period: self.next_t = now + self.period
+        else: self.next_t += self.period
+
+    def close(self):
+        self.encoder.close()
+
+
+class Simulcast:
+    """Extra renditions of one pipeline (the main rendition stays in run_pipeline)."""
+
+    def __init__(self, sink, encode_pool=None):
+        """
+        :param sink: Callable(packets, rendition name)
+        :param encode_pool: Shared EncodeWorkerPool
+        """
+        self.sink = sink
+        self.encode_pool = encode_pool
+        self.renditions = {} # name -> Rendition
+
+    def configure(self, specs, subscriptions, main, codec_choice, preset_choice):
+        """
+        (Re)creates the subscribed renditions. Unchanged ones keep running, a bitrate-only change is applied live.
+        :param specs: state.renditions (list of dicts, see rendition_params)
+        :param subscriptions: Rendition names wanted by the sinks (unknown names -> main)
+        :param main: Main VideoEncoder
+        :return: Resolved subscriptions (same order)
+        """
+        by_name = {s.get("name"): s for s in specs if s.get("name") and s.get("name") != MAIN_RENDITION}
+        resolved = []
+        for name in subscriptions:
+            if name != MAIN_RENDITION and name not in by_name:
+                logger.warning(f"[SIMULCAST] Unknown rendition '{name}', main stream used instead")
+                name = MAIN_RENDITION
+            resolved.append(name)
+
+        for name in list(self.renditions):
+            if name not in resolved:
+                self.renditions.pop(name).close()
+        for name in resolved:
+            if name == MAIN_RENDITION: continue
+            width, height, fps, bitrate = rendition_params(by_name[name], main)
+            params = (codec_choice, preset_choice, width, height, fps, bitrate)
+            old = self.renditions.get(name)
+            if old is not None:
+                if old.params == params: continue
+                if old.params[:5] == params[:5] and old.encoder.set_bitrate(bitrate):
+                    old.params = params
+                    logger.info(f"[SIMULCAST] {name}: {bitrate / 1e6:.1f} Mbps (live)")
+                    continue
+                old.encoder.drain()
+            initial_pts = int(round(old.encoder.frame_count * fps / old.fps)) if old else 0
+            rendition = Rendition(name, width, height, fps, bitrate, lambda packets, n=name: self.sink(packets, n),
+                                  codec_choice, preset_choice, initial_pts, self.encode_pool)
+            rendition.params = params
+            if old is not None: old.close()
+            self.renditions[name] = rendition
+            logger.info(f"[SIMULCAST] Rendition '{name}': {width}x{height} @ {fps} FPS | {bitrate / 1e6:.1f} Mbps | "
+                        f"Codec: {rendition.encoder.codec_name}")
+        return resolved
+
+    def encoder(self, name):
+        """VideoEncoder of a rendition (None for the main one)."""
+        rendition = self.renditions.get(name)
+        return rendition.encoder if rendition else None
+
+    def set_active(self, names):
+        """Renditions with a live subscriber. A rendition (re)activated starts with an IDR."""
+        for name, rendition in self.renditions.items():
+            active = name in names
+            if active and not rendition.active:
+                rendition.encoder.force_next_keyframe()
+                rendition.pending = True
+            rendition.active = active
+
+    def feed(self, main, raw, pix_fmt, changed, cfr_names, now, skip_frames=True):
+        for name, rendition in self.renditions.items():
+            if rendition.active:
+                rendition.feed(main, raw, pix_fmt, changed, name in cfr_names, now, skip_frames)
+
+    def drain(self):
+        for rendition in self.renditions.values(): rendition.encoder.drain()
+
+    def close(self):
+        for rendition in self.renditions.values(): rendition.close()
+        self.renditions = {}
+
+    def summary(self):
+        """Log field: name WxH@fps frames (and resets the counters)."""
+        parts = []
+        for name, r in self.renditions.items():
+            parts.append(f"{name} {r.encoder.width}x{r.encoder.height}@{r.fps} {r.frames if r.active else 'idle'}")
+            r.frames = 0
+        return ", ".join(parts) or "off"
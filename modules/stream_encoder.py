@@ -2,14 +2,111 @@ import av
 import numpy as np
 import logging
 import time
+import threading
+import collections
 from fractions import Fraction
+from modules.frame_convert import FrameConverter
+from modules.h264_skip import SkipFrameGenerator
+from modules.codec_probe import codec_probe
+from modules.pipeline import StageStats
 
 logger = logging.getLogger("VideoEncoder")
 
+# Native capture layouts accepted by encode() (PyAV/FFmpeg names)
+# bgra: MSS/DXCam | rgb24: replay files | bgr24: OpenCV | i420: another encoder's conversion at the same size (simulcast)
+INPUT_FORMATS = ("bgra", "rgb24", "bgr24", "i420")
+
+FRAME_POOL_SIZE = 3 # Rotating yuv420p VideoFrames owned by the encoder
+RESIZE_BUDGET = 0.25 # Share of the frame interval the scale step may use ('auto' resize method)
+# Codecs whose FFmpeg wrapper re-reads bit_rate between frames (x264_encoder_reconfig / NVENC dynamic bitrate)
+LIVE_BITRATE_CODECS = ("libx264", "h264_nvenc")
+MAX_ASYNC_DEPTH = 2 # Frames waiting for the encoder thread (async mode): more = latency, not throughput
+
+
+class EncodeWorker:
+    """
+    [OPTIM] Encoder thread of a VideoEncoder in async mode.
+    The caller converts frame N+1 (resize + I420, OpenCV) while this thread encodes frame N
+    (libx264/NVENC, GIL released): a slow preset no longer adds its time to the conversion.
+    Bounded queue: under pressure the OLDEST waiting frame is dropped (each one is a full picture).
+    Packets are handed to the sink from this thread, in encode order.
+    """
+
+    def __init__(self, encoder, sink, depth=1, pool=None):
+        """
+        :param encoder: Owning VideoEncoder
+        :param sink: Callable(packets) called for each encoded frame (also with [] when no packet)
+        :param depth: Queue size (1 to MAX_ASYNC_DEPTH)
+        :param pool: Optional EncodeWorkerPool (slot held during each encode)
+        """
+        self.encoder = encoder
+        self.sink = sink
+        self.pool = pool
+        self.depth = max(1, min(MAX_ASYNC_DEPTH, depth))
+        self.cond = threading.Condition()
+        self.queue = collections.deque() # (frame, repeat, submit time)
+        self.busy = False
+        self.running = True
+        self.dropped = 0 # Stats: frames replaced before being encoded
+        self.wait_stats = StageStats("encode_wait") # Time in the queue
+        self.encode_stats = StageStats("encode")    # Time in the codec
+        self.thread = threading.Thread(target=self._run, daemon=True, name="EncodeWorker")
+        self.thread.start()
+
+    def submit(self, frame, repeat=False):
+        converter = self.encoder.converter
+        with self.cond:
+            converter.in_use.add(id(frame))
+            self.queue.append((frame, repeat, time.perf_counter()))
+            while len(self.queue) > self.depth:
+                old, old_repeat, _ = self.queue.popleft()
+                converter.in_use.discard(id(old))
+                self.dropped += 1
+                if not old_repeat and self.queue[0][1]:
+                    # The next frame repeated the dropped picture: it must be really encoded
+                    self.queue[0] = (self.queue[0][0], False, self.queue[0][2])
+            self.cond.notify_all()
+
+    def drain(self, timeout=2.0):
+        """Waits until every queued frame is encoded and delivered."""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.queue and not self.busy, timeout)
+
+    def stop(self):
+        """Encodes what is queued, then ends the thread."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout=2.0)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue or not self.running)
+                if not self.queue: break
+                frame, repeat, t_submit = self.queue.popleft()
+                self.busy = True
+            t0 = time.perf_counter()
+            self.wait_stats.add(t0 - t_submit)
+            if self.pool is not None:
+                with self.pool: packets = self.encoder._encode_frame(frame, repeat)
+            else:
+                packets = self.encoder._encode_frame(frame, repeat)
+            self.encoder.converter.in_use.discard(id(frame))
+            self.encode_stats.add(time.perf_counter() - t0)
+            try:
+                self.sink(packets)
+            except Exception as e:
+                logger.error(f"Encode sink error: {e}")
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()
+
 class VideoEncoder:
 
     
-    def __init__(self, width=1280, height=720, fps=60, bitrate=4000000, codec_choice="auto", preset_choice="fast", initial_pts=0):
+    def __init__(self, width=1280, height=720, fps=60, bitrate=4000000, codec_choice="auto", preset_choice="fast", initial_pts=0, buffer_pool=None, resize_method="auto",
+                 async_depth=0, on_packets=None, encode_pool=None):
         """
         Initialize the Video Encoder.
         :param width: Video width
@@ -19,18 +116,32 @@ class VideoEncoder:
         :param codec_choice: 'auto', 'nvenc', 'x264'
         :param preset_choice: 'fast', 'balanced', 'quality'
         :param initial_pts: Starting value for monotonic PTS (prevents timeline reset on restart)
+        :param buffer_pool: BufferPool of the conversion stage (default: global frame_pool)
+        :param resize_method: Scale algorithm (see resize_engine.RESIZE_METHODS)
+        :param async_depth: 0 = encode() encodes and returns the packets. 1-2 = worker thread mode:
+                            encode() only converts and queues, packets go to on_packets (EncodeWorker)
+        :param on_packets: Callable(packets), required by the worker thread mode
+        :param encode_pool: EncodeWorkerPool slot taken by the worker thread for each encode (multi-monitor)
         """
         self.width = width
         self.height = height
         self.fps = fps
         self.bitrate = bitrate
+        self.max_bitrate = bitrate # VBV cap (maxrate/bufsize) fixed when the context is opened
         self.preset_choice = preset_choice or "fast"
+        self.buffer_pool = buffer_pool
+        self.resize_method = resize_method or "auto"
         
         self.ctx = None
+        self.converter = None
         self.codec_name = "libx264" # Default fallback
         self._force_keyframe = True # [FIX] ALWAYS start with a Keyframe (IDR)
         self.frame_count = initial_pts 
         self.start_time = None # [NEW] For Wall-Clock PTS
+        self.skip_gen = SkipFrameGenerator() # [OPTIM] Static screen repeats without encoding
+        self.skipped_frames = 0
+        self.worker = None
+        self._pending_bitrate = None # set_bitrate() value, written to the context by the encoding thread
         
         # 1. Select Codec
         if codec_choice == "auto" or codec_choice == "nvenc":
@@ -107,31 +218,101 @@ class VideoEncoder:
             # self.ctx.flags |= av.codec.CodecContext.FLAG_GLOBAL_HEADER
             
             self.ctx.open()
-            logger.info(f"VideoEncoder initialized with {self.codec_name} @ {width}x{height}")
+            
+            # [OPTIM] Scale + I420 stage writing into our own pool of VideoFrames
+            # Async mode: queued + encoding frames stay out of the rotation (FrameConverter.in_use)
+            pool_size = FRAME_POOL_SIZE + (min(MAX_ASYNC_DEPTH, async_depth) if async_depth > 0 else 0)
+            self.converter = FrameConverter(self.width, self.height, pool_size, buffer_pool=self.buffer_pool,
+                                            resize_method=self.resize_method,
+                                            resize_budget_ms=1000.0 / self.fps * RESIZE_BUDGET)
+            if async_depth > 0 and on_packets is not None:
+                self.worker = EncodeWorker(self, on_packets, async_depth, encode_pool)
+            logger.info(f"VideoEncoder initialized with {self.codec_name} @ {width}x{height}" +
+                        (f" (encoder thread, queue {self.worker.depth})" if self.worker else ""))
             
         except Exception as e:
             logger.error(f"Failed to init encoder: {e}")
             self.ctx = None
 
     def _is_codec_available(self, name):
+        # [OPTIM] Startup probe result (opened + encoded at this size), no per re-init check
+        works = codec_probe.works(name, self.width, self.height)
+        if works is not None: return works
         try:
             av.codec.Codec(name, "w")
             return True
         except:
             return False
 
-    def encode(self, frame_bgr):
+    def encode(self, frame_data, pix_fmt="bgr24", overlay=None, content_changed=True, repeat=False):
         """
-        Encodes a BGR (OpenCV/Numpy) frame.
-        Returns a list of bytes (packets).
+        Encodes a frame given in its NATIVE capture layout (no BGR detour), at any size.
+        :param frame_data: HxWxC uint8 numpy array (never modified)
+        :param pix_fmt: 'bgra', 'rgb24' or 'bgr24' (see INPUT_FORMATS)
+        :param overlay: Optional callable(img) drawn on the scaled frame before conversion (cursor)
+        :param content_changed: False = same content as the previous encoded frame, only the
+                                overlay moved (save-under fast path, frame_data is not read)
+        :param repeat: Exact repeat of the previous encoded frame (content AND overlay unchanged):
+                       sent as an all-skip P frame, no conversion/encoding (except on GOP boundaries)
+        Returns a list of bytes (packets). Worker thread mode: always [] (packets go to on_packets).
         """
         if self.ctx is None: return []
         
         try:
-            # Wrap numpy frame
-            # Note: The color conversion BGR -> YUV420p is done by PyAV/FFmpeg here.
-            # It runs on CPU.
-            frame = av.VideoFrame.from_ndarray(frame_bgr, format='bgr24')
+            if self.worker is not None:
+                # [OPTIM] Convert here, encode in the worker thread. Repeats are converted too
+                # (save-under path, cheap): the worker falls back to a real encode on GOP boundaries.
+                self.worker.submit(self._convert(frame_data, pix_fmt, overlay, content_changed), repeat)
+                return []
+            
+            # [OPTIM] CFR repeat on a static screen: a few bytes instead of a full encode.
+            if repeat:
+                packet = self._skip_packet()
+                if packet is not None: return [packet]
+            
+            return self._encode_frame(self._convert(frame_data, pix_fmt, overlay, content_changed))
+            
+        except Exception as e:
+            logger.error(f"Encode Error: {e}")
+            return []
+
+    def _convert(self, frame_data, pix_fmt, overlay, content_changed):
+        # Scale + native -> YUV420p in one stage, into a pooled VideoFrame (no allocation).
+        # The frame already matches the codec format: PyAV/FFmpeg does no extra conversion.
+        # It runs on CPU.
+        if pix_fmt not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported input format: {pix_fmt}")
+        frame = None
+        if not content_changed:
+            frame = self.converter.update_overlay(pix_fmt, overlay)
+        if frame is None:
+            frame = self.converter.convert(frame_data, pix_fmt, overlay)
+        return frame
+
+    def _skip_packet(self):
+        """All-skip P frame repeating the previous one, or None (periodic IDR / manual keyframe / unsupported stream)."""
+        # The periodic IDR (HLS cut point / late joiners) and manual keyframes stay real encodes.
+        if self._force_keyframe or (self.frame_count + 1) % self.fps == 0: return None
+        data = self.skip_gen.skip_frame()
+        if data is None: return None
+        self.frame_count += 1
+        self.skipped_frames += 1
+        packet = av.Packet(data)
+        packet.pts = packet.dts = self.frame_count
+        packet.time_base = self.ctx.time_base
+        return packet
+
+    def _encode_frame(self, frame, repeat=False):
+        """Timestamps and encodes a converted frame (worker thread in async mode). Returns the packets."""
+        try:
+            # [FIX] Live bitrate: the context is only touched by the thread that encodes
+            bitrate, self._pending_bitrate = self._pending_bitrate, None
+            if bitrate is not None:
+                try: self.ctx.bit_rate = bitrate
+                except Exception as e: logger.warning(f"Live bitrate change failed: {e}")
+            if repeat:
+                packet = self._skip_packet()
+                if packet is not None: return [packet]
             
             # [NEW] Force Keyframe if requested
             if self._force_keyframe:
@@ -162,13 +343,54 @@ class VideoEncoder:
             packets = self.ctx.encode(frame)
             
             # Return raw PACKETS (needed for Muxing/RTSP)
-            return packets
+            return self._track(packets)
             
         except Exception as e:
             logger.error(f"Encode Error: {e}")
             return []
             
+    def _track(self, packets):
+        """Feeds the skip frame generator (SPS/PPS, frame_num) and renumbers slices after skip frames."""
+        out = []
+        for packet in packets:
+            data = bytes(packet)
+            patched = self.skip_gen.process(data)
+            if patched is not data:
+                new = av.Packet(patched)
+                new.pts, new.dts, new.time_base = packet.pts, packet.dts, packet.time_base
+                new.is_keyframe = packet.is_keyframe
+                packet = new
+            out.append(packet)
+        return out
+
+    @property
+    def active_resize_method(self):
+        """Resize method in use ('auto' resolved at the first frame): reused by a new context at the same size."""
+        resizer = self.converter.resizer if self.converter else None
+        return resizer.method if resizer is not None else self.resize_method
+
+    def set_bitrate(self, bitrate):
+        """
+        [OPTIM] Live bitrate change: no new context, no IDR, no stall.
+        maxrate/bufsize cannot be changed on an open context (not exposed by PyAV): the change is
+        applied live only while the VBV cap stays meaningful (target between 1/2 and 1x the cap).
+        Thread-safe: the value is written to the context before the next encode, by the thread that
+        encodes (the EncodeWorker in async mode may be inside ctx.encode() right now).
+        :param bitrate: New target in bits/s
+        :return: True if accepted, False if a new encoder is needed
+        """
+        if self.ctx is None or self.codec_name not in LIVE_BITRATE_CODECS: return False
+        if not self.max_bitrate / 2 <= bitrate <= self.max_bitrate: return False
+        self._pending_bitrate = bitrate
+        self.bitrate = bitrate
+        return True
+
+    def drain(self):
+        """Worker thread mode: waits until the queued frames are encoded and delivered (no-op otherwise)."""
+        if self.worker: self.worker.drain()
+
     def close(self):
+        if self.worker: self.worker.stop() # Queued frames are still encoded and delivered
         if self.ctx:
             try:
                 # Flush
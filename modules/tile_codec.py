@@ -0,0 +1,220 @@
+import zlib
+import struct
+import logging
+import cv2
+import numpy as np
+from modules.resize_engine import Resizer
+from modules.change_detector import rects_to_tiles
+
+logger = logging.getLogger("SenderGUI")
+
+# --- LOSSLESS TILE MODE (TCP app protocol) ---
+# Terminals/IDEs: H.264 at a few Mbps blurs text and still sends an IDR every second.
+# In tile mode, only the tiles that differ from what the receiver shows are sent, as RGB24,
+# compressed losslessly (zlib). The receiver composites them into its frame buffer.
+#
+# Message (one TCP app frame, [Size (4 bytes)] + [Data] like H.264 packets):
+#   TILE_HEADER: magic b"TILE", width, height, tile_size, tile count, flags (TILE_FULL)
+#   count x TILE_ENTRY: tile column, tile row
+#   zlib(RGB24 pixels of each tile, in entry order, edge tiles cropped to the frame)
+# The receiver's canvas is (re)created by a TILE_FULL message (every tile present).
+# Same format as the decoder in stream_receiver.py (standalone script, no modules import).
+
+TILE_MAGIC = b"TILE"
+TILE_HEADER = struct.Struct(">4sHHHHB")
+TILE_ENTRY = struct.Struct(">HH")
+TILE_FULL = 1
+
+TILE_SIZE = 64
+ZLIB_LEVEL = 1 # Fast: text/UI compresses well even at level 1
+
+# Auto switch (changed area ratio of the encoded frames, smoothed like MotionRateController)
+TILE_ENTER_MOTION = 0.03 # Below this for TILE_ENTER_S: tiles
+TILE_EXIT_MOTION = 0.15  # Above this: H.264 again (video, scroll, window drag)
+TILE_ENTER_S = 2.0
+TILE_DECAY_S = 0.5
+
+TILE_MODES = ("off", "auto", "always")
+
+
+class TileEncoder:
+    def __init__(self, width, height, tile_size=TILE_SIZE, level=ZLIB_LEVEL):
+        """
+        Lossless dirty-tile encoder (same input as VideoEncoder.encode).
+        :param width: Output width (encoder size)
+        :param height: Output height
+        :param tile_size: Tile edge in pixels
+        :param level: zlib level
+        """
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.level = level
+        self.tiles_x = (width + tile_size - 1) // tile_size
+        self.tiles_y = (height + tile_size - 1) // tile_size
+        self.resizer = None
+        self.base = None      # Scaled frame without cursor (native layout)
+        self.composed = None  # base + cursor = what the receiver shows (native layout)
+        self.cursor_rect = None # Cursor area in composed
+        self.lost_tiles = np.zeros((self.tiles_y, self.tiles_x), bool) # Dropped on the way: resend
+        self.full = True  # Next message refreshes every tile
+        self.pix_fmt = None
+        self.tiles_sent = 0 # Stats
+
+    def invalidate(self):
+        """Next message is a full refresh (new client, mode switch)."""
+        self.full = True
+
+    def lost(self, message):
+        """A message was dropped before reaching the socket: its tiles are sent again."""
+        if message[:4] != TILE_MAGIC: return
+        _, _, _, _, count, flags = TILE_HEADER.unpack_from(message)
+        if flags & TILE_FULL:
+            self.full = True
+            return
+        for i in range(count):
+            tx, ty = TILE_ENTRY.unpack_from(message, TILE_HEADER.size + i * TILE_ENTRY.size)
+            self.lost_tiles[ty, tx] = True
+
+    def _scale(self, frame_data, rects):
+        """Scales the source into self.base: whole frame (rects None) or only the tile-aligned rects."""
+        src_h, src_w = frame_data.shape[:2]
+        if rects is None:
+            if (src_w, src_h) == (self.width, self.height):
+                np.copyto(self.base, frame_data)
+                return
+            if self.resizer is None or self.resizer.src_size != (src_w, src_h):
+                # Alias-free downscale (area, fast integer ratios): the point of this mode is sharp text
+                self.resizer = Resizer("integer", (src_w, src_h), (self.width, self.height))
+            self.resizer(frame_data, self.base)
+            return
+        sx, sy = src_w / self.width, src_h / self.height
+        interpolation = cv2.INTER_AREA if sx > 1 or sy > 1 else cv2.INTER_LINEAR
+        t = self.tile_size
+        for x, y, w, h in rects:
+            # Tile-aligned output box and its source footprint (same pixels as a full-frame area resize
+            # when tile_size * ratio is an integer, e.g. 1080p -> 720p)
+            x0, y0 = (x // t) * t, (y // t) * t
+            x1, y1 = min(self.width, -(-(x + w) // t) * t), min(self.height, -(-(y + h) // t) * t)
+            if x1 <= x0 or y1 <= y0: continue
+            a0, b0 = int(x0 * sx), int(y0 * sy)
+            a1, b1 = min(src_w, int(np.ceil(x1 * sx))), min(src_h, int(np.ceil(y1 * sy)))
+            if (a1 - a0, b1 - b0) == (x1 - x0, y1 - y0):
+                self.base[y0:y1, x0:x1] = frame_data[b0:b1, a0:a1]
+            else:
+                self.base[y0:y1, x0:x1] = cv2.resize(frame_data[b0:b1, a0:a1], (x1 - x0, y1 - y0), interpolation=interpolation)
+
+    def encode(self, frame_data, pix_fmt="bgr24", overlay=None, content_changed=True, dirty_rects=None):
+        """
+        :param frame_data: HxWxC uint8 numpy array, native capture layout (never modified)
+        :param pix_fmt: 'bgra', 'rgb24' or 'bgr24'
+        :param overlay: Optional callable(img) drawn on the scaled frame (cursor)
+        :param content_changed: False = same content as the previous call, only the overlay moved
+        :param dirty_rects: Changed areas (x, y, w, h) in output coordinates (None = whole frame)
+        Returns a list of messages (bytes), empty if nothing changed.
+        """
+        t = self.tile_size
+        full = self.full or self.base is None or pix_fmt != self.pix_fmt or self.base.shape[2] != frame_data.shape[2]
+        if full:
+            self.base = np.empty((self.height, self.width, frame_data.shape[2]), np.uint8)
+            self.composed = np.empty_like(self.base)
+            self.pix_fmt = pix_fmt
+            content_changed, dirty_rects = True, None
+
+        # Candidate tiles: new content, previous and new cursor area, tiles lost on the way
+        candidates = self.lost_tiles.copy()
+        if content_changed:
+            self._scale(frame_data, dirty_rects)
+            if dirty_rects is None: candidates[:] = True
+            else: candidates |= rects_to_tiles(dirty_rects, t, self.tiles_x, self.tiles_y)
+        cursor_rect = None
+        if overlay is not None:
+            if hasattr(overlay, "bounds"): cursor_rect = overlay.bounds(self.width, self.height)
+            else: candidates[:] = True # Unknown drawn area
+        for r in (self.cursor_rect, cursor_rect):
+            if r: candidates[r[1] // t:-(-r[3] // t), r[0] // t:-(-r[2] // t)] = True
+        self.cursor_rect = cursor_rect
+        self.lost_tiles[:] = False
+        self.full = False
+
+        # Recompose the candidate tiles (clean content + cursor), keep the ones that really differ
+        rows, cols = np.nonzero(candidates)
+        tiles = []
+        if full or len(rows) == candidates.size:
+            previous = None if full else self.composed.copy()
+            np.copyto(self.composed, self.base)
+            if overlay: overlay(self.composed)
+            for ty, tx in zip(rows.tolist(), cols.tolist()):
+                region = (slice(ty * t, (ty + 1) * t), slice(tx * t, (tx + 1) * t))
+                if previous is None or not np.array_equal(previous[region], self.composed[region]):
+                    tiles.append((ty, tx))
+        else:
+            regions = [(slice(ty * t, (ty + 1) * t), slice(tx * t, (tx + 1) * t)) for ty, tx in zip(rows.tolist(), cols.tolist())]
+            previous = [self.composed[region].copy() for region in regions]
+            for region in regions: self.composed[region] = self.base[region]
+            if overlay: overlay(self.composed)
+            tiles = [(ty, tx) for ty, tx, region, old in zip(rows.tolist(), cols.tolist(), regions, previous)
+                     if not np.array_equal(old, self.composed[region])]
+        if not tiles: return []
+
+        flags = TILE_FULL if full else 0
+        code = {"bgra": cv2.COLOR_BGRA2RGB, "bgr24": cv2.COLOR_BGR2RGB}.get(pix_fmt)
+        entries = [TILE_HEADER.pack(TILE_MAGIC, self.width, self.height, t, len(tiles), flags)]
+        pixels = []
+        for ty, tx in tiles:
+            entries.append(TILE_ENTRY.pack(tx, ty))
+            tile = self.composed[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]
+            pixels.append((cv2.cvtColor(tile, code) if code is not None else tile).tobytes())
+        self.tiles_sent += len(tiles)
+        return [b"".join(entries) + zlib.compress(b"".join(pixels), self.level)]
+
+
+def apply_tiles(canvas, message):
+    """
+    Composites a tile message into canvas (HxWx3 RGB), returns the canvas (new one on TILE_FULL).
+    Reference decoder (debug tools), stream_receiver.py has its own copy.
+    """
+    _, width, height, t, count, flags = TILE_HEADER.unpack_from(message)
+    if flags & TILE_FULL or canvas is None or canvas.shape[:2] != (height, width):
+        canvas = np.zeros((height, width, 3), np.uint8)
+    offset = TILE_HEADER.size + count * TILE_ENTRY.size
+    pixels = zlib.decompress(message[offset:])
+    pos = 0
+    for i in range(count):
+        tx, ty = TILE_ENTRY.unpack_from(message, TILE_HEADER.size + i * TILE_ENTRY.size)
+        region = canvas[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]
+        n = region.size
+        region[:] = np.frombuffer(pixels, np.uint8, n, pos).reshape(region.shape)
+        pos += n
+    return canvas
+
+
+class TileModeSwitch:
+    """
+    Auto mode: tiles while the screen is nearly static (typing, terminal output),
+    H.264 as soon as a large area moves. Instant switch to H.264, delayed switch to tiles.
+    """
+
+    def __init__(self, enter=TILE_ENTER_MOTION, exit=TILE_EXIT_MOTION, enter_s=TILE_ENTER_S, decay_s=TILE_DECAY_S):
+        self.enter = enter
+        self.exit = exit
+        self.enter_s = enter_s
+        self.decay_s = decay_s
+        self.level = 1.0 # Smoothed changed area ratio (start in H.264)
+        self.busy_t = None # Last frame with level above 'enter' (frames only arrive on changes)
+        self.last_t = None
+        self.tiles = False
+
+    def update(self, changed_ratio, now):
+        """Feeds the changed area ratio of one frame, returns True for tile mode."""
+        if self.last_t is not None:
+            self.level *= np.exp(-(now - self.last_t) / self.decay_s)
+        self.last_t = now
+        self.level = max(self.level, changed_ratio)
+        if self.level >= self.enter or self.busy_t is None:
+            self.busy_t = now
+        if self.level > self.exit:
+            self.tiles = False
+        elif now - self.busy_t >= self.enter_s:
+            self.tiles = True
+        return self.tiles
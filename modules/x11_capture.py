@@ -0,0 +1,329 @@
+import ctypes
+import ctypes.util
+import select
+import logging
+import threading
+import numpy as np
+from ctypes import Structure, POINTER, byref, c_char_p, c_int, c_long, c_short, c_size_t, c_ubyte, c_uint, c_ulong, c_ushort, c_void_p
+
+logger = logging.getLogger("SenderGUI")
+
+# --- LINUX X11 CAPTURE (MIT-SHM + XFixes) ---
+# ctypes bindings only (no python-xlib dependency), loaded on first use.
+# MIT-SHM: the X server writes the root window straight into a SysV shared memory segment
+# that numpy views in place (zero copy, no socket transfer like XGetImage).
+# XFixes: cursor position + cursor image (X11 captures never contain the cursor).
+
+ZPixmap = 2
+LSBFirst = 0
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+# Returned when no cursor can be read (far outside any capture area: never drawn)
+CURSOR_HIDDEN = (-(1 << 30), -(1 << 30), None)
+
+
+class XImage(Structure):
+    _fields_ = [("width", c_int), ("height", c_int), ("xoffset", c_int), ("format", c_int),
+                ("data", c_void_p), ("byte_order", c_int), ("bitmap_unit", c_int),
+                ("bitmap_bit_order", c_int), ("bitmap_pad", c_int), ("depth", c_int),
+                ("bytes_per_line", c_int), ("bits_per_pixel", c_int),
+                ("red_mask", c_ulong), ("green_mask", c_ulong), ("blue_mask", c_ulong),
+                ("obdata", c_void_p), ("funcs", c_void_p * 6)]
+
+class XShmSegmentInfo(Structure):
+    _fields_ = [("shmseg", c_ulong), ("shmid", c_int), ("shmaddr", c_void_p), ("readOnly", c_int)]
+
+class XRectangle(Structure):
+    _fields_ = [("x", c_short), ("y", c_short), ("width", c_ushort), ("height", c_ushort)]
+
+class XEvent(Structure):
+    _fields_ = [("type", c_int), ("pad", c_long * 24)] # Xlib union: 24 longs
+
+class XFixesCursorImage(Structure):
+    _fields_ = [("x", c_short), ("y", c_short), ("width", c_ushort), ("height", c_ushort),
+                ("xhot", c_ushort), ("yhot", c_ushort), ("cursor_serial", c_ulong),
+                ("pixels", POINTER(c_ulong)), ("atom", c_ulong), ("name", c_char_p)]
+
+
+_libs = None
+_libs_lock = threading.Lock()
+
+def _load(name, fallback):
+    return ctypes.CDLL(ctypes.util.find_library(name) or fallback)
+
+def load_libs():
+    """Loads libX11/libXext/libXfixes/libc once. Returns (x11, xext, xfixes, libc)."""
+    global _libs
+    with _libs_lock:
+        if _libs is not None: return _libs
+        x11 = _load("X11", "libX11.so.6")
+        xext = _load("Xext", "libXext.so.6")
+        xfixes = _load("Xfixes", "libXfixes.so.3")
+        libc = _load("c", "libc.so.6")
+
+        x11.XInitThreads() # Capture thread + cursor reads
+        x11.XOpenDisplay.argtypes = [c_char_p]
+        x11.XOpenDisplay.restype = c_void_p
+        x11.XCloseDisplay.argtypes = [c_void_p]
+        x11.XDefaultScreen.argtypes = [c_void_p]
+        x11.XRootWindow.argtypes = [c_void_p, c_int]
+        x11.XRootWindow.restype = c_ulong
+        x11.XDefaultVisual.argtypes = [c_void_p, c_int]
+        x11.XDefaultVisual.restype = c_void_p
+        x11.XDefaultDepth.argtypes = [c_void_p, c_int]
+        x11.XDisplayWidth.argtypes = [c_void_p, c_int]
+        x11.XDisplayHeight.argtypes = [c_void_p, c_int]
+        x11.XSync.argtypes = [c_void_p, c_int]
+        x11.XFree.argtypes = [c_void_p]
+        x11.XDestroyImage.argtypes = [POINTER(XImage)]
+        x11.XQueryPointer.argtypes = [c_void_p, c_ulong] + [c_void_p] * 7
+        x11.XQueryPointer.restype = c_int
+
+        xext.XShmQueryExtension.argtypes = [c_void_p]
+        xext.XShmCreateImage.argtypes = [c_void_p, c_void_p, c_uint, c_int, c_void_p, POINTER(XShmSegmentInfo), c_uint, c_uint]
+        xext.XShmCreateImage.restype = POINTER(XImage)
+        xext.XShmAttach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [c_void_p, c_ulong, POINTER(XImage), c_int, c_int, c_ulong]
+
+        xfixes.XFixesQueryExtension.argtypes = [c_void_p, c_void_p, c_void_p]
+        xfixes.XFixesGetCursorImage.argtypes = [c_void_p]
+        xfixes.XFixesGetCursorImage.restype = POINTER(XFixesCursorImage)
+        xfixes.XFixesCreateRegion.argtypes = [c_void_p, c_void_p, c_int]
+        xfixes.XFixesCreateRegion.restype = c_ulong
+        xfixes.XFixesDestroyRegion.argtypes = [c_void_p, c_ulong]
+        xfixes.XFixesFetchRegion.argtypes = [c_void_p, c_ulong, POINTER(c_int)]
+        xfixes.XFixesFetchRegion.restype = POINTER(XRectangle)
+        x11.XConnectionNumber.argtypes = [c_void_p]
+        x11.XPending.argtypes = [c_void_p]
+        x11.XNextEvent.argtypes = [c_void_p, POINTER(XEvent)]
+
+        libc.shmget.argtypes = [c_int, c_size_t, c_int]
+        libc.shmat.argtypes = [c_int, c_void_p, c_int]
+        libc.shmat.restype = c_void_p
+        libc.shmdt.argtypes = [c_void_p]
+        libc.shmctl.argtypes = [c_int, c_int, c_void_p]
+
+        _libs = (x11, xext, xfixes, libc)
+        return _libs
+
+
+class ShmImage:
+    """One XShm image: a (height, width, 4) BGRA numpy view on the shared segment."""
+
+    def __init__(self, display, width, height):
+        self.display = display
+        x11, xext, _, libc = display.libs
+        d = display.display
+        self.info = XShmSegmentInfo()
+        self.ximage = xext.XShmCreateImage(d, display.visual, display.depth, ZPixmap, None, byref(self.info), width, height)
+        if not self.ximage: raise OSError("XShmCreateImage failed")
+        img = self.ximage.contents
+        self.attached = False
+        try:
+            # 32bpp little-endian TrueColor (depth 24/32) = BGRA in memory
+            if img.bits_per_pixel != 32 or img.byte_order != LSBFirst or img.red_mask != 0xFF0000 or img.blue_mask != 0xFF:
+                raise OSError(f"Unsupported X11 visual ({img.bits_per_pixel} bpp, depth {img.depth})")
+            size = img.bytes_per_line * height
+            self.info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+            if self.info.shmid < 0: raise OSError("shmget failed")
+            addr = libc.shmat(self.info.shmid, None, 0)
+            if addr is None or addr == c_void_p(-1).value:
+                libc.shmctl(self.info.shmid, IPC_RMID, None)
+                raise OSError("shmat failed")
+            self.info.shmaddr = addr
+            self.info.readOnly = 0
+            img.data = addr
+            if not xext.XShmAttach(d, byref(self.info)): raise OSError("XShmAttach failed")
+            self.attached = True
+            x11.XSync(d, 0)
+            # Segment is destroyed automatically once both sides detached (no leak on crash)
+            libc.shmctl(self.info.shmid, IPC_RMID, None)
+        except Exception:
+            self.close()
+            raise
+        buf = (c_ubyte * size).from_address(addr)
+        self.array = np.ctypeslib.as_array(buf).reshape(height, img.bytes_per_line // 4, 4)[:, :width]
+
+    def grab(self, x, y):
+        """Copies the root window area at (x, y) into the segment. Returns False on X error."""
+        _, xext, _, _ = self.display.libs
+        return bool(xext.XShmGetImage(self.display.display, self.display.root, self.ximage, x, y, ALL_PLANES))
+
+    def close(self):
+        if self.ximage is None: return
+        x11, xext, _, libc = self.display.libs
+        if self.attached:
+            xext.XShmDetach(self.display.display, byref(self.info))
+            x11.XSync(self.display.display, 0)
+            self.attached = False
+        self.array = None
+        if self.info.shmaddr:
+            libc.shmdt(c_void_p(self.info.shmaddr))
+            self.info.shmaddr = None
+        self.ximage.contents.data = None # Shared memory is not malloc'ed: XDestroyImage must not free it
+        x11.XDestroyImage(self.ximage)
+        self.ximage = None
+
+
+class X11Display:
+    """One X connection (use it from a single thread: the capture stage)."""
+
+    def __init__(self, name=None):
+        self.libs = load_libs()
+        x11, xext, xfixes, _ = self.libs
+        self.display = x11.XOpenDisplay(name.encode() if name else None)
+        if not self.display: raise OSError(f"Cannot open X display {name or '$DISPLAY'}")
+        d = self.display
+        screen = x11.XDefaultScreen(d)
+        self.root = x11.XRootWindow(d, screen)
+        self.visual = x11.XDefaultVisual(d, screen)
+        self.depth = x11.XDefaultDepth(d, screen)
+        self.size = (x11.XDisplayWidth(d, screen), x11.XDisplayHeight(d, screen))
+        self.has_shm = bool(xext.XShmQueryExtension(d))
+        ev, err = c_int(), c_int()
+        self.has_xfixes = bool(xfixes.XFixesQueryExtension(d, byref(ev), byref(err)))
+        self.cursor_serial = None
+
+    def create_shm_image(self, width, height):
+        return ShmImage(self, width, height)
+
+    def cursor_info(self):
+        """
+        (x, y, handle) of the pointer. With XFixes the real cursor image is registered in the
+        sprite cache (once per cursor serial), handle = ('x11', serial). Without it: drawn arrow.
+        """
+        x11, _, xfixes, _ = self.libs
+        if not self.has_xfixes:
+            root_x, root_y, dummy = c_int(), c_int(), c_int()
+            win, mask = c_ulong(), c_uint()
+            if not x11.XQueryPointer(self.display, self.root, byref(win), byref(win), byref(root_x), byref(root_y),
+                                     byref(dummy), byref(dummy), byref(mask)):
+                return CURSOR_HIDDEN
+            return root_x.value, root_y.value, None
+
+        ci = xfixes.XFixesGetCursorImage(self.display)
+        if not ci: return CURSOR_HIDDEN
+        try:
+            c = ci.contents
+            handle = ("x11", c.cursor_serial)
+            if c.cursor_serial != self.cursor_serial and c.width and c.height:
+                self._register_cursor(handle, c)
+                self.cursor_serial = c.cursor_serial
+            return c.x, c.y, handle
+        finally:
+            x11.XFree(ci)
+
+    @staticmethod
+    def _register_cursor(handle, c):
+        from modules.custom_utils import cursor_sprites
+        # 'pixels' is an array of unsigned long (64-bit on LP64) holding premultiplied ARGB32
+        argb = np.ctypeslib.as_array(c.pixels, shape=(c.height * c.width,)).astype(np.uint32)
+        sprite = argb.view(np.uint8).reshape(c.height, c.width, 4).copy() # B, G, R, A (little-endian)
+        alpha = sprite[..., 3:4].astype(np.uint16)
+        color = sprite[..., :3].astype(np.uint16) * 255 // np.maximum(alpha, 1)
+        sprite[..., :3] = np.minimum(color, 255)
+        cursor_sprites.register(handle, sprite, (c.xhot, c.yhot))
+
+    def close(self):
+        if self.display:
+            self.libs[0].XCloseDisplay(self.display)
+            self.display = None
+
+
+# --- XDAMAGE (event-driven capture) ---
+XDamageReportNonEmpty = 3 # One event when the damage goes from empty to non-empty
+XDamageNotify = 0
+MAX_DAMAGE_RECTS = 32     # Beyond that, report the bounding box
+
+_damage_lib = None
+
+def load_damage_lib():
+    global _damage_lib
+    with _libs_lock:
+        if _damage_lib is None:
+            lib = _load("Xdamage", "libXdamage.so.1")
+            lib.XDamageQueryExtension.argtypes = [c_void_p, c_void_p, c_void_p]
+            lib.XDamageCreate.argtypes = [c_void_p, c_ulong, c_int]
+            lib.XDamageCreate.restype = c_ulong
+            lib.XDamageDestroy.argtypes = [c_void_p, c_ulong]
+            lib.XDamageSubtract.argtypes = [c_void_p, c_ulong, c_ulong, c_ulong]
+            _damage_lib = lib
+    return _damage_lib
+
+
+class X11Damage:
+    """
+    Root window damage tracking on an X11Display connection.
+    The server accumulates damage between two poll() calls, so nothing is missed:
+    poll() takes (and clears) the accumulated region BEFORE the caller grabs.
+    """
+
+    def __init__(self, display):
+        self.display = display
+        self.lib = load_damage_lib()
+        d = display.display
+        ev, err = c_int(), c_int()
+        if not self.lib.XDamageQueryExtension(d, byref(ev), byref(err)):
+            raise OSError("XDamage extension not available")
+        self.event_type = ev.value + XDamageNotify
+        self.damage = self.lib.XDamageCreate(d, display.root, XDamageReportNonEmpty)
+        self.region = display.libs[2].XFixesCreateRegion(d, None, 0)
+        self.fd = display.libs[0].XConnectionNumber(d)
+        self.event = XEvent()
+
+    def poll(self, timeout=0.0):
+        """
+        Waits up to timeout seconds for damage.
+        :return: list of (x, y, w, h) damaged rectangles in desktop coordinates ([] = nothing changed)
+        """
+        x11, _, xfixes, _ = self.display.libs
+        d = self.display.display
+        if not x11.XPending(d) and timeout > 0:
+            select.select([self.fd], [], [], timeout)
+        damaged = False
+        while x11.XPending(d):
+            x11.XNextEvent(d, byref(self.event))
+            if self.event.type == self.event_type: damaged = True
+        if not damaged: return []
+
+        # Take the accumulated damage (new damage from now on raises a new event)
+        self.lib.XDamageSubtract(d, self.damage, 0, self.region)
+        count = c_int()
+        rects = xfixes.XFixesFetchRegion(d, self.region, byref(count))
+        if not rects: return []
+        try:
+            out = [(r.x, r.y, r.width, r.height) for r in rects[:count.value]]
+        finally:
+            x11.XFree(rects)
+        if len(out) > MAX_DAMAGE_RECTS:
+            x0, y0 = min(r[0] for r in out), min(r[1] for r in out)
+            x1, y1 = max(r[0] + r[2] for r in out), max(r[1] + r[3] for r in out)
+            out = [(x0, y0, x1 - x0, y1 - y0)]
+        return out
+
+    def close(self):
+        if self.damage and self.display.display:
+            self.lib.XDamageDestroy(self.display.display, self.damage)
+            self.display.libs[2].XFixesDestroyRegion(self.display.display, self.region)
+        self.damage = None
+
+
+# Default connection for the system cursor (custom_utils.get_cursor_info on Linux)
+_cursor_display = None
+
+def get_cursor_info():
+    global _cursor_display
+    if _cursor_display is None:
+        try: _cursor_display = X11Display()
+        except Exception as e:
+            logger.warning(f"X11 cursor unavailable: {e}")
+            _cursor_display = False # Don't retry on every frame
+    if not _cursor_display: return CURSOR_HIDDEN
+    try:
+        return _cursor_display.cursor_info()
+    except Exception:
+        return CURSOR_HIDDEN
@@ -5,6 +5,7 @@ import io
 import os
 import time
 import threading
+import zlib
 
 
 import av
@@ -62,6 +63,51 @@ def discover_server():
 
 import queue
 
+# --- LOSSLESS TILE MODE (same format as modules/tile_codec.py on the sender) ---
+# Text-heavy, low-motion screens: the sender switches from H.264 to changed RGB tiles (zlib).
+TILE_MAGIC = b"TILE"
+TILE_HEADER = struct.Struct(">4sHHHHB") # magic, width, height, tile_size, count, flags
+TILE_ENTRY = struct.Struct(">HH") # tile column, tile row
+TILE_FULL = 1
+
+def apply_tiles(canvas, data):
+    """Composites a tile message into the frame buffer (HxWx3 RGB). Returns the canvas."""
+    _, width, height, t, count, flags = TILE_HEADER.unpack_from(data)
+    if flags & TILE_FULL or canvas is None or canvas.shape[:2] != (height, width):
+        canvas = np.zeros((height, width, 3), np.uint8)
+    offset = TILE_HEADER.size + count * TILE_ENTRY.size
+    pixels = zlib.decompress(data[offset:])
+    pos = 0
+    for i in range(count):
+        tx, ty = TILE_ENTRY.unpack_from(data, TILE_HEADER.size + i * TILE_ENTRY.size)
+        region = canvas[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]
+        n = region.size
+        region[:] = np.frombuffer(pixels, np.uint8, n, pos).reshape(region.shape)
+        pos += n
+    return canvas
+
+# --- CURSOR METADATA (same format as modules/cursor_channel.py on the sender) ---
+# The sender can stop drawing the cursor into the video: we draw it over the frame.
+CURSOR_MAGIC = b"CURS"
+SHAPE_MAGIC = b"CSHP"
+CURSOR_POS = struct.Struct(">4shhHB") # magic, x, y (hotspot, video pixels), shape id, visible
+CURSOR_SHAPE = struct.Struct(">4sHHHhh") # magic, shape id, width, height, hotspot x, hotspot y + zlib(RGBA)
+
+cursor_state = None # (x, y, shape id) or None (hidden / in the video)
+cursor_shapes = {} # Shape id -> (RGBA bytes, w, h, hot x, hot y)
+cursor_surfaces = {} # (shape id, display scale) -> scaled pygame Surface (render cache)
+
+def handle_cursor_message(data):
+    """Cursor position/shape message (handled on reception: never delayed by video decoding)."""
+    global cursor_state
+    if data[:4] == SHAPE_MAGIC:
+        _, shape_id, w, h, hx, hy = CURSOR_SHAPE.unpack_from(data)
+        cursor_shapes[shape_id] = (zlib.decompress(data[CURSOR_SHAPE.size:]), w, h, hx, hy)
+        cursor_surfaces.clear() # Ids are reused by a restarted sender
+    else:
+        _, x, y, shape_id, visible = CURSOR_POS.unpack_from(data)
+        cursor_state = (x, y, shape_id) if visible else None
+
 # --- OPTIMIZATION: JITTER BUFFER ---
 packet_queue = queue.Queue(maxsize=4) # STRICT: Only 4 frames buffer (~60ms @ 60fps)
 
@@ -118,6 +164,12 @@ def receive_thread_func(sock):
             # Update Timeout Timer (Video Data)
             last_packet_time = time.time()
             
+            # [NEW] Cursor metadata: a few bytes, applied immediately (not queued behind video)
+            if data[:4] in (CURSOR_MAGIC, SHAPE_MAGIC):
+                try: handle_cursor_message(data)
+                except Exception as e: print(f"[CURSOR] Error: {e}")
+                continue
+            
             # 3. Push to Queue
             # If queue is full, we block execution of this thread (TCP Flow Control kick in)
             # OR we could drop? But for now, blocking is safer preventing artifact corruption.
@@ -146,6 +198,7 @@ def decode_thread_func():
     
     print("[DEC] Decode Thread Started.")
     codec_ctx = av.codec.CodecContext.create("h264", "r")
+    canvas = None # Frame buffer of the tile mode
     
     while running:
         try:
@@ -158,6 +211,21 @@ def decode_thread_func():
             # PING Check (Just in case it slipped through)
             if data == b'PING': continue
             
+            # [NEW] Lossless tile update (no H.264 decode)
+            if data[:4] == TILE_MAGIC:
+                try:
+                    canvas = apply_tiles(canvas, data)
+                except Exception as e:
+                    print(f"[TILE] Error: {e}")
+                    continue
+                h, w = canvas.shape[:2]
+                if getattr(decode_thread_func, "last_res", None) != (w, h):
+                    print(f"[VIDEO] Resolution: {w}x{h} (tiles)")
+                    decode_thread_func.last_res = (w, h)
+                with frame_lock:
+                    latest_frame = (canvas.tobytes(), w, h)
+                continue
+            
             # Decode
             try:
                 packet = av.Packet(data)
@@ -207,6 +275,8 @@ def decode_thread_func():
 
 def network_start(sock):
     """Launcher helper"""
+    global cursor_state
+    cursor_state = None # The new sender tells us if it sends the cursor separately
     # Disable timeout on socket for the blocking read (or use long timeout)
     sock.settimeout(5.0) 
     
@@ -227,6 +297,7 @@ def main():
     target_ip = None
     infinite_retry = False
     opt_windowed = False
+    target_port = DEFAULT_PORT
     
     # Parse args manually
     args = sys.argv[1:]
@@ -242,6 +313,17 @@ def main():
         args.remove("--windowed")
         print("[CONFIG] Mode Fenêtré: ACTIVÉ")
     
+    # [NEW] Multi-Monitor: each extra screen of the sender has its own port (5001, 5002...)
+    if "--port" in args:
+        i = args.index("--port")
+        try:
+            target_port = int(args[i + 1])
+            del args[i:i + 2]
+        except (IndexError, ValueError):
+            print("Usage: --port PORT")
+            return
+        print(f"[CONFIG] Port: {target_port}")
+    
     if args:
         target_ip = args[0]
     else:
@@ -340,7 +422,7 @@ def main():
                 sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 sock.settimeout(3.0) 
-                sock.connect((target_ip, DEFAULT_PORT))
+                sock.connect((target_ip, target_port))
                 sock.settimeout(None) # Restore blocking
                 connected = True
                 print("[Connect] Succès!")
@@ -432,6 +514,21 @@ def main():
                 # Fill black background first (clear previous frame garbage if aspect changed)
                 screen.fill((0,0,0)) 
                 screen.blit(img, (x_offset, y_offset))
+                
+                # [NEW] Cursor overlay (sender in cursor metadata mode)
+                cur = cursor_state
+                if cur and cur[2] in cursor_shapes:
+                    cx, cy, shape_id = cur
+                    key = (shape_id, round(scale, 3))
+                    surf = cursor_surfaces.get(key)
+                    if surf is None:
+                        rgba, cw, ch, hx, hy = cursor_shapes[shape_id]
+                        surf = pygame.image.frombuffer(rgba, (cw, ch), "RGBA").convert_alpha()
+                        surf = pygame.transform.smoothscale(surf, (max(1, int(cw * scale)), max(1, int(ch * scale))))
+                        if len(cursor_surfaces) > 64: cursor_surfaces.clear()
+                        cursor_surfaces[key] = surf
+                    hx, hy = cursor_shapes[shape_id][3:5]
+                    screen.blit(surf, (x_offset + int((cx - hx) * scale), y_offset + int((cy - hy) * scale)))
             else:
                 # No signal yet or lost
                 screen.fill((20, 20, 20))